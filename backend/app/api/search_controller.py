@@ -1,16 +1,31 @@
-from ..services.txt2txt.search_services import search
-from fastapi import APIRouter, Query
+import asyncio
+from typing import Literal
+from ..services.txt2txt.search_services import search_by_vectors, search_hybrid_by_vectors
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from ..services.txt2img.search_servicesImg import search_fused
-from ..models_emb import loader
-from ..services.video_service import find_video_path
+from ..services.txt2img.search_servicesImg import search_fused_by_vector, search_fused_hybrid_by_vector
+from ..models_emb.registry import get_model
+from ..services.query_embedder import embed_query, embed_query_fused, embed_query_single
+from ..services.inference_executor import ExecutorOverloaded, run_inference
+from ..services.video_service import find_video_paths
+from ..services.preview_store import available_previews
+from ..services.multi_search import fanout_search
+from ..services.search_segments import search_segments
 
 
 router = APIRouter()
 
-# ---- 모델 로딩 (distil + koe5) ----
-distil_model = loader.load_distil()
-koe5_model = loader.load_koe5()
+# ---- 모델 (distil + koe5 + siglip) ----
+# import 시점에 로드하지 않고 레지스트리에서 공유 (시작 시 warm-up, 아니면 첫 요청 때 executor 안에서 로드)
+def _embed_text_query(q: str):
+    return embed_query(q, get_model("distil"), get_model("koe5"))
+
+def _embed_distil_query(q: str):
+    return embed_query_single(q, get_model("distil"))
+
+def _embed_image_query(q: str):
+    return embed_query_fused(q, get_model("siglip"))
 
 
 class SearchResponse(BaseModel):
@@ -20,17 +35,88 @@ class SearchResponse(BaseModel):
     video_summary: str
     score: float
     video_url: str | None = None
+    sprite_url: str | None = None    # 키프레임 스프라이트 (인제스트 때 생성된 경우만)
+    preview_url: str | None = None   # 저비트레이트 프리뷰 mp4 (ffmpeg 로 생성된 경우만)
+
+
+class MultiSearchResponse(BaseModel):
+    session_id: str
+    camera_id: int | None = None
+    video_summary: str | None = None
+    score: float                       # 텍스트/이미지 순위 RRF 합
+    text_score: float | None = None    # KoE5 rerank 점수 (텍스트 결과에 없으면 None)
+    image_score: float | None = None   # SigLIP fused 점수 (이미지 결과에 없으면 None)
+    video_url: str | None = None
+    sprite_url: str | None = None
+    preview_url: str | None = None
+
+
+class SegmentSearchResponse(BaseModel):
+    id: str
+    session_id: str
+    camera_id: int | None = None
+    segment_idx: int
+    start_s: float                     # 가장 잘 맞는 구간 시작 (초)
+    end_s: float
+    score: float
+    video_url: str | None = None       # #t=start,end → 브라우저 <video> 가 그 구간부터 재생
+    sprite_url: str | None = None
+    preview_url: str | None = None
+
+
+# 미리보기 파일이 있으면 URL (없으면 None → 프론트는 video_url 로 폴백)
+def _preview_urls(session_id: str, camera_id, video_path: str) -> dict:
+    kinds = available_previews(video_path)
+    return {
+        "sprite_url": f"http://localhost:8000/api/sprite/{session_id}/{camera_id}" if "sprite" in kinds else None,
+        "preview_url": f"http://localhost:8000/api/preview/{session_id}/{camera_id}" if "preview" in kinds else None,
+    }
+
+
+# 검색 + 영상 경로/미리보기 조회를 한 번에 (경로 resolve/sha1/stat 도 threadpool 에서, 이벤트 루프 밖)
+# → [(결과, video_path, 미리보기 URL)] (영상이 없으면 video_path=None)
+def _search_with_media(search_fn, *args, **kwargs):
+    results = search_fn(*args, **kwargs)
+    video_paths = find_video_paths((r["session_id"], r["camera_id"]) for r in results)
+    return [
+        (r, video_path, _preview_urls(r["session_id"], r["camera_id"], video_path) if video_path else {})
+        for r, video_path in zip(results, video_paths)
+    ]
+
+
+# 추론 executor 가 꽉 찼으면 기다리지 않고 503 + Retry-After
+async def _run_inference(fn, *args):
+    try:
+        return await run_inference(fn, *args)
+    except ExecutorOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="search is overloaded, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 # 텍스트 투 텍스트 검색 서비스 호출부 
 @router.get("/api/search/text", response_model=list[SearchResponse])
-async def search_text(q: str = Query(..., description="검색할 텍스트 쿼리")):
-    results = search(q, distil_model, koe5_model)
+async def search_text(
+    q: str = Query(..., description="검색할 텍스트 쿼리"),
+    mode: Literal["vector", "hybrid"] = Query("vector", description="hybrid → BM25 + kNN 을 ES 요청 한 번으로"),
+    rerank: bool = Query(True, description="hybrid 일 때 KoE5 rerank 여부 (끄면 distil 만 인코딩)"),
+):
+    # 모델 추론은 전용 executor, ES 호출은 threadpool → 이벤트 루프는 막히지 않음
+    if mode == "hybrid" and not rerank:
+        q_vec_distil = await _run_inference(_embed_distil_query, q)
+        results = await run_in_threadpool(_search_with_media, search_hybrid_by_vectors, q, q_vec_distil)
+    else:
+        q_vec_distil, q_vec_koe5 = await _run_inference(_embed_text_query, q)
+        if mode == "hybrid":
+            results = await run_in_threadpool(_search_with_media, search_hybrid_by_vectors, q, q_vec_distil, q_vec_koe5)
+        else:
+            results = await run_in_threadpool(_search_with_media, search_by_vectors, q_vec_distil, q_vec_koe5)
 
     enriched_results = []
-    for r in results:
+    for r, video_path, preview_urls in results:
         session_id = r["session_id"]
         camera_id  = r["camera_id"]
-        video_path = find_video_path(session_id, camera_id)
         print(video_path)
         if video_path:  # 실제 영상이 있는 경우만
             video_url = f"http://localhost:8000/api/video/{session_id}/{camera_id}"
@@ -40,7 +126,8 @@ async def search_text(q: str = Query(..., description="검색할 텍스트 쿼
                 camera_id=camera_id,
                 video_summary=r["video_summary"],
                 score=r["score"],
-                video_url=video_url
+                video_url=video_url,
+                **preview_urls,
             ))
     print(enriched_results)
     print(len(enriched_results))
@@ -48,14 +135,20 @@ async def search_text(q: str = Query(..., description="검색할 텍스트 쿼
     return enriched_results
 
 @router.get("/api/search/image", response_model=list[SearchResponse])
-async def search_image(q: str = Query(..., description="검색할 이미지 쿼리")):
-    results = search_fused(q)  # ✅ SigLIP fused 기반 검색
+async def search_image(
+    q: str = Query(..., description="검색할 이미지 쿼리"),
+    mode: Literal["vector", "hybrid"] = Query("vector", description="hybrid → BM25 + kNN 을 ES 요청 한 번으로"),
+):
+    q_vec = await _run_inference(_embed_image_query, q)
+    if mode == "hybrid":
+        results = await run_in_threadpool(_search_with_media, search_fused_hybrid_by_vector, q, q_vec)
+    else:
+        results = await run_in_threadpool(_search_with_media, search_fused_by_vector, q_vec)  # ✅ SigLIP fused 기반 검색
 
     enriched_results = []
-    for r in results:
+    for r, video_path, preview_urls in results:
         session_id = r["session_id"]
         camera_id  = r["camera_id"]
-        video_path = find_video_path(session_id, camera_id)
 
         if video_path:
             video_url = f"http://localhost:8000/api/video/{session_id}/{camera_id}"
@@ -65,7 +158,54 @@ async def search_image(q: str = Query(..., description="검색할 이미지 쿼
                 camera_id=camera_id,
                 video_summary=r["text"],
                 score=r["score"],
-                video_url=video_url
+                video_url=video_url,
+                **preview_urls,
             ))
         print(enriched_results)
-    return enriched_results
\ No newline at end of file
+    return enriched_results
+
+
+# 텍스트 + 이미지 동시 검색: 세 모델 인코딩을 동시에, 두 인덱스 kNN 은 _msearch 한 번
+@router.get("/api/search", response_model=list[MultiSearchResponse])
+async def search_all(q: str = Query(..., description="검색할 쿼리 (텍스트/이미지 인덱스 동시 검색)")):
+    (q_vec_distil, q_vec_koe5), q_vec_fused = await asyncio.gather(
+        _run_inference(_embed_text_query, q),
+        _run_inference(_embed_image_query, q),
+    )
+    results = await run_in_threadpool(_search_with_media, fanout_search, q_vec_distil, q_vec_koe5, q_vec_fused)
+
+    enriched_results = []
+    for r, video_path, preview_urls in results:
+        if not video_path:  # 실제 영상이 있는 경우만
+            continue
+        session_id = r["session_id"]
+        camera_id = r["camera_id"]
+        enriched_results.append(MultiSearchResponse(
+            **r,
+            video_url=f"http://localhost:8000/api/video/{session_id}/{camera_id}",
+            **preview_urls,
+        ))
+    return enriched_results
+
+
+# 구간 인덱스 검색: 세션마다 가장 잘 맞는 구간(시작/끝 초) 하나씩
+@router.get("/api/search/segments", response_model=list[SegmentSearchResponse])
+async def search_segment(
+    q: str = Query(..., description="검색할 쿼리 (장면/동작 묘사)"),
+    top_n: int = Query(5, ge=1, le=50),
+):
+    q_vec = await _run_inference(_embed_image_query, q)
+    results = await run_in_threadpool(_search_with_media, search_segments, q_vec, top_n=top_n)
+
+    enriched_results = []
+    for r, video_path, preview_urls in results:
+        if not video_path:
+            continue
+        session_id = r["session_id"]
+        camera_id = r["camera_id"]
+        enriched_results.append(SegmentSearchResponse(
+            **r,
+            video_url=f"http://localhost:8000/api/video/{session_id}/{camera_id}#t={r['start_s']:.1f},{r['end_s']:.1f}",
+            **preview_urls,
+        ))
+    return enriched_results
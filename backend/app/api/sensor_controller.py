@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from app.services.sensor_store import query_series
+
+router = APIRouter()
+
+@router.get("/api/sensors/{session_id}")
+async def read_sensors(
+    session_id: str,
+    cols: Optional[str] = Query(None, description="쉼표로 구분한 컬럼 목록 (없으면 전체)"),
+    resolution: int = Query(500, ge=1, le=100000, description="반환할 최대 점 개수"),
+):
+    col_list = [c.strip() for c in cols.split(",") if c.strip()] if cols else None
+    try:
+        res = await run_in_threadpool(query_series, session_id, col_list, resolution)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"unknown columns: {e.args[0]}")
+    if res is None:
+        raise HTTPException(status_code=404, detail=f"session_id '{session_id}' not found")
+    return res
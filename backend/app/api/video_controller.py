@@ -1,16 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
 from pathlib import Path
 from ..services.video_service import find_video_path
+from ..services.media_response import file_response
+from ..services.preview_store import load_sprite_meta, preview_path, sprite_path
 
 router = APIRouter()
 
 
-# 비디오 경로 찾고 파일리스폰스 보내기 ... 이게 맞나 싶긴한데 일단 해보자
+# 비디오 경로 찾고 파일 응답 (Range/ETag/304 처리는 media_response 참고)
 @router.get("/api/video/{session_id}/{camera_id}")
-def stream_video(session_id: str, camera_id: str):
+def stream_video(session_id: str, camera_id: str, request: Request):
+    video_path = find_video_path(session_id, camera_id)
+    if not video_path or not Path(video_path).is_file():
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    return file_response(request, video_path, media_type="video/mp4")
+
+
+# 검색 결과 미리보기 (인제스트 때 만든 스프라이트/프리뷰 mp4, preview_store 참고)
+def _preview_source(session_id: str, camera_id: str) -> str:
     video_path = find_video_path(session_id, camera_id)
     if not video_path:
         raise HTTPException(status_code=404, detail="Video not found")
-    
-    return FileResponse(video_path, media_type="video/mp4")
+    return video_path
+
+
+@router.get("/api/sprite/{session_id}/{camera_id}")
+def get_sprite(session_id: str, camera_id: str, request: Request):
+    path = sprite_path(_preview_source(session_id, camera_id))
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Sprite not found")
+    return file_response(request, str(path), media_type="image/jpeg")
+
+
+@router.get("/api/sprite/{session_id}/{camera_id}/meta")
+def get_sprite_meta(session_id: str, camera_id: str):
+    meta = load_sprite_meta(_preview_source(session_id, camera_id))
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Sprite not found")
+    return meta
+
+
+@router.get("/api/preview/{session_id}/{camera_id}")
+def get_preview(session_id: str, camera_id: str, request: Request):
+    path = preview_path(_preview_source(session_id, camera_id))
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Preview not found")
+    return file_response(request, str(path), media_type="video/mp4")
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+임베딩 백엔드 비교 (CPU 배포용 백엔드 선택)
+    python -m app.bench.backend_bench --models distil,koe5,siglip --backends torch,int8 --out backend_report.json
+- 첫 번째 백엔드(기본 torch float32)를 기준 벡터로 두고 나머지 백엔드와 비교
+    parity : 같은 문장의 cosine (평균/최소/하위 1%), 샘플 안에서의 top-5 이웃 일치율
+    latency: 단일 쿼리 encode p50/p95/p99(ms), 32문장 배치 처리량
+- 최소 cosine 이 --min-cos 미만인 백엔드가 있으면 exit code 1
+- 문장은 --texts 파일(한 줄에 하나) 또는 세션 요약(video_summary) 에서 --n 개
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+from app.models_emb.cpu_backend import BACKENDS
+from app.models_emb.loader import load_distil, load_koe5
+from app.models_emb.registry import SIGLIP_MODEL_NAME
+
+
+def _load_texts(path: str | None, n: int) -> List[str]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        from app.services.session_store import load_sessions
+        df = load_sessions(columns=["session_id", "video_summary"])
+        texts = df["video_summary"].dropna().astype(str).str.strip().drop_duplicates().tolist()
+    return texts[:n]
+
+
+def _encoder(model_name: str, backend: str) -> Callable[[List[str]], np.ndarray]:
+    """기준과 같은 조건(CPU)에서 비교하도록 모델 로드 → 정규화된 (N, D) 를 돌려주는 함수"""
+    if model_name == "siglip":
+        from app.models_emb.embedder_siglip import UnifiedEmbedder
+        m = UnifiedEmbedder(SIGLIP_MODEL_NAME, device="cpu", dtype="float32", normalize=True, backend=backend)
+        return m.embed_texts
+    m = (load_distil if model_name == "distil" else load_koe5)(backend)
+    if backend == "torch":
+        m.to("cpu")
+    return lambda texts: m.encode(texts, normalize_embeddings=True, convert_to_numpy=True, batch_size=32)
+
+
+def _latency(encode: Callable[[List[str]], np.ndarray], texts: List[str], runs: int) -> Dict[str, float]:
+    for t in texts[:3]:   # 첫 호출 초기화 비용 제외
+        encode([t])
+    times = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        encode([texts[i % len(texts)]])
+        times.append((time.perf_counter() - t0) * 1000.0)
+    batch = texts[:32]
+    t0 = time.perf_counter()
+    encode(batch)
+    batch_s = time.perf_counter() - t0
+    return {
+        "p50_ms": float(np.percentile(times, 50)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "batch32_texts_per_s": len(batch) / batch_s if batch_s > 0 else None,
+    }
+
+
+def _parity(ref: np.ndarray, cand: np.ndarray, k: int = 5) -> Dict[str, float]:
+    ref = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    cand = cand / np.linalg.norm(cand, axis=1, keepdims=True)
+    cos = np.sum(ref * cand, axis=1)
+
+    # 샘플 문장끼리 검색했을 때 top-k 이웃이 얼마나 같은지 (자기 자신 제외)
+    k = min(k, len(ref) - 1)
+    overlap = None
+    if k > 0:
+        def topk(mat):
+            sims = mat @ mat.T
+            np.fill_diagonal(sims, -np.inf)
+            return np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        a, b = topk(ref), topk(cand)
+        overlap = float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a, b)]))
+
+    return {
+        "cos_mean": float(cos.mean()),
+        "cos_min": float(cos.min()),
+        "cos_p1": float(np.percentile(cos, 1)),
+        f"knn_overlap@{k}": overlap,
+    }
+
+
+def run(models: List[str], backends: List[str], texts: List[str], runs: int, min_cos: float) -> Dict:
+    report: Dict = {
+        "n_texts": len(texts),
+        "torch_threads": torch.get_num_threads(),
+        "reference_backend": backends[0],
+        "min_cos": min_cos,
+        "models": {},
+    }
+    for model_name in models:
+        ref_vecs = None
+        per_backend = {}
+        for backend in backends:
+            t0 = time.perf_counter()
+            encode = _encoder(model_name, backend)
+            load_s = time.perf_counter() - t0
+            vecs = np.asarray(encode(texts), dtype=np.float32)
+            entry = {"load_seconds": load_s, "latency": _latency(encode, texts, runs)}
+            if ref_vecs is None:
+                ref_vecs = vecs
+            else:
+                entry["parity"] = _parity(ref_vecs, vecs)
+                entry["pass"] = entry["parity"]["cos_min"] >= min_cos
+            per_backend[backend] = entry
+            print(f"[BENCH] {model_name}/{backend}: {json.dumps(entry, ensure_ascii=False)}")
+            del encode
+        report["models"][model_name] = per_backend
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="embedding backend parity/latency benchmark")
+    ap.add_argument("--models", default="distil,koe5,siglip")
+    ap.add_argument("--backends", default="torch,int8", help=f"첫 번째가 기준 ({', '.join(BACKENDS)})")
+    ap.add_argument("--texts", default=None)
+    ap.add_argument("--n", type=int, default=256)
+    ap.add_argument("--runs", type=int, default=50)
+    ap.add_argument("--min-cos", type=float, default=0.99)
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--out", default="backend_report.json")
+    args = ap.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    texts = _load_texts(args.texts, args.n)
+    if len(texts) < 2:
+        print("[ERR] need at least 2 texts")
+        sys.exit(1)
+
+    report = run(args.models.split(","), args.backends.split(","), texts, args.runs, args.min_cos)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[OK] report → {args.out}")
+
+    failed = [
+        f"{m}/{b}" for m, per in report["models"].items() for b, e in per.items() if e.get("pass") is False
+    ]
+    if failed:
+        print(f"[FAIL] cosine below {args.min_cos}: {', '.join(failed)}")
+        sys.exit(1)
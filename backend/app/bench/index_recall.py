@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+인덱스 프로파일(int8/int4 양자화, PCA 투영)의 recall@5 손실 측정
+    python -m app.bench.index_recall --target text  --out recall_text.json
+    python -m app.bench.index_recall --target image --out recall_image.json
+- 정답: vector_store 의 원래 차원 벡터로 정확(brute-force) cosine top-k
+- 측정: 현재 INDEX_PROFILE / INDEX_PCA_DIMS 로 만든 인덱스에 실제 kNN (SEARCH_BACKEND 그대로)
+    recall@k            kNN top-k 중 정답 top-k 비율
+    candidate_recall@k  kNN 후보(--candidates 개) 안에 정답 top-k 가 들어온 비율 (rerank 전 단계 손실)
+- float 프로파일 대비 벡터 RAM 추정치도 같이 기록
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.es.index_profile import INDEX_PROFILE, PCA_DIMS, estimate_vector_bytes, project_query
+from app.models_emb.registry import get_model
+from app.services.search_backend import get_backend
+from app.services.vector_store import get_vector_store
+
+TARGETS = {
+    # target: (ES 인덱스, 벡터 필드, 원래 차원)
+    "text": ("embeddings_text", "embedding_distiluse", 512),
+    "image": ("embeddings_imgtxt", "embedding_siglip_fused", 1152),
+}
+
+
+def _load_queries(path: str | None, n: int) -> List[str]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:n]
+    from app.services.session_store import load_sessions
+    df = load_sessions(columns=["session_id", "video_summary"])
+    texts = df["video_summary"].dropna().astype(str).str.strip().drop_duplicates()
+    return texts.sample(n=min(n, len(texts)), random_state=0).tolist()
+
+
+def _encode(target: str, queries: List[str]) -> np.ndarray:
+    if target == "text":
+        return get_model("distil").encode(queries, normalize_embeddings=True, convert_to_numpy=True)
+    return get_model("siglip").embed_texts(queries)
+
+
+def run(target: str, queries: List[str], k: int, candidates: int, num_candidates: int) -> Dict:
+    index, field, full_dims = TARGETS[target]
+    store = get_vector_store(field)
+    if store is None:
+        raise RuntimeError(f"no vector_store for {field} (run the ingester first)")
+
+    # 원래 차원 정답 행렬 (같은 id 가 여러 번 append 됐으면 마지막 행)
+    ids = list(store.rows.keys())
+    rows = np.fromiter((store.rows[i] for i in ids), dtype=np.int64, count=len(ids))
+    mat = np.asarray(store.matrix[rows], dtype=np.float32)
+    mat /= np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+
+    q = np.asarray(_encode(target, queries), dtype=np.float32)
+    backend = get_backend()
+    recall, cand_recall, latency = [], [], []
+    for vec in q:
+        sims = mat @ (vec / max(float(np.linalg.norm(vec)), 1e-12))
+        top = np.argpartition(-sims, k - 1)[:k]
+        truth = {ids[i] for i in top}
+
+        t0 = time.perf_counter()
+        hits = backend.knn(
+            index, field, project_query(field, vec.astype(float).tolist()),
+            k=candidates, num_candidates=num_candidates, source_fields=["session_id"],
+        )
+        latency.append((time.perf_counter() - t0) * 1000.0)
+        got = [h["_id"] for h in hits]
+        recall.append(len(truth & set(got[:k])) / k)
+        cand_recall.append(len(truth & set(got)) / k)
+
+    return {
+        "target": target,
+        "index": index,
+        "field": field,
+        "profile": INDEX_PROFILE,
+        "pca_dims": PCA_DIMS.get(field),
+        "backend": backend.name,
+        "n_docs": len(ids),
+        "n_queries": len(queries),
+        "k": k,
+        "candidates": candidates,
+        "num_candidates": num_candidates,
+        f"recall@{k}": float(np.mean(recall)),
+        f"candidate_recall@{k}": float(np.mean(cand_recall)),
+        "knn_p50_ms": float(np.percentile(latency, 50)),
+        "knn_p95_ms": float(np.percentile(latency, 95)),
+        "vector_bytes_float": int(full_dims * 4 * len(ids)),   # float32, 투영 없음 (기존 매핑)
+        "vector_bytes_profile": estimate_vector_bytes(field, full_dims, len(ids)),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="recall loss of the current index profile vs exact full-precision search")
+    ap.add_argument("--target", choices=list(TARGETS), default="text")
+    ap.add_argument("--queries", default=None, help="쿼리 파일 (한 줄에 하나). 없으면 세션 요약에서 샘플")
+    ap.add_argument("--n", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--candidates", type=int, default=50)
+    ap.add_argument("--num-candidates", type=int, default=100)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    queries = _load_queries(args.queries, args.n)
+    if not queries:
+        print("[ERR] no queries")
+        sys.exit(1)
+    report = run(args.target, queries, args.k, args.candidates, args.num_candidates)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[OK] report → {args.out}")
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+오프라인 검색 벤치마크 (라벨된 쿼리셋으로 품질/지연시간 트레이드오프 측정)
+    python -m app.bench.retrieval_bench --queries queries.jsonl --out retrieval_report.json
+- 쿼리셋: JSONL 한 줄에 {"query": "...", "relevant": ["<session_id>", ...]}  ("session_id" 단일 값도 허용)
+- 파이프라인
+    text  : distil kNN(k, num_candidates) → 상위 rerank_depth 개 KoE5 rerank   (search_by_vectors 와 같은 경로)
+    image : SigLIP fused kNN(k, num_candidates)                                  (search_fused_by_vector 와 같은 경로)
+- 그리드: --k × --num-candidates × --rerank-depth (depth > k 인 조합은 제외)
+- 지표: recall@{1,5,10}, MRR (최종 목록 기준), 단계별 p50/p95/p99 (embed / knn / rerank / total)
+- 쿼리 임베딩은 쿼리당 한 번만 계산해서 모든 조합에 재사용 (embed 지연시간은 따로 기록)
+"""
+
+import argparse
+import json
+import sys
+import time
+from itertools import product
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.models_emb.registry import get_model
+from app.services.search_backend import get_backend
+from app.services.txt2img.search_servicesImg import search_with_fused
+from app.services.txt2txt.search_services import DISPLAY_FIELDS, rerank_with_koe5, search_with_distil
+from app.services.vector_store import get_vector_store
+
+RECALL_AT = (1, 5, 10)
+
+
+def load_queryset(path: str) -> List[Dict]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            relevant = rec.get("relevant") or [rec["session_id"]]
+            items.append({"query": rec["query"], "relevant": {str(r) for r in relevant}})
+    return items
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {f"p{p}": float(np.percentile(values, p)) for p in (50, 95, 99)}
+
+
+def _score(ranked: List[str], relevant: set) -> Dict[str, float]:
+    out = {f"recall@{k}": len(relevant & set(ranked[:k])) / len(relevant) for k in RECALL_AT}
+    rr = next((1.0 / (i + 1) for i, sid in enumerate(ranked) if sid in relevant), 0.0)
+    out["mrr"] = rr
+    return out
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, (time.perf_counter() - t0) * 1000.0
+
+
+# -----------------------------
+# 쿼리 임베딩 (쿼리당 한 번)
+# -----------------------------
+def embed_queries(queries: List[str], pipelines: Sequence[str]) -> Dict[str, Dict]:
+    out: Dict[str, Dict] = {}
+    models = {"text": ("distil", "koe5"), "image": ("siglip",)}
+    for pipeline in pipelines:
+        for name in models[pipeline]:
+            model = get_model(name)
+            vecs, times = [], []
+            for q in queries:
+                if name == "siglip":
+                    vec, ms = _timed(model.embed_texts, [q])
+                    vec = vec[0]
+                else:
+                    vec, ms = _timed(model.encode, q, normalize_embeddings=True, convert_to_numpy=True)
+                vecs.append(np.asarray(vec, dtype=np.float32).astype(float).tolist())
+                times.append(ms)
+            out[name] = {"vectors": vecs, "latency_ms": _percentiles(times)}
+    return out
+
+
+# -----------------------------
+# 파이프라인 1회 실행
+# -----------------------------
+def run_text(q_distil, q_koe5, k: int, num_candidates: int, depth: int, final_n: int):
+    store = get_vector_store("embedding_koe5")
+    source = DISPLAY_FIELDS if store is not None else None
+    hits, knn_ms = _timed(search_with_distil, q_distil, k=k, num_candidates=num_candidates, source_fields=source)
+    hits = hits[:depth]
+
+    # rerank = 저장소 gather + KoE5 재정렬
+    # 저장소에 없는 후보가 있으면 벡터 포함 kNN 을 다시 → ES 왕복이라 knn 시간에 더함
+    doc_mat, rerank_ms = None, 0.0
+    if store is not None:
+        (doc_mat, found), rerank_ms = _timed(store.gather, [h["_id"] for h in hits])
+        if not all(found):
+            hits, retry_ms = _timed(search_with_distil, q_distil, k=k, num_candidates=num_candidates)
+            hits = hits[:depth]
+            knn_ms += retry_ms
+            doc_mat = None
+    ranked, ms = _timed(rerank_with_koe5, hits, q_koe5, top_n=final_n, doc_mat=doc_mat)
+    rerank_ms += ms
+    return [h["_source"]["session_id"] for h, _ in ranked], {"knn": knn_ms, "rerank": rerank_ms}
+
+
+def run_image(q_fused, k: int, num_candidates: int, final_n: int):
+    hits, knn_ms = _timed(search_with_fused, q_fused, k=k, num_candidates=num_candidates, source_fields=["session_id"])
+    return [h["_source"]["session_id"] for h in hits[:final_n]], {"knn": knn_ms}
+
+
+# -----------------------------
+# 그리드
+# -----------------------------
+def sweep(queryset: List[Dict], pipelines: Sequence[str], ks: List[int], ncs: List[int], depths: List[int],
+          repeats: int = 1) -> Dict:
+    final_n = max(RECALL_AT)
+    queries = [it["query"] for it in queryset]
+    emb = embed_queries(queries, pipelines)
+    report: Dict = {
+        "n_queries": len(queryset),
+        "backend": get_backend().name,
+        "embed_latency_ms": {name: e["latency_ms"] for name, e in emb.items()},
+        "results": {p: [] for p in pipelines},
+    }
+
+    for pipeline in pipelines:
+        grid = (
+            [(k, nc, d) for k, nc, d in product(ks, ncs, depths) if d <= k and nc >= k]
+            if pipeline == "text" else
+            [(k, nc, None) for k, nc in product(ks, ncs) if nc >= k]
+        )
+        for k, nc, depth in grid:
+            scores: List[Dict[str, float]] = []
+            stage_ms: Dict[str, List[float]] = {"knn": [], "rerank": [], "total": []}
+            for _ in range(repeats):
+                for i, item in enumerate(queryset):
+                    if pipeline == "text":
+                        ranked, ms = run_text(emb["distil"]["vectors"][i], emb["koe5"]["vectors"][i], k, nc, depth, final_n)
+                    else:
+                        ranked, ms = run_image(emb["siglip"]["vectors"][i], k, nc, final_n)
+                    scores.append(_score(ranked, item["relevant"]))
+                    for stage, v in ms.items():
+                        stage_ms[stage].append(v)
+                    stage_ms["total"].append(sum(ms.values()))
+
+            row = {"k": k, "num_candidates": nc}
+            if depth is not None:
+                row["rerank_depth"] = depth
+            row.update({m: float(np.mean([s[m] for s in scores])) for m in scores[0]})
+            row["latency_ms"] = {stage: _percentiles(v) for stage, v in stage_ms.items() if v}
+            report["results"][pipeline].append(row)
+            print(f"[BENCH] {pipeline} {json.dumps(row, ensure_ascii=False)}")
+    return report
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="offline retrieval benchmark (recall/MRR/latency grid)")
+    ap.add_argument("--queries", required=True, help="JSONL {query, relevant}")
+    ap.add_argument("--pipelines", default="text,image")
+    ap.add_argument("--k", default="20,50,100")
+    ap.add_argument("--num-candidates", default="100,200,400")
+    ap.add_argument("--rerank-depth", default="10,20,50,100")
+    ap.add_argument("--repeats", type=int, default=1)
+    ap.add_argument("--out", default="retrieval_report.json")
+    args = ap.parse_args()
+
+    queryset = load_queryset(args.queries)
+    if not queryset:
+        print("[ERR] empty query set")
+        sys.exit(1)
+
+    report = sweep(
+        queryset, args.pipelines.split(","), _ints(args.k), _ints(args.num_candidates),
+        _ints(args.rerank_depth), repeats=args.repeats,
+    )
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[OK] report → {args.out}")
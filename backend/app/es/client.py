@@ -1,4 +1,5 @@
 import os
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
@@ -17,12 +18,25 @@ ES_CA   = os.getenv("ES_CA")
 # ------------------------
 # 2. Elasticsearch 클라이언트
 # ------------------------
-es = Elasticsearch(
-    [ES_URL],
-    basic_auth=(ES_USER, ES_PASS),
-    ca_certs=ES_CA,
-)
+# import 시점에는 연결하지 않고 처음 get_client() 할 때 생성 (프로세스 공용)
+_es: Elasticsearch | None = None
+_lock = threading.Lock()
 
 def get_client():
     """Elasticsearch 클라이언트 리턴"""
-    return es
+    global _es
+    if _es is None:
+        with _lock:
+            if _es is None:
+                _es = Elasticsearch(
+                    [ES_URL],
+                    basic_auth=(ES_USER, ES_PASS),
+                    ca_certs=ES_CA,
+                )
+    return _es
+
+def __getattr__(name):
+    # 예전 `from app.es.client import es` 호환
+    if name == "es":
+        return get_client()
+    raise AttributeError(name)
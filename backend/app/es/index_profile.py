@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+dense_vector 인덱스 프로파일 (인제스트 매핑 + 쿼리 벡터 변환을 한 곳에서)
+- INDEX_PROFILE: HNSW 벡터 저장 형식
+    "float" → hnsw       (float32, 기존)
+    "int8"  → int8_hnsw  (차원당 1B, RAM 약 1/4)
+    "int4"  → int4_hnsw  (차원당 0.5B)
+    ※ int4_hnsw 는 Elasticsearch 서버 8.15 이상에서만 지원 (그 미만이면 인덱스 생성이 400 으로 실패)
+- INDEX_PCA_DIMS: 1차 검색 필드를 PCA 로 낮은 차원에 투영해서 저장/검색
+    예) "embedding_distiluse=128,embedding_siglip_fused=256"
+    · 투영 행렬은 인제스트 때 원래 차원 벡터로 fit → PROJECTION_DIR/<field>.npz
+    · 인덱스에는 투영된 벡터, vector_store 에는 원래 차원 벡터 (recall 비교/재fit 용)
+    · koe5 는 rerank 단계(로컬 vector_store / ES rescore)에서 원래 차원으로 쓰므로 대상 아님
+- 프로파일/투영이 바뀌면 매핑 차원/index_options 가 달라지므로 인덱스를 새로 만들어야 함
+  · ensure_vector_index() 가 기존 매핑과 비교해서 다르면 인덱스를 지우고 새 매핑으로 생성
+  · 인제스트 fingerprint 에 profile_signature 가 들어가서 문서는 전부 다시 색인됨
+- PCA 투영인데 vector_store 가 비어 있으면(첫 인제스트) 이번 실행에서 계산한 벡터로 fit
+  (needs_fit() 이면 인제스터가 원래 차원 벡터를 모아뒀다가 fit 후 한 번에 투영)
+- recall@5 손실 확인: python -m app.bench.index_recall
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.services.env_loader import env_loader
+
+INDEX_PROFILE = os.getenv("INDEX_PROFILE", "float")
+PROJECTION_DIR = Path(os.getenv("PROJECTION_DIR", f"{env_loader.env_loader()}/data/projections"))
+PCA_FIT_SAMPLE = int(os.getenv("INDEX_PCA_FIT_SAMPLE", "20000"))
+
+INDEX_OPTION_TYPES = {"float": "hnsw", "int8": "int8_hnsw", "int4": "int4_hnsw"}
+PCA_FIELDS = ("embedding_distiluse", "embedding_siglip_fused")   # 1차 검색 필드만 투영 가능
+
+# 벡터 하나당 대략적인 RAM (바이트/차원, 고정 오버헤드) — 리포트용 추정치
+BYTES_PER_DIM = {"float": 4.0, "int8": 1.0, "int4": 0.5}
+
+
+def _parse_pca_dims(spec: str) -> Dict[str, int]:
+    dims: Dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        field, _, n = part.partition("=")
+        field = field.strip()
+        if field not in PCA_FIELDS:
+            raise ValueError(f"PCA projection is only supported for {PCA_FIELDS}, got {field}")
+        dims[field] = int(n)
+    return dims
+
+
+PCA_DIMS = _parse_pca_dims(os.getenv("INDEX_PCA_DIMS", ""))
+
+if INDEX_PROFILE not in INDEX_OPTION_TYPES:
+    raise ValueError(f"unknown INDEX_PROFILE: {INDEX_PROFILE} (choose from {list(INDEX_OPTION_TYPES)})")
+
+
+# -----------------------------
+# 매핑
+# -----------------------------
+def index_dims(field: str, full_dims: int) -> int:
+    """인덱스에 저장되는 차원 (PCA 투영이면 낮은 차원)"""
+    return PCA_DIMS.get(field, full_dims)
+
+
+def dense_vector_mapping(field: str, full_dims: int) -> Dict:
+    return {
+        "type": "dense_vector",
+        "dims": index_dims(field, full_dims),
+        "index": True,
+        "similarity": "cosine",
+        "index_options": {"type": INDEX_OPTION_TYPES[INDEX_PROFILE]},
+    }
+
+
+def _vector_settings(mapping: Dict) -> tuple:
+    opts = mapping.get("index_options") or {}
+    return mapping.get("dims"), mapping.get("similarity"), opts.get("type")
+
+
+def ensure_vector_index(es, index: str, body: Dict) -> bool:
+    """
+    인덱스가 없으면 body 로 생성, 있으면 dense_vector 필드(dims / similarity / index_options)를
+    body 와 비교해서 다르면 지우고 다시 생성 → 다시 만들었으면 True
+    (True 면 인제스트 manifest 의 기존 기록은 의미가 없으므로 호출부에서 비움)
+    """
+    from elasticsearch.exceptions import NotFoundError, RequestError
+
+    wanted = {
+        name: _vector_settings(m)
+        for name, m in body["mappings"]["properties"].items()
+        if m.get("type") == "dense_vector"
+    }
+    recreate = False
+    try:
+        current = es.indices.get_mapping(index=index)
+    except NotFoundError:
+        current = None
+    if current is not None:
+        props = next(iter(current.values()), {}).get("mappings", {}).get("properties", {})
+        diff = {
+            name: (_vector_settings(props.get(name, {})), want)
+            for name, want in wanted.items()
+            if _vector_settings(props.get(name, {})) != want
+        }
+        if not diff:
+            return False
+        for name, (have, want) in diff.items():
+            print(f"[WARN] {index}.{name} mapping {have} != profile {want} → recreating index")
+        es.indices.delete(index=index)
+        recreate = True
+
+    try:
+        es.indices.create(index=index, body=body)
+        print(f"[INFO] {'recreated' if recreate else 'created'} index {index}")
+    except RequestError as e:
+        if getattr(e, "info", {}).get("error", {}).get("type") != "resource_already_exists_exception":
+            print(f"[ERR] index create failed: {e.info}")
+            raise
+    return recreate
+
+
+def estimate_vector_bytes(field: str, full_dims: int, count: int, profile: str = INDEX_PROFILE) -> int:
+    """HNSW 그래프를 뺀 벡터 데이터 RAM 추정 (양자화 프로파일은 보정값 float 4B 포함)"""
+    per = index_dims(field, full_dims) * BYTES_PER_DIM[profile] + (4 if profile != "float" else 0)
+    return int(per * count)
+
+
+# -----------------------------
+# PCA 투영
+# -----------------------------
+class Projection:
+    """(x - mean) @ components.T → L2 정규화 (cosine 유사도 유지)"""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)   # (k, D)
+
+    @property
+    def dims(self) -> int:
+        return int(self.components.shape[0])
+
+    def apply(self, vecs) -> np.ndarray:
+        x = np.asarray(vecs, dtype=np.float32)
+        single = x.ndim == 1
+        x = np.atleast_2d(x)
+        y = (x - self.mean) @ self.components.T
+        y /= np.maximum(np.linalg.norm(y, axis=1, keepdims=True), 1e-12)
+        return y[0] if single else y
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, mean=self.mean, components=self.components)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Projection":
+        with np.load(path) as z:
+            return cls(z["mean"], z["components"])
+
+
+def _projection_path(field: str) -> Path:
+    return PROJECTION_DIR / f"{field}.npz"
+
+
+_projections: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def load_projection(field: str) -> Optional[Projection]:
+    """fit 된 투영 (파일이 바뀌면 다시 읽음). PCA 대상이 아니면 None"""
+    if field not in PCA_DIMS:
+        return None
+    path = _projection_path(field)
+    if not path.exists():
+        raise RuntimeError(
+            f"{field}: INDEX_PCA_DIMS is set but no projection is fitted "
+            f"(run the ingester or: python -m app.es.index_profile fit {field})"
+        )
+    mtime = path.stat().st_mtime
+    cached = _projections.get(field)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = (mtime, Projection.load(path))
+            _projections[field] = cached
+    return cached[1]
+
+
+def fit_projection(field: str, vectors: np.ndarray, dims: Optional[int] = None) -> Projection:
+    """원래 차원 벡터 샘플 → 상위 dims 주성분"""
+    dims = dims or PCA_DIMS[field]
+    x = np.asarray(vectors, dtype=np.float32)
+    if x.shape[0] < dims:
+        raise ValueError(f"{field}: need at least {dims} vectors to fit PCA, got {x.shape[0]}")
+    if x.shape[0] > PCA_FIT_SAMPLE:
+        x = x[np.random.default_rng(0).choice(x.shape[0], PCA_FIT_SAMPLE, replace=False)]
+    mean = x.mean(axis=0)
+    _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+    proj = Projection(mean, vt[:dims])
+    proj.save(_projection_path(field))
+    kept = float((s[:dims] ** 2).sum() / max((s ** 2).sum(), 1e-12))
+    print(f"[OK] fitted PCA {field}: {x.shape[1]} → {dims} dims (explained variance {kept:.3f})")
+    return proj
+
+
+def needs_fit(field: str) -> bool:
+    """PCA 대상인데 아직 fit 된 투영이 없음"""
+    return field in PCA_DIMS and not _projection_path(field).exists()
+
+
+def ensure_projection(field: str, sample_fn: Callable[[], Optional[np.ndarray]]) -> Optional[Projection]:
+    """
+    PCA 대상인데 아직 fit 전이면 sample_fn() 벡터로 fit
+    - 샘플이 없거나 부족하면 None (needs_fit() 가 계속 True → 인제스터가 이번 실행 벡터로 fit)
+    """
+    if field not in PCA_DIMS:
+        return None
+    if needs_fit(field):
+        sample = sample_fn()
+        if sample is None or len(sample) < PCA_DIMS[field]:
+            print(f"[INFO] {field}: not enough stored vectors to fit PCA yet → fitting on this run's vectors")
+            return None
+        return fit_projection(field, sample)
+    return load_projection(field)
+
+
+def project(field: str, vecs) -> np.ndarray:
+    """인덱스에 넣을 벡터 (PCA 대상이 아니면 그대로)"""
+    proj = load_projection(field)
+    return np.asarray(vecs, dtype=np.float32) if proj is None else proj.apply(vecs)
+
+
+def project_query(field: str, query_vec):
+    """kNN 쿼리 벡터 → 인덱스와 같은 공간 (PCA 대상이 아니면 그대로)"""
+    proj = load_projection(field)
+    return query_vec if proj is None else proj.apply(query_vec).astype(float).tolist()
+
+
+def profile_signature(field: str) -> str:
+    """인제스트 fingerprint 용: 프로파일/투영이 바뀌면 문서를 다시 색인"""
+    sig = INDEX_PROFILE
+    if field in PCA_DIMS:
+        path = _projection_path(field)
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()[:12] if path.exists() else "unfitted"
+        sig += f":pca{PCA_DIMS[field]}:{digest}"
+    return sig
+
+
+def store_sample(field: str, limit: int = PCA_FIT_SAMPLE) -> Optional[np.ndarray]:
+    """vector_store 에 저장된 원래 차원 벡터 샘플 (fit 용). 저장소가 비어 있으면 None"""
+    from app.services.vector_store import get_vector_store
+
+    store = get_vector_store(field)
+    if store is None or not store.rows:
+        return None
+    rows = np.fromiter(sorted(set(store.rows.values())), dtype=np.int64)
+    if len(rows) > limit:
+        rows = np.sort(np.random.default_rng(0).choice(rows, limit, replace=False))
+    return np.asarray(store.matrix[rows], dtype=np.float32)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "fit":
+        print("usage: python -m app.es.index_profile fit <vector_field>")
+        sys.exit(1)
+    sample = store_sample(sys.argv[2])
+    if sample is None:
+        print(f"[ERR] {sys.argv[2]}: no vectors in vector_store (run the ingester first)")
+        sys.exit(1)
+    fit_projection(sys.argv[2], sample)
@@ -1,10 +1,22 @@
+import threading
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
-from app.api import search_controller,video_controller,stats_controller
+from app.api import search_controller,video_controller,stats_controller,sensor_controller
+from app.services.video_index import video_index
+from app.services.inference_executor import inference_executor
+from app.services.search_backend import SEARCH_BACKEND
+from app.services.ann_index import get_ann_index
+from app.models_emb.registry import registry
 from fastapi.middleware.cors import CORSMiddleware
 app = FastAPI()
 
+# 모델 warm-up: "background" → 서버는 바로 뜨고 /api/ready 가 끝날 때까지 503
+#               "blocking"   → 시작 hook 안에서 끝까지 로드
+#               "off"        → warm-up 없이 첫 요청 때 로드 (바로 ready)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+
 # 현재 파일 기준으로 static 디렉토리 절대 경로 계산
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
@@ -21,8 +33,48 @@ app.add_middleware(
 app.include_router(search_controller.router)
 app.include_router(video_controller.router)
 app.include_router(stats_controller.router)
+app.include_router(sensor_controller.router)
 # 라우터 등록
 
+
+# 영상 경로 인덱스: 시작 시 한 번 구축 + 파일 변경 감시
+@app.on_event("startup")
+def build_video_index():
+    video_index.build()
+    video_index.start_watcher()
+
+# 로컬 ANN 백엔드면 벡터 파일을 시작 시 mmap 해둠
+@app.on_event("startup")
+def load_ann_indexes():
+    if SEARCH_BACKEND == "local":
+        for index in ("embeddings_text", "embeddings_imgtxt"):
+            get_ann_index(index)
+
+# 모델 레지스트리 warm-up (로드 + 더미 추론)
+@app.on_event("startup")
+def warm_up_models():
+    if MODEL_WARMUP == "off":
+        registry.ready.set()
+    elif MODEL_WARMUP == "blocking":
+        registry.warm_up()
+    else:
+        threading.Thread(target=registry.warm_up, name="model-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_video_index():
+    video_index.stop_watcher()
+    inference_executor.shutdown()
+
+# 로드밸런서 readiness: warm-up 이 끝나야 200
+@app.get("/api/ready")
+def read_ready():
+    body = {
+        "ready": registry.ready.is_set(),
+        "warmup_error": registry.warmup_error,
+        "models": registry.stats(),
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 # API 엔드포인트 예시
 @app.get("/api/hello")
 def read_hello():
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+GPU 없는 추론 노드용 CPU 백엔드
+- EMBED_BACKEND
+    "torch" : 기존 그대로 (CPU 면 float32)
+    "int8"  : nn.Linear 를 dynamic int8 양자화 (가중치 int8, 활성값은 실행 시 양자화)
+              → 트랜스포머 연산 대부분이 Linear 라 CPU 에서 지연시간/메모리 크게 줄어듦
+- TORCH_NUM_THREADS / TORCH_INTEROP_THREADS 로 intra/inter-op 스레드 수 고정
+  (inference executor 워커 여러 개가 동시에 돌 때 코어를 서로 뺏지 않게)
+- 백엔드별 벡터 차이는 python -m app.bench.backend_bench 로 확인 (cosine 일치도 + 지연시간)
+"""
+
+import os
+import threading
+
+# torch 는 함수 안에서 import → EMBED_BACKEND / backend_model_id 만 쓰는 인제스터는 torch 를 올리지 않음
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))         # 0 → torch 기본값
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+BACKENDS = ("torch", "int8")
+
+_threads_lock = threading.Lock()
+_threads_configured = False
+
+
+def configure_threads() -> None:
+    """프로세스당 한 번만 (interop 스레드 수는 첫 병렬 연산 전에만 바꿀 수 있음)"""
+    import torch
+
+    global _threads_configured
+    with _threads_lock:
+        if _threads_configured:
+            return
+        _threads_configured = True
+        if TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(TORCH_NUM_THREADS)
+        if TORCH_INTEROP_THREADS > 0:
+            try:
+                torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+            except RuntimeError as e:
+                print(f"[WARN] interop threads not set: {e}")
+
+
+def backend_model_id(model_name: str, backend: str = EMBED_BACKEND) -> str:
+    """
+    모델 이름 + 백엔드 (torch 면 이름 그대로, 아니면 "<이름>@<백엔드>")
+    → 임베딩 캐시 키 / 인제스트 manifest fingerprint 용 (백엔드를 바꾸면 벡터도 달라짐)
+    """
+    return model_name if check_backend(backend) == "torch" else f"{model_name}@{backend}"
+
+
+def check_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown embedding backend: {backend} (choose from {BACKENDS})")
+    return backend
+
+
+def quantize_int8(module: "torch.nn.Module") -> "torch.nn.Module":
+    """float32 CPU 모듈의 nn.Linear → dynamic int8 (제자리 교체 후 같은 모듈 반환)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+디스크 임베딩 캐시 (content-addressed, 인제스터 공용)
+- 키: sha1(모델 이름, dtype, 종류, 입력 텍스트 또는 프레임 바이트)
+- 파일 2개 (append-only)
+    data.bin   float32 벡터 원본을 이어 붙임
+    index.bin  고정 길이 레코드 <키 20B | offset 8B | dim 4B> 를 이어 붙임 (같은 키는 뒤의 것이 유효)
+- data.bin 이 max_bytes 를 넘으면 오래된 것부터 버리고 새 파일로 압축
+- 인덱스를 지우거나 매핑을 바꿔서 재인제스트해도 모델이 같으면 추론 없이 벡터 재사용
+- 여러 프로세스(인제스터 동시 실행)가 같은 디렉터리를 공유해도 됨
+    · 같은 디렉터리의 lock 파일에 flock: 추가/압축은 배타 잠금, 조회는 공유 잠금
+    · 조회/추가 전에 다른 프로세스가 붙인 index.bin 뒤쪽 레코드를 읽어 들이고,
+      다른 프로세스가 압축해서 data.bin 의 inode 가 바뀌었으면 파일을 다시 엶
+    · fcntl 이 없는 플랫폼(Windows)은 잠금 없음 → 디렉터리 하나당 프로세스 하나로 써야 함
+"""
+
+import hashlib
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+
+EMBED_CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", str(Path(__file__).resolve().parents[1] / "data" / "emb_cache")))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(8 * 1024 ** 3)))
+
+_REC = struct.Struct("<20sQI")
+
+
+def content_key(model_name: str, dtype: str, kind: str, payload: bytes) -> bytes:
+    h = hashlib.sha1()
+    for part in (model_name, dtype, kind):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    h.update(payload)
+    return h.digest()
+
+
+def text_key(model_name: str, dtype: str, text: str, variant: str = "") -> bytes:
+    return content_key(model_name, dtype, f"text{variant}", text.encode("utf-8"))
+
+
+def image_key(model_name: str, dtype: str, img) -> bytes:
+    """PIL 이미지: 모드/크기 + 픽셀 바이트"""
+    header = f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode("ascii")
+    return content_key(model_name, dtype, "image", header + img.tobytes())
+
+
+class DiskEmbeddingCache:
+    def __init__(self, base_dir: Path = EMBED_CACHE_DIR, max_bytes: int = EMBED_CACHE_MAX_BYTES):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.base_dir / "data.bin"
+        self.index_path = self.base_dir / "index.bin"
+        self._lock_file = open(self.base_dir / "lock", "a+b")   # 프로세스 간 flock 용
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Dict[bytes, Tuple[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        with self._flock(fcntl.LOCK_SH if fcntl else None):
+            self._open()
+
+    @contextmanager
+    def _flock(self, mode):
+        """lock 파일 flock (mode=None 이면 잠금 없음)"""
+        if mode is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # -----------------------------
+    # 파일 열기 / 인덱스 로드
+    # -----------------------------
+    def _open(self) -> None:
+        """파일을 (다시) 열고 index.bin 전체 로드 (flock 잡은 상태에서 호출)"""
+        self._entries = {}
+        self._data = open(self.data_path, "a+b")
+        self._index = open(self.index_path, "a+b")
+        self._data_ino = os.fstat(self._data.fileno()).st_ino
+        self._index_pos = 0
+        self._load_index_tail()
+
+    def _load_index_tail(self) -> None:
+        """index.bin 에서 아직 안 읽은 레코드(다른 프로세스가 붙인 것 포함)를 읽어 들임"""
+        size = os.fstat(self._index.fileno()).st_size
+        if size <= self._index_pos:
+            return
+        raw = os.pread(self._index.fileno(), size - self._index_pos, self._index_pos)
+        usable = len(raw) - len(raw) % _REC.size   # 쓰다 만 마지막 레코드는 다음에
+        data_size = os.fstat(self._data.fileno()).st_size
+        for key, offset, dim in _REC.iter_unpack(raw[:usable]):
+            if offset + dim * 4 <= data_size:
+                self._entries[key] = (offset, dim)
+        self._index_pos += usable
+
+    def _refresh(self) -> None:
+        """다른 프로세스가 압축했으면(inode 변경) 다시 열고, 아니면 index.bin 뒷부분만 반영"""
+        try:
+            ino = os.stat(self.data_path).st_ino
+        except FileNotFoundError:
+            ino = None
+        if ino != self._data_ino:
+            self._data.close()
+            self._index.close()
+            self._open()
+        else:
+            self._load_index_tail()
+
+    def close(self) -> None:
+        with self._lock:
+            self._data.close()
+            self._index.close()
+            self._lock_file.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -----------------------------
+    # 조회 / 저장
+    # -----------------------------
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = []
+        with self._lock, self._flock(fcntl.LOCK_SH if fcntl else None):
+            self._refresh()
+            fd = self._data.fileno()
+            for key in keys:
+                ent = self._entries.get(key)
+                if ent is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                offset, dim = ent
+                out.append(np.frombuffer(os.pread(fd, dim * 4, offset), dtype=np.float32))
+                self.hits += 1
+        return out
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+        if len(keys) == 0:
+            return
+        dim = int(vectors.shape[1])
+        with self._lock, self._flock(fcntl.LOCK_EX if fcntl else None):
+            # 배타 잠금 안에서 최신 상태로 맞춘 뒤 끝에 붙임 → 다른 프로세스와 offset 이 겹치지 않음
+            self._refresh()
+            if os.fstat(self._index.fileno()).st_size != self._index_pos:
+                self._index.truncate(self._index_pos)   # 죽은 프로세스가 쓰다 만 레코드
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            self._data.write(vectors.tobytes())
+            self._data.flush()
+            recs = []
+            for i, key in enumerate(keys):
+                ent = (offset + i * dim * 4, dim)
+                self._entries[key] = ent
+                recs.append(_REC.pack(key, *ent))
+            self._index.write(b"".join(recs))
+            self._index.flush()
+            self._index_pos += len(recs) * _REC.size
+            if offset + vectors.nbytes > self.max_bytes:
+                self._compact()
+
+    def get_or_compute(
+        self,
+        keys: Sequence[bytes],
+        compute: Callable[[List[int]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        keys 중 없는 것만 compute(miss 위치 목록) → (M, D) 로 계산해서 저장하고
+        전체 (N, D) 를 keys 순서대로 반환
+        """
+        cached = self.get_many(keys)
+        miss = [i for i, v in enumerate(cached) if v is None]
+        if miss:
+            fresh = np.asarray(compute(miss), dtype=np.float32)
+            self.put_many([keys[i] for i in miss], fresh)
+            for i, vec in zip(miss, fresh):
+                cached[i] = vec
+        return np.stack(cached).astype(np.float32) if cached else np.empty((0, 0), dtype=np.float32)
+
+    # -----------------------------
+    # 크기 제한 (오래된 것부터 제거)
+    # -----------------------------
+    def _compact(self) -> None:
+        """put_many 의 배타 잠금 안에서 호출 (다른 프로세스는 inode 변경을 보고 다시 엶)"""
+        target = int(self.max_bytes * 0.8)
+        live = sorted(self._entries.items(), key=lambda kv: kv[1][0], reverse=True)   # 최근 것부터
+        keep, total = [], 0
+        for key, (offset, dim) in live:
+            if total + dim * 4 > target:
+                break
+            keep.append((key, offset, dim))
+            total += dim * 4
+        keep.reverse()
+
+        tmp_data = self.data_path.with_suffix(".bin.tmp")
+        tmp_index = self.index_path.with_suffix(".bin.tmp")
+        fd = self._data.fileno()
+        with open(tmp_data, "wb") as fdata, open(tmp_index, "wb") as findex:
+            new_offset = 0
+            for key, offset, dim in keep:
+                fdata.write(os.pread(fd, dim * 4, offset))
+                findex.write(_REC.pack(key, new_offset, dim))
+                new_offset += dim * 4
+        self._data.close()
+        self._index.close()
+        os.replace(tmp_data, self.data_path)
+        os.replace(tmp_index, self.index_path)
+        dropped = len(self._entries) - len(keep)
+        self._open()
+        print(f"[INFO] embedding cache compacted: kept {len(keep)}, dropped {dropped}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.data_path.stat().st_size if self.data_path.exists() else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CachedEncoder:
+    """
+    SentenceTransformer 래퍼: encode() 전에 디스크 캐시 확인
+    - 그 밖의 속성(get_sentence_embedding_dimension 등)은 원본 모델로 위임
+    """
+
+    def __init__(self, model, model_name: str, cache: Optional[DiskEmbeddingCache]):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.cache is None or not texts:
+            return self.model.encode(sentences, normalize_embeddings=normalize_embeddings, **kwargs)
+
+        kwargs["convert_to_numpy"] = True
+        variant = ":norm" if normalize_embeddings else ""
+        keys = [text_key(self.model_name, "float32", t, variant) for t in texts]
+        vecs = self.cache.get_or_compute(
+            keys,
+            lambda miss: self.model.encode(
+                [texts[i] for i in miss], normalize_embeddings=normalize_embeddings, **kwargs
+            ),
+        )
+        return vecs[0] if single else vecs
+
+
+_default_cache: Optional[DiskEmbeddingCache] = None
+
+
+def get_disk_cache() -> DiskEmbeddingCache:
+    """EMBED_CACHE_DIR 의 프로세스 공용 캐시"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DiskEmbeddingCache()
+    return _default_cache
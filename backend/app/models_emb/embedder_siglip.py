@@ -5,12 +5,19 @@ SigLIP 기반 멀티모달 임베딩 유틸
 - 통합 forward가 아닌 전용 함수(get_*_features) 사용으로 안전화
 """
 
-from typing import List
+import os
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 import torch
 import numpy as np
 from PIL import Image
 from transformers import SiglipProcessor, SiglipModel
 
+from .cpu_backend import check_backend, configure_threads, quantize_int8
+from .disk_cache import DiskEmbeddingCache, image_key, text_key
+
+# 한 번의 이미지 forward 에 넣을 최대 장수 (GPU/CPU 메모리 예산)
+SIGLIP_IMAGE_BATCH = int(os.getenv("SIGLIP_IMAGE_BATCH", "64"))
+
 
 class UnifiedEmbedder:
     """
@@ -25,7 +32,19 @@ class UnifiedEmbedder:
         device: str = "cuda",
         dtype: str = "float16",
         normalize: bool = True,
+        cache: Optional[DiskEmbeddingCache] = None,
+        backend: str = "torch",
     ):
+        self.model_name = model_name
+        self.backend = check_backend(backend)
+        if self.backend == "int8":
+            # dynamic int8 은 CPU float32 모델에만 적용 가능 (cpu_backend 참고)
+            device, dtype = "cpu", "float32"
+        self.cache = cache   # 디스크 임베딩 캐시 (인제스터에서 주입)
+        self.cache_tag = f"{dtype.lower()}:{'norm' if normalize else 'raw'}"
+        if self.backend != "torch":
+            self.cache_tag += f":{self.backend}"
+
         # 디바이스/정규화
         self.device = torch.device(device if (device == "cpu" or torch.cuda.is_available()) else "cpu")
         self.normalize = normalize
@@ -42,6 +61,10 @@ class UnifiedEmbedder:
         self.processor = SiglipProcessor.from_pretrained(model_name)
         self.model = SiglipModel.from_pretrained(model_name, torch_dtype=self.dtype)
         self.model.to(self.device).eval()
+        if self.device.type == "cpu":
+            configure_threads()
+        if self.backend == "int8":
+            quantize_int8(self.model)
 
         # 임베딩 차원: config.projection_dim 사용 (없으면 추후 첫 임베딩 시 확정)
         self.embed_dim = int(getattr(self.model.config, "projection_dim", 0)) or 0
@@ -49,11 +72,41 @@ class UnifiedEmbedder:
     # -----------------------------
     # 텍스트 임베딩
     # -----------------------------
-    @torch.inference_mode()
     def embed_texts(self, texts: List[str]) -> np.ndarray:
         if len(texts) == 0:
             return np.empty((0, self.embed_dim or 0), dtype=np.float32)
+        if self.cache is None:
+            return self._embed_texts_by_length(texts)
+
+        keys = [text_key(self.model_name, self.cache_tag, t) for t in texts]
+        return self.cache.get_or_compute(
+            keys, lambda miss: self._embed_texts_by_length([texts[i] for i in miss])
+        )
+
+    def _embed_texts_by_length(self, texts: List[str]) -> np.ndarray:
+        """
+        토큰 길이가 같은 텍스트끼리만 묶어서 인코딩
+        - SigLIP 텍스트 타워는 마지막 토큰 위치로 pooling 해서 padding 이 섞이면 벡터가 달라짐
+          → 길이별로 묶으면 padding 없이 배치 처리되고 결과는 한 문장씩 넣을 때와 같다
+          (micro-batch 로 섞인 쿼리, 디스크 캐시에 저장되는 벡터 모두 배치 구성과 무관해짐)
+        """
+        lengths = [
+            len(ids) for ids in self.processor.tokenizer(texts, truncation=True)["input_ids"]
+        ]
+        groups: dict = {}
+        for i, n in enumerate(lengths):
+            groups.setdefault(n, []).append(i)
+
+        out: np.ndarray | None = None
+        for idxs in groups.values():
+            emb = self._forward_texts([texts[i] for i in idxs])
+            if out is None:
+                out = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+            out[idxs] = emb
+        return out
 
+    @torch.inference_mode()
+    def _forward_texts(self, texts: List[str]) -> np.ndarray:
         # tokenizer → ids, mask
         enc = self.processor(
             text=texts,
@@ -87,11 +140,19 @@ class UnifiedEmbedder:
     # -----------------------------
     # 이미지 임베딩
     # -----------------------------
-    @torch.inference_mode()
     def embed_images(self, images: List[Image.Image]) -> np.ndarray:
         if len(images) == 0:
             return np.empty((0, self.embed_dim or 0), dtype=np.float32)
+        if self.cache is None:
+            return self._forward_images(images)
+
+        keys = [image_key(self.model_name, self.cache_tag, img) for img in images]
+        return self.cache.get_or_compute(
+            keys, lambda miss: self._forward_images([images[i] for i in miss])
+        )
 
+    @torch.inference_mode()
+    def _forward_images(self, images: List[Image.Image]) -> np.ndarray:
         # processor → pixel_values
         enc = self.processor(
             images=images,
@@ -133,5 +194,128 @@ class UnifiedEmbedder:
             fused = fused / denom
         return fused
 
+    # -----------------------------
+    # 여러 세션 한 번에: 텍스트 중복 제거 + 세션 간 이미지 배치
+    # -----------------------------
+    def embed_sessions_fused(
+        self,
+        texts: List[str],
+        images_per_session: List[List[Image.Image]],
+        max_batch_images: int = SIGLIP_IMAGE_BATCH,
+    ) -> np.ndarray:
+        """
+        세션 S 개의 (요약 텍스트, 키프레임들) → 세션별 mean-fused 벡터 (S, D)
+        - 결과는 세션마다 embed_pair_and_fuse([text]*N, images) 평균 후 L2 정규화한 것과 같음
+        - 같은 텍스트는 한 번만 텍스트 타워 통과
+        - 이미지는 세션 경계와 상관없이 max_batch_images 장씩 꽉 채워서 forward
+        """
+        assert len(texts) == len(images_per_session), "세션 수가 다릅니다."
+        n_sessions = len(texts)
+        if n_sessions == 0:
+            return np.empty((0, self.embed_dim or 0), dtype=np.float32)
+
+        uniq: dict = {}
+        text_idx = np.array([uniq.setdefault(t, len(uniq)) for t in texts], dtype=np.int64)
+        te = self.embed_texts(list(uniq))
+
+        owners = np.array(
+            [i for i, imgs in enumerate(images_per_session) for _ in imgs], dtype=np.int64
+        )
+        flat = [img for imgs in images_per_session for img in imgs]
+
+        sums = np.zeros((n_sessions, te.shape[1]), dtype=np.float32)
+        counts = np.zeros(n_sessions, dtype=np.float32)
+        for start in range(0, len(flat), max_batch_images):
+            own = owners[start:start + max_batch_images]
+            ie = self.embed_images(flat[start:start + max_batch_images])
+            fused = (te[text_idx[own]] + ie) / 2.0
+            if self.normalize:
+                fused = fused / (np.linalg.norm(fused, axis=1, keepdims=True) + 1e-12)
+            np.add.at(sums, own, fused)
+            np.add.at(counts, own, 1.0)
+
+        means = sums / np.maximum(counts, 1.0)[:, None]
+        return means / np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)
+
+    def _fused_batch(self, buf: List[Tuple[Any, str, List[Image.Image]]], max_batch_images: int):
+        """
+        세션 묶음 하나 → (key, 벡터) 목록
+        - 묶음 전체가 실패하면(깨진 이미지, OOM 등) 세션 하나씩 다시 임베딩해서
+          실패한 세션만 [ERR] 로그 후 건너뜀 (나머지 세션은 그대로 색인되게)
+        """
+        try:
+            vecs = self.embed_sessions_fused([b[1] for b in buf], [b[2] for b in buf], max_batch_images)
+            return list(zip((b[0] for b in buf), vecs))
+        except Exception as e:
+            if len(buf) == 1:
+                print(f"[ERR] session={buf[0][0]} embed fail: {e}")
+                return []
+            print(f"[WARN] batch of {len(buf)} sessions failed ({e}) → retrying one by one")
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+        out = []
+        for key, text, images in buf:
+            try:
+                vec = self.embed_sessions_fused([text], [images], max_batch_images)[0]
+            except Exception as e:
+                print(f"[ERR] session={key} embed fail: {e}")
+                continue
+            out.append((key, vec))
+        return out
+
+    def iter_sessions_fused(
+        self,
+        items: Iterable[Tuple[Any, str, List[Image.Image]]],
+        max_batch_images: int = SIGLIP_IMAGE_BATCH,
+    ) -> Iterator[Tuple[Any, np.ndarray]]:
+        """
+        (key, text, images) 스트림을 이미지 max_batch_images 장 단위로 모아서 embed_sessions_fused
+        → (key, 벡터) 를 차례로 반환 (인제스터에서 디코딩 파이프라인 뒤에 붙여 씀)
+        - 임베딩에 실패한 세션은 결과에서 빠짐 (_fused_batch)
+        """
+        buf: List[Tuple[Any, str, List[Image.Image]]] = []
+        n_images = 0
+        for item in items:
+            buf.append(item)
+            n_images += len(item[2])
+            if n_images >= max_batch_images:
+                yield from self._fused_batch(buf, max_batch_images)
+                buf, n_images = [], 0
+        if buf:
+            yield from self._fused_batch(buf, max_batch_images)
+
+    def iter_image_groups(
+        self,
+        items: Iterable[Tuple[Any, List[Image.Image]]],
+        max_batch_images: int = SIGLIP_IMAGE_BATCH,
+    ) -> Iterator[Tuple[Any, np.ndarray]]:
+        """
+        (key, images) 스트림 → (key, 이미지 임베딩 평균 후 L2 정규화 벡터)
+        - 구간(segment) 처럼 그룹당 이미지가 1~2장이면 그룹 여러 개를 모아서
+          max_batch_images 장 단위로 forward (iter_sessions_fused 와 같은 방식, 텍스트 없음)
+        """
+        buf: List[Tuple[Any, List[Image.Image]]] = []
+        n_images = 0
+
+        def flush():
+            owners = np.array([i for i, (_, imgs) in enumerate(buf) for _ in imgs], dtype=np.int64)
+            ie = self.embed_images([img for _, imgs in buf for img in imgs])
+            sums = np.zeros((len(buf), ie.shape[1]), dtype=np.float32)
+            np.add.at(sums, owners, ie)
+            sums /= np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            return zip((b[0] for b in buf), sums)
+
+        for item in items:
+            if not item[1]:
+                continue
+            buf.append(item)
+            n_images += len(item[1])
+            if n_images >= max_batch_images:
+                yield from flush()
+                buf, n_images = [], 0
+        if buf:
+            yield from flush()
+
     def get_dim(self) -> int:
         return int(self.embed_dim)
@@ -1,9 +1,27 @@
 from sentence_transformers import SentenceTransformer
 
-def load_distil():
+from .cpu_backend import EMBED_BACKEND, backend_model_id, check_backend, configure_threads, quantize_int8
+
+DISTIL_MODEL_NAME = "sentence-transformers/distiluse-base-multilingual-cased-v1"
+KOE5_MODEL_NAME = "nlpai-lab/KoE5"
+
+def _load(model_name: str, backend: str = EMBED_BACKEND) -> SentenceTransformer:
+    check_backend(backend)
+    configure_threads()
+    if backend == "int8":
+        # CPU 전용: Linear 가중치 int8 (cpu_backend 참고)
+        model = quantize_int8(SentenceTransformer(model_name, device="cpu"))
+    else:
+        model = SentenceTransformer(model_name)
+    # 쿼리/디스크 임베딩 캐시 키로 사용 (백엔드가 다르면 벡터도 조금 다르니 키도 구분)
+    model.model_name = backend_model_id(model_name, backend)
+    model.backend = backend
+    return model
+
+def load_distil(backend: str = EMBED_BACKEND):
     """50개 후보 검색용 (빠른 모델)"""
-    return SentenceTransformer("sentence-transformers/distiluse-base-multilingual-cased-v1")
+    return _load(DISTIL_MODEL_NAME, backend)
 
-def load_koe5():
+def load_koe5(backend: str = EMBED_BACKEND):
     """rerank 용 (정확도 높은 모델)"""
-    return SentenceTransformer("nlpai-lab/KoE5")
+    return _load(KOE5_MODEL_NAME, backend)
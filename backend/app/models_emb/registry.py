@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+프로세스 공용 모델 레지스트리
+- 모델마다 factory 만 등록해두고 처음 get() 할 때 한 번만 로드 (import 시점에는 아무것도 안 받음)
+- warm_up(): 서버 시작 시 미리 로드 + 더미 추론 한 번 (CUDA 커널/토크나이저 초기화까지)
+- stats(): 모델별 로드 시간, 파라미터 메모리, 디바이스 → /api/ready 에서 노출
+    distil  distiluse (1차 후보 검색)
+    koe5    KoE5 (rerank)
+    siglip  SigLIP so400m (이미지-텍스트 fused 검색, 인제스트)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+SIGLIP_MODEL_NAME = "google/siglip-so400m-patch14-384"
+SIGLIP_DEVICE = os.getenv("SIGLIP_DEVICE", "cuda")
+SIGLIP_DTYPE = os.getenv("SIGLIP_DTYPE", "float16")
+
+# 서버 시작 시 미리 올릴 모델 (쉼표 구분, 비우면 전부 lazy)
+WARMUP_MODELS = [m.strip() for m in os.getenv("MODEL_WARMUP_MODELS", "distil,koe5,siglip").split(",") if m.strip()]
+
+
+def _module_of(model) -> Any:
+    """파라미터를 가진 torch 모듈 (SentenceTransformer 자체 또는 UnifiedEmbedder.model)"""
+    return model if hasattr(model, "parameters") else getattr(model, "model", None)
+
+
+def _param_bytes(model) -> Optional[int]:
+    module = _module_of(model)
+    if module is None or not hasattr(module, "parameters"):
+        return None
+    total = sum(p.numel() * p.element_size() for p in module.parameters())
+    total += sum(b.numel() * b.element_size() for b in module.buffers())
+    return int(total)
+
+
+def _device_of(model) -> Optional[str]:
+    module = _module_of(model)
+    try:
+        return str(next(module.parameters()).device)
+    except (AttributeError, StopIteration, TypeError):
+        return None
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warmers: Dict[str, Optional[Callable[[Any], None]]] = {}
+        self._models: Dict[str, Any] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+        self.warmup_error: Optional[str] = None
+
+    def register(self, name: str, factory: Callable[[], Any], warmup: Optional[Callable[[Any], None]] = None) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._warmers[name] = warmup
+            self._locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._factories:
+            raise KeyError(f"unknown model: {name}")
+        with self._locks[name]:   # 같은 모델을 두 스레드가 동시에 로드하지 않게
+            model = self._models.get(name)
+            if model is None:
+                t0 = time.perf_counter()
+                model = self._factories[name]()
+                load_s = time.perf_counter() - t0
+                self._info[name] = {
+                    "load_seconds": round(load_s, 3),
+                    "param_bytes": _param_bytes(model),
+                    "device": _device_of(model),
+                }
+                self._models[name] = model
+                print(f"[INFO] model loaded: {name} ({load_s:.1f}s, {self._info[name]['device']})")
+        return model
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """로드 + 더미 추론. 끝나면 ready 설정 (실패하면 warmup_error 만 기록, ready 는 안 됨)"""
+        names = list(names) if names is not None else WARMUP_MODELS
+        try:
+            for name in names:
+                model = self.get(name)
+                warmer = self._warmers.get(name)
+                if warmer is not None:
+                    t0 = time.perf_counter()
+                    warmer(model)
+                    self._info[name]["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+        except Exception as e:
+            self.warmup_error = f"{type(e).__name__}: {e}"
+            print(f"[ERR] model warm-up failed: {self.warmup_error}")
+            return
+        self.ready.set()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"loaded": name in self._models, **self._info.get(name, {})}
+            for name in self._factories
+        }
+
+
+# -----------------------------
+# 기본 모델 등록 (무거운 import 는 factory 안에서)
+# -----------------------------
+def _load_distil():
+    from .loader import load_distil
+    return load_distil()
+
+
+def _load_koe5():
+    from .loader import load_koe5
+    return load_koe5()
+
+
+def _load_siglip():
+    from .cpu_backend import EMBED_BACKEND
+    from .embedder_siglip import UnifiedEmbedder
+    return UnifiedEmbedder(
+        SIGLIP_MODEL_NAME, device=SIGLIP_DEVICE, dtype=SIGLIP_DTYPE, normalize=True, backend=EMBED_BACKEND
+    )
+
+
+def _warm_sentence_model(model) -> None:
+    model.encode(["warm up"], normalize_embeddings=True)
+
+
+def _warm_siglip(model) -> None:
+    model.embed_texts(["warm up"])
+
+
+registry = ModelRegistry()
+registry.register("distil", _load_distil, _warm_sentence_model)
+registry.register("koe5", _load_koe5, _warm_sentence_model)
+registry.register("siglip", _load_siglip, _warm_siglip)
+
+
+def get_model(name: str) -> Any:
+    return registry.get(name)
+
+
+def get_ingest_siglip():
+    """인제스트용 SigLIP: 공용 인스턴스에 디스크 임베딩 캐시를 붙여서 (재인제스트 시 같은 텍스트/프레임은 추론 생략)"""
+    from .disk_cache import get_disk_cache
+    model = registry.get("siglip")
+    if model.cache is None:
+        model.cache = get_disk_cache()
+    return model
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+프로세스 내 ANN 인덱스 (ES kNN 대체용)
+- ES 인덱스 하나당 디렉토리 하나: ANN_INDEX_DIR/<index>/
+    ids.json            문서 _id 목록 (행 번호 = 위치)
+    sources.json        화면 필드(_source 에서 벡터 제외)
+    <field>.npy         정규화된 float32 벡터 (N, D) → 시작 시 mmap
+    <field>.hnsw        hnswlib 그래프 (설치돼 있을 때만)
+- hnswlib 이 없으면 mmap 행렬에 대한 exact 검색으로 동작 (소규모/테스트용)
+- 빌드: 인제스터가 채운 ES 인덱스를 scan 해서 덤프
+    python -m app.services.ann_index embeddings_text embedding_distiluse embedding_koe5
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # 선택 의존성
+    hnswlib = None
+
+ANN_INDEX_DIR = Path(os.getenv("ANN_INDEX_DIR", str(Path(__file__).resolve().parents[1] / "data" / "ann")))
+HNSW_M = int(os.getenv("ANN_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "200"))
+
+_warned_exact = False
+
+
+def _warn_exact_once(reason: str) -> None:
+    """exact 검색 폴백은 대규모에서 느리므로 프로세스당 한 번 경고"""
+    global _warned_exact
+    if not _warned_exact:
+        _warned_exact = True
+        print(f"[WARN] local ANN falls back to exact (brute-force) search: {reason}")
+
+
+def _l2_normalize_rows(mat: np.ndarray) -> np.ndarray:
+    denom = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
+    return (mat / denom).astype(np.float32)
+
+
+class LocalAnnIndex:
+    """ES 인덱스 하나의 로컬 사본 (여러 dense_vector 필드 공유)"""
+
+    def __init__(self, path: Path, ids: List[str], sources: List[Dict[str, Any]]):
+        self.path = Path(path)
+        self.ids = ids
+        self.sources = sources
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._graphs: Dict[str, Any] = {}
+
+    # -----------------------------
+    # 저장 / 로드
+    # -----------------------------
+    @classmethod
+    def build(
+        cls,
+        path: Path,
+        ids: List[str],
+        sources: List[Dict[str, Any]],
+        vectors: Dict[str, np.ndarray],
+    ) -> "LocalAnnIndex":
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "ids.json", "w", encoding="utf-8") as f:
+            json.dump(ids, f, ensure_ascii=False)
+        with open(path / "sources.json", "w", encoding="utf-8") as f:
+            json.dump(sources, f, ensure_ascii=False)
+
+        for field, mat in vectors.items():
+            mat = _l2_normalize_rows(np.asarray(mat, dtype=np.float32))
+            np.save(path / f"{field}.npy", mat)
+            if hnswlib is not None and len(mat):
+                graph = hnswlib.Index(space="ip", dim=mat.shape[1])
+                graph.init_index(max_elements=len(mat), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+                graph.add_items(mat, np.arange(len(mat)))
+                graph.save_index(str(path / f"{field}.hnsw"))
+            print(f"[INFO] ann index saved: {path.name}/{field} ({len(mat)} vectors)")
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalAnnIndex":
+        path = Path(path)
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        with open(path / "sources.json", "r", encoding="utf-8") as f:
+            sources = json.load(f)
+        return cls(path, ids, sources)
+
+    def vectors(self, field: str) -> np.ndarray:
+        mat = self._vectors.get(field)
+        if mat is None:
+            mat = np.load(self.path / f"{field}.npy", mmap_mode="r")
+            self._vectors[field] = mat
+        return mat
+
+    def has_field(self, field: str) -> bool:
+        return field in self._vectors or (self.path / f"{field}.npy").exists()
+
+    def _graph(self, field: str):
+        if hnswlib is None:
+            _warn_exact_once("hnswlib is not installed (pip install hnswlib)")
+            return None
+        if field not in self._graphs:
+            graph_path = self.path / f"{field}.hnsw"
+            graph = None
+            if graph_path.exists():
+                mat = self.vectors(field)
+                graph = hnswlib.Index(space="ip", dim=mat.shape[1])
+                graph.load_index(str(graph_path), max_elements=len(mat))
+            else:
+                _warn_exact_once(f"no HNSW graph for {field} (rebuild the ANN index)")
+            self._graphs[field] = graph
+        return self._graphs[field]
+
+    # -----------------------------
+    # 검색
+    # -----------------------------
+    def search(self, field: str, query_vec: Sequence[float], k: int, num_candidates: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+        """(행 번호, cosine) 를 유사도 내림차순으로 반환"""
+        q = np.asarray(query_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-12)
+        n = len(self.ids)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        graph = self._graph(field)
+        if graph is not None:
+            graph.set_ef(max(num_candidates, k))
+            labels, dists = graph.knn_query(q, k=k)
+            return labels[0].astype(np.int64), (1.0 - dists[0]).astype(np.float32)
+
+        # exact: mmap 행렬 × 쿼리
+        scores = self.vectors(field) @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def source(self, row: int, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        src = self.sources[row]
+        if fields is None:
+            return dict(src)
+        out = {}
+        for f in fields:
+            if f in src:
+                out[f] = src[f]
+            elif self.has_field(f):
+                # 벡터 필드는 mmap 행에서 꺼냄
+                out[f] = self.vectors(f)[row].tolist()
+        return out
+
+
+_loaded: Dict[str, LocalAnnIndex] = {}
+
+
+def get_ann_index(index: str) -> LocalAnnIndex:
+    """ES 인덱스명 → 로드된 LocalAnnIndex (프로세스당 한 번만 로드)"""
+    ann = _loaded.get(index)
+    if ann is None:
+        ann = LocalAnnIndex.load(ANN_INDEX_DIR / index)
+        _loaded[index] = ann
+    return ann
+
+
+def build_from_es(index: str, vector_fields: Sequence[str], out_dir: Path = ANN_INDEX_DIR) -> LocalAnnIndex:
+    """인제스터가 채운 ES 인덱스를 scan 해서 로컬 ANN 인덱스로 저장"""
+    from elasticsearch import helpers
+    from ..es.client import get_client
+
+    es = get_client()
+    ids: List[str] = []
+    sources: List[Dict[str, Any]] = []
+    vecs: Dict[str, List[List[float]]] = {f: [] for f in vector_fields}
+
+    for doc in helpers.scan(es, index=index, query={"query": {"match_all": {}}}):
+        src = doc.get("_source", {})
+        if any(src.get(f) is None for f in vector_fields):
+            continue
+        ids.append(doc["_id"])
+        for f in vector_fields:
+            vecs[f].append(src.pop(f))
+        # 나머지 dense_vector 는 화면 필드가 아니므로 버림
+        sources.append({k: v for k, v in src.items() if not k.startswith("embedding_")})
+
+    if not ids:
+        raise ValueError(f"index {index} has no documents with fields {list(vector_fields)}")
+
+    mats = {f: np.asarray(v, dtype=np.float32) for f, v in vecs.items()}
+    return LocalAnnIndex.build(Path(out_dir) / index, ids, sources, mats)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python -m app.services.ann_index <es_index> <vector_field> [<vector_field> ...]")
+        sys.exit(1)
+    build_from_es(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+쿼리 임베딩 캐시 (LRU + TTL)
+- 키: (모델 id, 정규화된 쿼리 문자열)
+- 엔트리 수 / 전체 바이트 수 둘 다 상한을 두고 LRU 로 밀어냄
+- hit / miss / eviction 카운터 제공
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "4096"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # 초, 0 이하면 만료 없음
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """유니코드 NFC + 앞뒤 공백 제거 + 연속 공백 1칸"""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def model_key(model) -> str:
+    """캐시 키에 쓸 모델 식별자 (loader / UnifiedEmbedder 가 model_name 을 달아둔다)"""
+    name = getattr(model, "model_name", None)
+    if name:
+        return str(name)
+    return f"{type(model).__name__}@{id(model):x}"
+
+
+class QueryEmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_bytes(key: Tuple[str, str], vec: np.ndarray) -> int:
+        # 벡터 본문 + 키 문자열 대략치
+        return int(vec.nbytes) + len(key[0]) + len(key[1].encode("utf-8"))
+
+    def _pop(self, key) -> None:
+        _, vec = self._data.pop(key)
+        self._bytes -= self._entry_bytes(key, vec)
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        key = (model_id, normalize_query(text))
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, vec = item
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, model_id: str, text: str, vec: np.ndarray) -> None:
+        key = (model_id, normalize_query(text))
+        vec = np.asarray(vec, dtype=np.float32)
+        vec.setflags(write=False)  # 공유 객체라 호출자가 수정하지 못하게
+        size = self._entry_bytes(key, vec)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic(), vec)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, model_id: str, text: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """캐시 키와 같은 정규화 텍스트로 계산 → 같은 키는 먼저 온 쿼리 표기와 상관없이 같은 벡터"""
+        vec = self.get(model_id, text)
+        if vec is None:
+            vec = np.asarray(compute(normalize_query(text)), dtype=np.float32)
+            self.put(model_id, text, vec)
+        return vec
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else None,
+        }
+
+
+# 프로세스 전역 쿼리 캐시
+query_cache = QueryEmbeddingCache()
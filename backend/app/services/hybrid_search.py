@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+BM25(text 필드) + kNN 하이브리드 검색 (ES 요청 한 번)
+- HYBRID_FUSION
+    "rrf"      → retriever.rrf 로 두 순위를 ES 안에서 합침 (점수 스케일 무관, ES 8.14+)
+    "weighted" → query(match) + knn 을 같은 요청에 넣고 boost 가중합
+                 (BM25 점수는 상한이 없어서 HYBRID_BM25_WEIGHT 를 작게 두는 게 보통)
+- RRF 를 지원하지 않는 클러스터면 첫 실패 때 한 번만 경고하고 이후 weighted 로 동작
+  (오류 내용이 retriever/RRF 미지원일 때만. 잘못된 쿼리, 벡터 차원 불일치 같은 다른 400 은 그대로 올림)
+- 로컬 ANN 백엔드에는 BM25 가 없으므로 하이브리드는 항상 ES 로 보냄
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from elasticsearch import AuthorizationException, BadRequestError
+
+from app.es.client import get_client
+from app.es.index_profile import project_query
+
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", "0.2"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))     # RRF rank_constant
+TEXT_FIELD = "text"
+
+_rrf_supported = True
+
+# retriever 문법이 없는 구버전(8.14 미만) / RRF 라이선스가 없는 클러스터의 오류 문구
+_RRF_UNSUPPORTED_MARKERS = (
+    "unknown field [retriever]",
+    "unknown key for a start_object in [retriever]",
+    "unknown retriever",
+    "reciprocal rank fusion",
+)
+
+
+def _rrf_unsupported(err: Exception) -> bool:
+    msg = str(err).lower()
+    if isinstance(err, AuthorizationException):   # 403 은 라이선스 문제일 때만
+        return "license" in msg and ("rrf" in msg or "reciprocal rank fusion" in msg)
+    return any(m in msg for m in _RRF_UNSUPPORTED_MARKERS)
+
+
+def build_hybrid_body(
+    text: str,
+    field: str,
+    query_vector: Sequence[float],
+    k: int,
+    num_candidates: int,
+    source_fields: Optional[Sequence[str]],
+    fusion: str,
+    bm25_weight: float = HYBRID_BM25_WEIGHT,
+) -> Dict[str, Any]:
+    knn = {"field": field, "query_vector": query_vector, "k": k, "num_candidates": num_candidates}
+    if fusion == "rrf":
+        body: Dict[str, Any] = {
+            "retriever": {
+                "rrf": {
+                    "retrievers": [
+                        {"standard": {"query": {"match": {TEXT_FIELD: {"query": text}}}}},
+                        {"knn": knn},
+                    ],
+                    "rank_window_size": k,
+                    "rank_constant": HYBRID_RRF_K,
+                }
+            },
+            "size": k,
+        }
+    else:
+        body = {
+            "query": {"match": {TEXT_FIELD: {"query": text, "boost": bm25_weight}}},
+            "knn": {**knn, "boost": 1.0 - bm25_weight},
+            "size": k,
+        }
+    if source_fields is not None:
+        body["_source"] = list(source_fields)
+    return body
+
+
+def hybrid_search(
+    index: str,
+    text: str,
+    field: str,
+    query_vector: Sequence[float],
+    k: int = 50,
+    num_candidates: int = 100,
+    source_fields: Optional[Sequence[str]] = None,
+    fusion: str = HYBRID_FUSION,
+) -> List[Dict[str, Any]]:
+    """ES hits 목록 (search_backend.knn 과 같은 모양)"""
+    global _rrf_supported
+    qv = project_query(field, query_vector)   # PCA 투영 프로파일이면 인덱스와 같은 공간으로
+    es = get_client()
+    if fusion == "rrf" and _rrf_supported:
+        try:
+            body = build_hybrid_body(text, field, qv, k, num_candidates, source_fields, "rrf")
+            return es.search(index=index, body=body)["hits"]["hits"]
+        except (BadRequestError, AuthorizationException) as e:   # 구버전(400) / 라이선스(403)
+            if not _rrf_unsupported(e):
+                raise
+            _rrf_supported = False
+            print(f"[WARN] RRF retriever not available, falling back to weighted hybrid: {e}")
+    body = build_hybrid_body(text, field, qv, k, num_candidates, source_fields, "weighted")
+    return es.search(index=index, body=body)["hits"]["hits"]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+모델 추론 전용 bounded executor
+- async 엔드포인트에서 encode() 같은 블로킹 추론을 이벤트 루프 밖으로 뺀다
+- 워커 수 + 대기열 깊이를 제한해서, 밀리면 바로 실패(503)시키는 backpressure
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "8"))  # 실제 forward 는 micro_batcher 스레드가 모델별로 1개씩
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "16"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))  # 초
+
+
+class ExecutorOverloaded(RuntimeError):
+    """실행 중 + 대기 중 작업이 한도를 넘었을 때"""
+
+    def __init__(self, retry_after: int = INFERENCE_RETRY_AFTER):
+        super().__init__("inference executor overloaded")
+        self.retry_after = retry_after
+
+
+class BoundedInferenceExecutor:
+    """
+    ThreadPoolExecutor + 세마포어
+    - max_workers: 동시에 추론하는 스레드 수 (모델 인스턴스 공유)
+    - max_queue:   워커가 바쁠 때 기다릴 수 있는 작업 수
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """실행 중 + 대기 중 작업 수"""
+        return self._pending
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        # 자리가 없으면 기다리지 않고 바로 거절
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorOverloaded()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """이벤트 루프에서 await 가능한 형태로 실행"""
+        future = self.submit(functools.partial(fn, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# 프로세스 전역 추론 executor
+inference_executor = BoundedInferenceExecutor()
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await inference_executor.run(fn, *args, **kwargs)
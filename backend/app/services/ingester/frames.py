@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+영상 프레임 디코딩 유틸 + 멀티프로세스 디코딩 파이프라인
+- 키프레임마다 CAP_PROP_POS_FRAMES 로 seek 하던 것을 순차 grab() 으로 대체
+  (간격이 아주 멀 때만 seek)
+- iter_decoded(): 디코더 프로세스 풀이 앞서서 디코딩해두고(개수 제한),
+  메인 프로세스는 끝난 순서대로 받아 임베딩 → 디코딩과 추론이 겹쳐서 진행
+- KEYFRAME_MODE=scene: 균등 n 장 대신 화면이 바뀐 지점만 골라서 (세션당 최대 n 장)
+  → 가만히 있는 "대기" 구간이 긴 세션은 임베딩할 프레임 수가 줄어듦
+"""
+
+import heapq
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DECODE_WORKERS = int(os.getenv("INGEST_DECODE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+DECODE_MAX_PENDING = int(os.getenv("INGEST_DECODE_MAX_PENDING", str(DECODE_WORKERS * 4)))
+SEEK_GAP = int(os.getenv("INGEST_SEEK_GAP", "300"))   # 이보다 멀리 떨어진 프레임만 seek, 나머지는 grab
+INGEST_PREVIEWS = os.getenv("INGEST_PREVIEWS", "0") == "1"   # 키프레임 스프라이트/프리뷰 mp4 생성 여부 (ffmpeg 인코딩이 디코더를 잡아먹어 기본 끔)
+
+# 키프레임 선택: "uniform" → 균등 n 장 (기존), "scene" → 장면 변화 지점 최대 n 장
+KEYFRAME_MODE = os.getenv("KEYFRAME_MODE", "uniform")
+SCENE_PROBE_FPS = float(os.getenv("SCENE_PROBE_FPS", "2"))          # 변화 감지용으로 초당 몇 장 볼지
+SCENE_THUMB_W = int(os.getenv("SCENE_THUMB_W", "64"))               # 비교용 축소 흑백 썸네일 폭
+SCENE_DIFF_THRESHOLD = float(os.getenv("SCENE_DIFF_THRESHOLD", "0.08"))   # 평균 절대 차이 (0~1)
+
+
+def _to_image(frame: np.ndarray, target_w: int, target_h: int) -> Image.Image:
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(frame).resize((target_w, target_h))
+
+
+def read_first_frame(video_path: str, target_w: int = 384, target_h: int = 384) -> Image.Image | None:
+    cap = cv2.VideoCapture(video_path)
+    ok, frame = cap.read()
+    cap.release()
+    if not ok or frame is None:
+        return None
+    return _to_image(frame, target_w, target_h)
+
+
+def read_frames_at(cap, idxs: Sequence[int]) -> List[Tuple[int, np.ndarray]]:
+    """
+    정렬된 프레임 번호들을 순차 디코딩으로 읽음 (BGR 원본 프레임)
+    - 다음 목표까지는 grab() 만 (색변환/복사 없음), 목표 프레임에서만 retrieve()
+    """
+    return list(iter_frames_at(cap, idxs))
+
+
+def iter_frames_at(cap, idxs: Sequence[int]) -> Iterator[Tuple[int, np.ndarray]]:
+    """read_frames_at 의 제너레이터 버전 (프레임을 한꺼번에 들고 있지 않음)"""
+    pos = 0
+    for idx in idxs:
+        idx = int(idx)
+        if idx < pos or idx - pos > SEEK_GAP:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            pos = idx
+        while pos < idx:
+            if not cap.grab():
+                return
+            pos += 1
+        ok = cap.grab()
+        pos += 1
+        if not ok:
+            continue
+        ok, frame = cap.retrieve()
+        if ok and frame is not None:
+            yield idx, frame
+
+
+def read_n_raw_frames_evenly(video_path: str, n: int = 10) -> List[np.ndarray]:
+    """균등 간격 n 장의 BGR 원본 프레임 (리사이즈 전, 스프라이트 등에서 원본 비율이 필요할 때)"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return []
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total_frames <= 0:
+            return []
+        n_eff = min(n, total_frames)
+        idxs = np.linspace(0, total_frames - 1, num=n_eff, dtype=int)
+        return [frame for _, frame in read_frames_at(cap, idxs)]
+    finally:
+        cap.release()
+
+
+def _thumb(frame: np.ndarray, width: int) -> np.ndarray:
+    """장면 비교용 축소 흑백 썸네일 (0~1 float32)"""
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+
+
+def read_scene_raw_frames(
+    video_path: str,
+    budget: int = 10,
+    probe_fps: float = SCENE_PROBE_FPS,
+    threshold: float = SCENE_DIFF_THRESHOLD,
+    thumb_w: int = SCENE_THUMB_W,
+) -> List[np.ndarray]:
+    """
+    장면 변화 지점의 BGR 원본 프레임 (시간순, 최대 budget 장)
+    - 초당 probe_fps 장만 디코딩해서 축소 흑백 썸네일로 비교 (나머지는 grab 만)
+    - 마지막으로 고른 프레임과 평균 절대 차이가 threshold 를 넘으면 변화 지점
+      (직전 프레임이 아니라 고른 프레임 기준 → 천천히 바뀌는 장면도 누적되면 잡힘)
+    - 첫 프레임은 항상 포함, 변화 지점이 budget 보다 많으면 차이가 큰 순서로 남김
+    - 화면이 거의 안 바뀌는 세션은 1~2 장만 나옴
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return []
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        if total_frames <= 0 or budget <= 0:
+            return []
+        step = max(1, int(round(fps / probe_fps))) if fps > 0 else 1
+        probe = range(0, total_frames, step)
+
+        picked: List[Tuple[float, int, np.ndarray]] = []   # (차이, 프레임 번호, 프레임) min-heap
+        ref = None
+        for idx, frame in iter_frames_at(cap, probe):
+            th = _thumb(frame, thumb_w)
+            if ref is None:
+                score = float("inf")   # 첫 프레임
+            else:
+                score = float(np.mean(np.abs(th - ref)))
+                if score < threshold:
+                    continue
+            item = (score, idx, frame)
+            if len(picked) < budget:
+                heapq.heappush(picked, item)
+            elif heapq.heappushpop(picked, item) is item:
+                continue   # 바로 밀려난 프레임은 기준으로 삼지 않음 (남은 프레임 기준으로 계속 비교)
+            ref = th
+        return [frame for _, _, frame in sorted(picked, key=lambda t: t[1])]
+    finally:
+        cap.release()
+
+
+def keyframe_signature(n: int, mode: str = KEYFRAME_MODE) -> str:
+    """인제스트 fingerprint 용 키프레임 설정 (uniform 은 예전 fingerprint 와 같은 값)"""
+    if mode == "scene":
+        return f"{n}:scene:{SCENE_PROBE_FPS}:{SCENE_THUMB_W}:{SCENE_DIFF_THRESHOLD}"
+    return str(n)
+
+
+def read_n_frames_evenly(
+    video_path: str,
+    n: int = 10,
+    target_w: int = 384,
+    target_h: int = 384,
+    strict: bool = False
+) -> List[Image.Image]:
+    imgs = [_to_image(f, target_w, target_h) for f in read_n_raw_frames_evenly(video_path, n)]
+    if strict and len(imgs) < n:
+        return []
+    return imgs
+
+
+# -----------------------------
+# 멀티프로세스 파이프라인
+# -----------------------------
+def _decode_raw(video_path: str, n: int, mode: str = "uniform") -> List[np.ndarray]:
+    """균등 샘플링(mode="scene" 이면 장면 변화 지점) 실패 시 첫 프레임 폴백 (BGR 원본)"""
+    if mode == "scene":
+        frames = read_scene_raw_frames(video_path, n)
+    else:
+        frames = read_n_raw_frames_evenly(video_path, n)
+    if not frames:
+        cap = cv2.VideoCapture(video_path)
+        ok, frame = cap.read()
+        cap.release()
+        if ok and frame is not None:
+            frames = [frame]
+    return frames
+
+
+def decode_keyframes(task: Tuple, previews: bool = False) -> Tuple[object, Optional[List[np.ndarray]]]:
+    """
+    디코더 프로세스에서 실행: (key, video_path, n, target_w, target_h[, mode]) → (key, RGB uint8 배열 목록)
+    - mode: "uniform" 균등 n 장 / "scene" 장면 변화 지점 최대 n 장 (생략하면 KEYFRAME_MODE)
+    - 샘플링 실패 시 첫 프레임 폴백, 그것도 실패하면 None
+    - PIL 이미지 대신 ndarray 로 돌려줘서 프로세스 간 전달 비용을 줄임
+    - previews=True 면 같은 키프레임으로 스프라이트 + 프리뷰 mp4 도 여기서 생성 (preview_store)
+      이미 영상보다 새 파일이 있으면 건너뜀 → 다시 돌려도 ffmpeg 인코딩은 바뀐 영상만
+    """
+    key, video_path, n, target_w, target_h, *rest = task
+    mode = rest[0] if rest else KEYFRAME_MODE
+    try:
+        frames = _decode_raw(str(video_path), n, mode)
+        if not frames:
+            return key, None
+        if previews:
+            from app.services.preview_store import write_preview_proxy, write_sprite
+            write_sprite(str(video_path), frames)
+            write_preview_proxy(str(video_path))
+        images = [_to_image(f, target_w, target_h) for f in frames]
+    except Exception as e:   # 깨진 영상 하나로 파이프라인 전체가 죽지 않게
+        print(f"[ERR] decode fail {video_path}: {e}")
+        return key, None
+    return key, [np.asarray(img) for img in images]
+
+
+def decode_keyframes_with_previews(task: Tuple) -> Tuple[object, Optional[List[np.ndarray]]]:
+    return decode_keyframes(task, previews=True)
+
+
+def segment_frame_indices(total_frames: int, fps: float, segment_seconds: float,
+                          frames_per_segment: int) -> List[Tuple[int, float, float, List[int]]]:
+    """
+    고정 길이 구간(segment_seconds) 마다 구간 안에서 균등 간격 frames_per_segment 장
+    → [(구간 번호, 시작 초, 끝 초, 프레임 번호들)]
+    """
+    if total_frames <= 0 or fps <= 0:
+        return []
+    seg_len = max(1, int(round(segment_seconds * fps)))
+    out = []
+    for seg_idx, start in enumerate(range(0, total_frames, seg_len)):
+        end = min(start + seg_len, total_frames)
+        n = min(frames_per_segment, end - start)
+        # 구간 양끝이 아니라 n 등분한 칸의 가운데 프레임
+        idxs = sorted({start + int((i + 0.5) * (end - start) / n) for i in range(n)})
+        out.append((seg_idx, start / fps, end / fps, idxs))
+    return out
+
+
+def video_segments(video_path: str, segment_seconds: float,
+                   frames_per_segment: int) -> List[Tuple[int, float, float, List[int]]]:
+    """영상 메타데이터(프레임 수/fps)만 읽어서 segment_frame_indices (디코딩 없음)"""
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        if not cap.isOpened():
+            return []
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    finally:
+        cap.release()
+    return segment_frame_indices(total_frames, fps, segment_seconds, frames_per_segment)
+
+
+def decode_segments(task: Tuple) -> Tuple[object, Optional[List[np.ndarray]], List[Tuple[int, float, float, int]]]:
+    """
+    디코더 프로세스에서 실행:
+        (key, video_path, segment_seconds, frames_per_segment, target_w, target_h[, seg_start, seg_count])
+    → (key, 프레임 RGB 배열 목록, [(구간 번호, 시작 초, 끝 초, 구간 프레임 수)])
+      영상을 못 열거나 디코딩 중 예외면 프레임 목록이 None, 대상 구간 프레임을 하나도 못 읽었으면 빈 목록
+    - seg_start/seg_count 를 주면 그 구간들만 (긴 영상은 인제스터가 구간 묶음 단위로 나눠서 넘김
+      → 결과 하나의 크기 = seg_count × frames_per_segment 장, 프로세스 간 전달/대기 메모리 상한)
+    - 대상 구간의 프레임 번호를 합쳐서 한 번의 순차 디코딩으로 읽음 (첫 프레임까지는 seek)
+    """
+    key, video_path, segment_seconds, frames_per_segment, target_w, target_h, *rest = task
+    seg_start, seg_count = rest if rest else (0, None)
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        if not cap.isOpened():
+            return key, None, []
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        segments = segment_frame_indices(total_frames, fps, segment_seconds, frames_per_segment)
+        end = None if seg_count is None else seg_start + seg_count
+        segments = segments[seg_start:end]
+        wanted = [i for _, _, _, idxs in segments for i in idxs]
+        got = dict(read_frames_at(cap, wanted))
+    except Exception as e:   # 깨진 영상 하나로 파이프라인 전체가 죽지 않게
+        print(f"[ERR] decode fail {video_path}: {e}")
+        return key, None, []
+    finally:
+        cap.release()
+
+    frames: List[np.ndarray] = []
+    meta: List[Tuple[int, float, float, int]] = []
+    for seg_idx, start_s, end_s, idxs in segments:
+        seg_frames = [got[i] for i in idxs if i in got]
+        if not seg_frames:   # 영상 끝부분 등 디코딩 실패 구간은 건너뜀
+            continue
+        frames.extend(np.asarray(_to_image(f, target_w, target_h)) for f in seg_frames)
+        meta.append((seg_idx, start_s, end_s, len(seg_frames)))
+    return key, frames, meta
+
+
+def iter_decoded(
+    tasks: Iterable[Tuple],
+    decode_fn=decode_keyframes,
+    workers: int = DECODE_WORKERS,
+    max_pending: int = DECODE_MAX_PENDING,
+) -> Iterator[Tuple[object, Optional[List[Image.Image]]]]:
+    """
+    tasks 를 디코더 프로세스 풀에 흘려보내고 끝난 순서대로 (key, PIL 이미지 목록[, 메타...]) 반환
+    - 동시에 떠 있는 작업은 max_pending 개까지 (메모리 상한 = bounded queue)
+    """
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    pending.add(pool.submit(decode_fn, next(tasks)))
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key, frames, *extra = fut.result()   # decode_fn 이 메타데이터를 더 돌려주면 그대로 전달
+                yield (key, None if frames is None else [Image.fromarray(f) for f in frames], *extra)
@@ -1,67 +1,123 @@
+import os
+from typing import Dict, List, Tuple
+
 import pandas as pd
 from elasticsearch import helpers
-from elasticsearch.exceptions import RequestError
-from sentence_transformers import SentenceTransformer
 from app.es.client import get_client
+from app.models_emb.disk_cache import CachedEncoder, get_disk_cache
+from app.models_emb.cpu_backend import backend_model_id
+from app.models_emb.loader import DISTIL_MODEL_NAME, KOE5_MODEL_NAME
+from app.models_emb.registry import get_model
+from app.es.index_profile import (
+    PCA_FIT_SAMPLE, dense_vector_mapping, ensure_projection, ensure_vector_index, profile_signature, project,
+)
 from app.services.env_loader import env_loader
+from app.services.vector_store import VectorStoreWriter
+from app.services.session_store import load_sessions
+from app.services.ingester.manifest import IngestManifest, fingerprint, plan_sessions
 
 # 설정
 BASE_DIR = env_loader.env_loader() 
 CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
 INDEX_NAME = "embeddings_text"
+ENCODE_BATCH_SIZE = int(os.getenv("INGEST_ENCODE_BATCH", "64"))   # 모델 한 번 forward 당 문장 수
+BULK_CHUNK_SIZE = int(os.getenv("INGEST_BULK_CHUNK", "500"))      # bulk 요청 하나당 문서 수
 
-#  모델 로드
-koe5 = SentenceTransformer("nlpai-lab/KoE5")
-distiluse = SentenceTransformer("sentence-transformers/distiluse-base-multilingual-cased-v1")
+#  모델 (레지스트리에서 처음 인코딩할 때 로드)
+KOE5_NAME = backend_model_id(KOE5_MODEL_NAME)       # fingerprint 용 (EMBED_BACKEND=int8 이면 "@int8")
+DISTIL_NAME = backend_model_id(DISTIL_MODEL_NAME)
 
-# 각 모델 차원
-DIM_KOE5 = koe5.get_sentence_embedding_dimension()      #  768
-DIM_DISTIL = distiluse.get_sentence_embedding_dimension()  #  512
+# 각 모델 차원 (매핑 생성에 필요 → 모델 로드 없이 상수)
+DIM_KOE5 = 768
+DIM_DISTIL = 512
 
+_encoders: Tuple[CachedEncoder, CachedEncoder] | None = None
+
+
+def get_encoders() -> Tuple[CachedEncoder, CachedEncoder]:
+    """(koe5, distiluse) — 디스크 임베딩 캐시를 거쳐서 encode (재인제스트 시 같은 텍스트는 추론 생략)"""
+    global _encoders
+    if _encoders is None:
+        cache = get_disk_cache()
+        koe5, distil = get_model("koe5"), get_model("distil")
+        # 캐시 키는 모델의 model_name (int8 백엔드면 이름에 백엔드가 붙어서 float 벡터와 안 섞임)
+        _encoders = (
+            CachedEncoder(koe5, koe5.model_name, cache),
+            CachedEncoder(distil, distil.model_name, cache),
+        )
+    return _encoders
 
-# 인덱스 생성(없으면)
-def ensure_index(es):
-    try:
-        if es.indices.exists(index=INDEX_NAME):
-            return
-    except Exception:
-        pass
 
+# 인덱스 생성(없거나 벡터 매핑이 바뀌었으면)
+def ensure_index(es) -> bool:
+    """없으면 생성, 벡터 매핑이 현재 인덱스 프로파일과 다르면 다시 생성 (→ True)"""
     mapping = {
         "mappings": {
             "properties": {
                 "session_id": {"type": "keyword"},
                 "camera_id": {"type": "keyword"},
                 "text": {"type": "text"},
-                "embedding_koe5": {
-                    "type": "dense_vector",
-                    "dims": DIM_KOE5,
-                    "index": True,
-                    "similarity": "cosine"
-                },
-                "embedding_distiluse": {
-                    "type": "dense_vector",
-                    "dims": DIM_DISTIL,
-                    "index": True,
-                    "similarity": "cosine"
-                }
+                # 양자화/PCA 설정은 index_profile 에서 (쿼리 쪽과 같은 설정)
+                "embedding_koe5": dense_vector_mapping("embedding_koe5", DIM_KOE5),
+                "embedding_distiluse": dense_vector_mapping("embedding_distiluse", DIM_DISTIL),
             }
         }
     }
-    try:
-        es.indices.create(index=INDEX_NAME, body=mapping)
-        print(f"[INFO] created index {INDEX_NAME}")
-    except RequestError as e:
-        if getattr(e, "info", {}).get("error", {}).get("type") != "resource_already_exists_exception":
-            print(f"[ERR] index create failed: {e.info}")
+    return ensure_vector_index(es, INDEX_NAME, mapping)
+
+
+# 세션별 (session_id, camera_id, text) 추출
+def iter_sessions(df_unique: pd.DataFrame):
+    for session_id, camera_id, summary in df_unique.itertuples(index=False, name=None):
+        text = str(summary).strip()
+        if text:
+            yield str(session_id), str(camera_id), text
+
+
+# 텍스트 길이순으로 정렬해서 batch_size 씩 묶음 → 배치 안 padding 최소화
+def iter_length_sorted_batches(rows: List[Tuple[str, str, str]], batch_size: int):
+    rows = sorted(rows, key=lambda r: len(r[2]))
+    for i in range(0, len(rows), batch_size):
+        yield rows[i:i + batch_size]
+
+
+# 배치 인코딩 → bulk action 을 하나씩 흘려보냄 (전체 action 을 메모리에 쌓지 않음)
+def generate_actions(rows, op_types: Dict[str, str], koe5_store: VectorStoreWriter, distil_store: VectorStoreWriter,
+                     batch_size: int = ENCODE_BATCH_SIZE):
+    koe5, distiluse = get_encoders()
+    for batch in iter_length_sorted_batches(rows, batch_size):
+        ids = [r[0] for r in batch]
+        texts = [r[2] for r in batch]
+
+        vecs_koe5 = koe5.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        vecs_distil = distiluse.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        koe5_store.add(ids, vecs_koe5)
+        distil_store.add(ids, vecs_distil)
+        vecs_distil = project("embedding_distiluse", vecs_distil)   # 저장소는 원래 차원, 인덱스는 투영(설정 시)
+
+        for (session_id, camera_id, text), vec_koe5, vec_distil in zip(batch, vecs_koe5, vecs_distil):
+            yield {
+                "_op_type": op_types[session_id],
+                "_index": INDEX_NAME,
+                "_id": session_id,  # 세션 단위 문서. 카메라별로 구분하려면 f"{session_id}:{camera_id}" 사용
+                "_source": {
+                    "session_id": session_id,
+                    "camera_id": camera_id,
+                    "text": text,
+                    "embedding_koe5": vec_koe5.tolist(),
+                    "embedding_distiluse": vec_distil.tolist(),
+                }
+            }
 
 
 # 임베딩 + 인덱싱(있으면 스킵)
-def embed_and_ingest(skip_existing: bool = True):
+def embed_and_ingest(skip_existing: bool = True, batch_size: int = ENCODE_BATCH_SIZE,
+                     chunk_size: int = BULK_CHUNK_SIZE):
     es = get_client()
-    ensure_index(es)
+    recreated = ensure_index(es)
 
-    df = pd.read_csv(CSV_PATH)
+    # 300+개 센서 컬럼 중 필요한 3개만 읽음 (Parquet 변환 전이면 CSV usecols)
+    df = load_sessions(columns=["session_id", "camera_id", "video_summary"], csv_path=CSV_PATH)
 
     required_cols = {"session_id", "video_summary", "camera_id"}
     if not required_cols.issubset(df.columns):
@@ -72,55 +128,59 @@ def embed_and_ingest(skip_existing: bool = True):
           .drop_duplicates(subset=["session_id"])  # 세션당 1개만
           [["session_id", "camera_id", "video_summary"]]
     )
+    rows = list(iter_sessions(df_unique))
+    del df, df_unique
 
-    actions = []
-    op_type = "create" if skip_existing else "index" 
-
-    for _, row in df_unique.iterrows():
-        session_id = str(row["session_id"])
-        camera_id = str(row["camera_id"])
-        text = str(row["video_summary"]).strip()
-        if not text:
-            continue
-
-        emb_koe5 = koe5.encode(text, convert_to_numpy=True).tolist()
-        emb_distil = distiluse.encode(text, convert_to_numpy=True).tolist()
-
-        actions.append({
-            "_op_type": op_type,
-            "_index": INDEX_NAME,
-            "_id": session_id,  # 세션 단위 문서. 카메라별로 구분하려면 f"{session_id}:{camera_id}" 사용
-            "_source": {
-                "session_id": session_id,
-                "camera_id": camera_id,
-                "text": text,
-                "embedding_koe5": emb_koe5,
-                "embedding_distiluse": emb_distil,
-            }
-        })
+    # PCA 투영 설정인데 아직 fit 전이면 요약 텍스트 샘플로 fit (디스크 캐시 덕에 본 인코딩 때 재계산 없음)
+    ensure_projection(
+        "embedding_distiluse",
+        lambda: get_encoders()[1].encode([r[2] for r in rows[:PCA_FIT_SAMPLE]], batch_size=batch_size, convert_to_numpy=True),
+    )
 
-    if not actions:
-        print("[INFO] no actions to index")
+    # 요약 텍스트 + 모델 id + 인덱스 프로파일이 그대로인 세션은 인코딩 전에 제외
+    manifest = IngestManifest(INDEX_NAME)
+    if recreated:
+        manifest.clear()   # 새 인덱스 → 기존 fingerprint 는 무효
+    profile = (profile_signature("embedding_koe5"), profile_signature("embedding_distiluse"))
+    fps = {sid: fingerprint(KOE5_NAME, DISTIL_NAME, *profile, text) for sid, _, text in rows}
+    op_types, unchanged = plan_sessions(es, INDEX_NAME, manifest, fps, skip_existing)
+    rows = [r for r in rows if r[0] in op_types]
+
+    if not rows:
+        manifest.save()
+        print(f"[INFO] no actions to index (unchanged: {unchanged})")
         return
 
-    success, errors = helpers.bulk(
-        es, actions, raise_on_error=False, stats_only=False
-    )
+    # rerank 단계에서 mmap 으로 쓰는 float16 벡터 저장소도 같이 채움
+    koe5_store = VectorStoreWriter("embedding_koe5", DIM_KOE5)
+    distil_store = VectorStoreWriter("embedding_distiluse", DIM_DISTIL)
 
-    # 409(conflict) 스킵 집계
+    # chunk_size 개씩 bulk 요청 → 409(conflict) 스킵 집계
+    success = 0
     skipped = 0
     other_errors = 0
-    for e in errors:
-        if isinstance(e, dict):
-            rec = e.get("create") or e.get("index") or e.get("update") or {}
-            if rec.get("status") == 409:
+    try:
+        for ok, item in helpers.streaming_bulk(
+            es,
+            generate_actions(rows, op_types, koe5_store, distil_store, batch_size=batch_size),
+            chunk_size=chunk_size,
+            raise_on_error=False,
+        ):
+            rec = item.get("create") or item.get("index") or item.get("update") or {}
+            if ok:
+                success += 1
+            elif rec.get("status") == 409:
                 skipped += 1
             else:
                 other_errors += 1
-        else:
-            other_errors += 1
-
-    print(f"[OK] indexed: {success}, skipped(existing): {skipped}, errors: {other_errors}")
+                continue
+            manifest.update(rec.get("_id"), fps[rec.get("_id")])
+    finally:
+        koe5_store.close()
+        distil_store.close()
+        manifest.save()
+
+    print(f"[OK] indexed: {success}, skipped(existing): {skipped + unchanged}, errors: {other_errors}")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ CSV 기반 SigLIP 텍스트+다중 대표 프레임(균등 샘플링) 멀티모
 - video_service.py 의 find_video_path() 활용
 """
 
+from typing import TYPE_CHECKING
+
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -11,65 +13,32 @@ from app.es.client import get_client
 from elasticsearch import helpers
 from elasticsearch.exceptions import NotFoundError, RequestError
 from PIL import Image
-import cv2
-from ...models_emb.embedder_siglip import UnifiedEmbedder
+from ...models_emb.registry import SIGLIP_MODEL_NAME, get_ingest_siglip
+from app.services.vector_store import VectorStoreWriter
+from app.es.index_profile import (
+    dense_vector_mapping, ensure_projection, fit_projection, needs_fit, project, store_sample,
+)
+from app.services.ingester.frames import (
+    INGEST_PREVIEWS, KEYFRAME_MODE, decode_keyframes, decode_keyframes_with_previews, iter_decoded,
+)
+from app.services.ingester.frames import read_first_frame, read_n_frames_evenly  # noqa: F401 (기존 import 경로 유지)
 from app.services.video_service import find_video_path  # ✅ 이미 구현한 함수 import
+from app.services.session_store import load_sessions
+
+if TYPE_CHECKING:   # torch/transformers 는 레지스트리가 모델 로드할 때만 import
+    from ...models_emb.embedder_siglip import UnifiedEmbedder
 
 CSV_PATH = "/home/dickson/문서/agentApp/backend/app/data/all_labs_merged.csv"
 INDEX_NAME = "embeddings_imgtxt"
 
-# ✅ SigLIP 모델 로드
-siglip = UnifiedEmbedder(
-    "google/siglip-so400m-patch14-384",
-    device="cuda",
-    dtype="float16",
-    normalize=True
-)
-
-def read_first_frame(video_path: str, target_w=384, target_h=384) -> Image.Image | None:
-    cap = cv2.VideoCapture(video_path)
-    ok, frame = cap.read()
-    cap.release()
-    if not ok or frame is None:
-        return None
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(frame).resize((target_w, target_h))
-
-def read_n_frames_evenly(
-    video_path: str,
-    n: int = 10,
-    target_w: int = 384,
-    target_h: int = 384,
-    strict: bool = False
-) -> list[Image.Image]:
-    imgs: list[Image.Image] = []
-    cap = cv2.VideoCapture(video_path)
-    try:
-        if not cap.isOpened():
-            return imgs
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        if total_frames <= 0:
-            return imgs
-        n_eff = min(n, total_frames)
-        idxs = np.linspace(0, total_frames - 1, num=n_eff, dtype=int)
-        for idx in idxs:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
-            ok, frame = cap.read()
-            if not ok or frame is None:
-                continue
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            imgs.append(Image.fromarray(frame).resize((target_w, target_h)))
-    finally:
-        cap.release()
-    if strict and len(imgs) < n:
-        return []
-    return imgs
+# ✅ SigLIP 모델
+# (SigLIP 은 레지스트리에서 처음 임베딩할 때 로드 → get_ingest_siglip())
 
 def l2_normalize(vec: np.ndarray, eps: float = 1e-12) -> np.ndarray:
     denom = max(np.linalg.norm(vec), eps)
     return vec / denom
 
-def embed_text_with_images_mean(embedder: UnifiedEmbedder, text: str, images: list[Image.Image]) -> np.ndarray:
+def embed_text_with_images_mean(embedder: "UnifiedEmbedder", text: str, images: list[Image.Image]) -> np.ndarray:
     if not images:
         raise ValueError("images is empty")
     texts = [text] * len(images)
@@ -92,12 +61,8 @@ def create_index(es):
                 "camera_id": {"type": "keyword"},
                 "text": {"type": "text"},
                 "video_file": {"type": "keyword"},
-                "embedding_siglip_fused": {
-                    "type": "dense_vector",
-                    "dims": 1152,   # SigLIP so400m
-                    "index": True,
-                    "similarity": "cosine"
-                }
+                # SigLIP so400m 1152차원 (양자화/PCA 는 index_profile 설정)
+                "embedding_siglip_fused": dense_vector_mapping("embedding_siglip_fused", 1152)
             }
         }
     }
@@ -107,11 +72,12 @@ def create_index(es):
     except RequestError as e:
         print(f"[ERR] 인덱스 생성 실패: {e.info}")
 
-def embed_and_ingest(n_keyframes: int = 10):
+def embed_and_ingest(n_keyframes: int = 10, *, previews: bool = INGEST_PREVIEWS, keyframes: str = KEYFRAME_MODE):
     es = get_client()
     create_index(es)
 
-    df = pd.read_csv(CSV_PATH)
+    # 300+개 센서 컬럼 중 필요한 3개만 읽음 (Parquet 변환 전이면 CSV usecols)
+    df = load_sessions(columns=["session_id", "camera_id", "video_summary"], csv_path=CSV_PATH)
     required_cols = {"session_id", "video_summary", "camera_id"}
     if not required_cols.issubset(df.columns):
         raise ValueError(f"CSV must contain columns: {required_cols}")
@@ -123,6 +89,11 @@ def embed_and_ingest(n_keyframes: int = 10):
     )
 
     actions = []
+    # PCA 투영 설정인데 fit 전이면 (저장소를 비우기 전에) 기존 fused 벡터로 fit
+    # (저장소가 비어 있으면 아래에서 이번 실행 벡터로 fit)
+    ensure_projection("embedding_siglip_fused", lambda: store_sample("embedding_siglip_fused"))
+    fused_store = VectorStoreWriter("embedding_siglip_fused", 1152, append=False)   # 인덱스를 새로 만드니 저장소도 새로
+    sessions = {}
     for _, row in df_unique.iterrows():
         session_id = str(row["session_id"])
         camera_id = str(row["camera_id"])
@@ -134,22 +105,30 @@ def embed_and_ingest(n_keyframes: int = 10):
         if not video_path or not Path(video_path).exists():
             print(f"[SKIP] no video file for {session_id}/{camera_id}")
             continue
+        sessions[session_id] = (camera_id, text, video_path)
 
-        # 10등분 샘플링 → 실패 시 첫 프레임 폴백
-        images = read_n_frames_evenly(str(video_path), n=n_keyframes, target_w=384, target_h=384, strict=False)
-        if not images:
-            img0 = read_first_frame(str(video_path))
-            if img0:
-                images = [img0]
-            else:
-                print(f"[SKIP] cannot read frames from {video_path}")
+    # 10등분 샘플링(실패 시 첫 프레임 폴백)은 디코더 프로세스에서, 임베딩은 여기서 → 겹쳐서 진행
+    # keyframes="scene" 이면 균등 n 장 대신 장면 변화 지점 최대 n 장 (정적인 세션은 프레임 수가 줄어듦)
+    tasks = ((sid, str(v[2]), n_keyframes, 384, 384, keyframes) for sid, v in sessions.items())
+
+    # previews=True 면 디코더 프로세스가 같은 키프레임으로 스프라이트/프리뷰 mp4 도 씀
+    decode_fn = decode_keyframes_with_previews if previews else decode_keyframes
+
+    n_frames = {"sessions": 0, "frames": 0}
+
+    def decoded_sessions():
+        for session_id, images in iter_decoded(tasks, decode_fn=decode_fn):
+            if not images:
+                print(f"[SKIP] cannot read frames from {sessions[session_id][2]}")
                 continue
+            n_frames["sessions"] += 1
+            n_frames["frames"] += len(images)
+            yield session_id, sessions[session_id][1], images
 
-        try:
-            emb_fused_mean = embed_text_with_images_mean(siglip, text, images).tolist()
-        except Exception as e:
-            print(f"[ERR] session={session_id} fail: {e}")
-            continue
+    # 디코딩 끝난 세션들을 모아서 이미지 배치를 꽉 채워 임베딩 (텍스트는 세션당 1번만)
+    siglip = get_ingest_siglip()
+    for session_id, vec_fused in siglip.iter_sessions_fused(decoded_sessions()):
+        camera_id, text, video_path = sessions[session_id]
 
         actions.append({
             "_op_type": "index",
@@ -160,9 +139,22 @@ def embed_and_ingest(n_keyframes: int = 10):
                 "camera_id": camera_id,
                 "text": text,
                 "video_file": Path(video_path).name,
-                "embedding_siglip_fused": emb_fused_mean,
+                "embedding_siglip_fused": vec_fused,   # 투영(설정 시)은 아래에서 한 번에
             }
         })
+        fused_store.add([session_id], vec_fused[None, :])
+
+    fused_store.close()
+
+    if actions:
+        raw = np.stack([a["_source"]["embedding_siglip_fused"] for a in actions])
+        if needs_fit("embedding_siglip_fused"):
+            fit_projection("embedding_siglip_fused", raw)
+        for a, vec in zip(actions, project("embedding_siglip_fused", raw)):
+            a["_source"]["embedding_siglip_fused"] = vec.tolist()
+    if n_frames["sessions"]:
+        print(f"[INFO] keyframes ({keyframes}): {n_frames['frames']} frames / {n_frames['sessions']} sessions "
+              f"(avg {n_frames['frames'] / n_frames['sessions']:.1f}, max {n_keyframes})")
 
     if actions:
         helpers.bulk(es, actions)
@@ -1,78 +1,49 @@
 
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
 from elasticsearch import helpers
-from elasticsearch.exceptions import NotFoundError, RequestError
+from elasticsearch.exceptions import NotFoundError
 from PIL import Image
-import cv2
 
 from app.es.client import get_client
 from app.services.env_loader import env_loader
-from ...models_emb.embedder_siglip import UnifiedEmbedder
+from ...models_emb.cpu_backend import backend_model_id
+from ...models_emb.registry import SIGLIP_MODEL_NAME, get_ingest_siglip
+from app.services.vector_store import VectorStoreWriter
+from app.es.index_profile import (
+    dense_vector_mapping, ensure_projection, ensure_vector_index, fit_projection, needs_fit, profile_signature,
+    project, store_sample,
+)
+from app.services.ingester.frames import (
+    INGEST_PREVIEWS, KEYFRAME_MODE, decode_keyframes, decode_keyframes_with_previews, iter_decoded,
+    keyframe_signature,
+)
+from app.services.ingester.frames import read_first_frame, read_n_frames_evenly  # noqa: F401 (기존 import 경로 유지)
 from app.services.video_service import find_video_path  
+from app.services.session_store import load_sessions
+from app.services.ingester.manifest import IngestManifest, fingerprint, plan_sessions, video_signature
+
+if TYPE_CHECKING:   # torch/transformers 는 레지스트리가 모델 로드할 때만 import
+    from ...models_emb.embedder_siglip import UnifiedEmbedder
 
 # 설정
 BASE_DIR = env_loader.env_loader()  
 CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
 INDEX_NAME = "embeddings_imgtxt"
 
-#  SigLIP 모델 로드
-siglip = UnifiedEmbedder(
-    "google/siglip-so400m-patch14-384",
-    device="cuda",
-    dtype="float16",
-    normalize=True
-)
-
-# 프레임 로딩 유틸
-def read_first_frame(video_path: str, target_w: int = 384, target_h: int = 384) -> Image.Image | None:
-    cap = cv2.VideoCapture(video_path)
-    ok, frame = cap.read()
-    cap.release()
-    if not ok or frame is None:
-        return None
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(frame).resize((target_w, target_h))
-
-def read_n_frames_evenly(
-    video_path: str,
-    n: int = 10,
-    target_w: int = 384,
-    target_h: int = 384,
-    strict: bool = False
-) -> List[Image.Image]:
-    imgs: List[Image.Image] = []
-    cap = cv2.VideoCapture(video_path)
-    try:
-        if not cap.isOpened():
-            return imgs
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        if total_frames <= 0:
-            return imgs
-        n_eff = min(n, total_frames)
-        idxs = np.linspace(0, total_frames - 1, num=n_eff, dtype=int)
-        for idx in idxs:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
-            ok, frame = cap.read()
-            if not ok or frame is None:
-                continue
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            imgs.append(Image.fromarray(frame).resize((target_w, target_h)))
-    finally:
-        cap.release()
-    if strict and len(imgs) < n:
-        return []
-    return imgs
+#  SigLIP 모델
+SIGLIP_NAME = backend_model_id(SIGLIP_MODEL_NAME)   # fingerprint 용 (EMBED_BACKEND=int8 이면 "@int8")
+# (SigLIP 은 레지스트리에서 처음 임베딩할 때 로드 → get_ingest_siglip())
 
 # 임베딩 유틸
 def l2_normalize(vec: np.ndarray, eps: float = 1e-12) -> np.ndarray:
     denom = max(float(np.linalg.norm(vec)), eps)
     return vec / denom
 
-def embed_text_with_images_mean(embedder: UnifiedEmbedder, text: str, images: List[Image.Image]) -> np.ndarray:
+def embed_text_with_images_mean(embedder: "UnifiedEmbedder", text: str, images: List[Image.Image]) -> np.ndarray:
     if not images:
         raise ValueError("images is empty")
     texts = [text] * len(images)
@@ -81,15 +52,9 @@ def embed_text_with_images_mean(embedder: UnifiedEmbedder, text: str, images: Li
     mean_vec = embs.mean(axis=0)
     return l2_normalize(mean_vec)
 
-# 인덱스 생성(없으면)
-def ensure_index(es) -> None:
-    try:
-        if es.indices.exists(index=INDEX_NAME):
-            return
-    except Exception:
-        # 일부 ES 버전/권한에서 exists가 예외를 던질 수 있음 → 생성 시도
-        pass
-
+# 인덱스 생성(없거나 벡터 매핑이 바뀌었으면)
+def ensure_index(es) -> bool:
+    """없으면 생성, 벡터 매핑이 현재 인덱스 프로파일과 다르면 다시 생성 (→ True)"""
     mapping = {
         "mappings": {
             "properties": {
@@ -97,29 +62,26 @@ def ensure_index(es) -> None:
                 "camera_id": {"type": "keyword"},
                 "text": {"type": "text"},
                 "video_file": {"type": "keyword"},
-                "embedding_siglip_fused": {
-                    "type": "dense_vector",
-                    "dims": 1152,   # SigLIP so400m
-                    "index": True,
-                    "similarity": "cosine"
-                }
+                # SigLIP so400m 1152차원 (양자화/PCA 는 index_profile 설정)
+                "embedding_siglip_fused": dense_vector_mapping("embedding_siglip_fused", 1152)
             }
         }
     }
-    try:
-        es.indices.create(index=INDEX_NAME, body=mapping)
-        print(f"[INFO] created index {INDEX_NAME}")
-    except RequestError as e:
-        # 이미 존재 등 경합 시 무시
-        if getattr(e, "info", {}).get("error", {}).get("type") != "resource_already_exists_exception":
-            print(f"[ERR] index create failed: {e.info}")
+    return ensure_vector_index(es, INDEX_NAME, mapping)
 
 # 인덱싱(있으면 스킵)
-def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
+def embed_and_ingest(
+    n_keyframes: int = 10,
+    skip_existing: bool = True,
+    *,
+    previews: bool = INGEST_PREVIEWS,   # 새 옵션은 keyword 전용 (기존 위치 인자 호출 유지)
+    keyframes: str = KEYFRAME_MODE,
+) -> None:
     es = get_client()
-    ensure_index(es)
+    recreated = ensure_index(es)
 
-    df = pd.read_csv(CSV_PATH)
+    # 300+개 센서 컬럼 중 필요한 3개만 읽음 (Parquet 변환 전이면 CSV usecols)
+    df = load_sessions(columns=["session_id", "camera_id", "video_summary"], csv_path=CSV_PATH)
     required_cols = {"session_id", "video_summary", "camera_id"}
     if not required_cols.issubset(df.columns):
         raise ValueError(f"CSV must contain columns: {required_cols}")
@@ -130,13 +92,11 @@ def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
           [["session_id", "camera_id", "video_summary"]]
     )
 
-    actions = []
-    op_type = "create" if skip_existing else "index"  # ✅ create → 존재 시 409로 스킵
-
-    for _, row in df_unique.iterrows():
-        session_id = str(row["session_id"])
-        camera_id = str(row["camera_id"])
-        text = str(row["video_summary"]).strip()
+    # 영상 경로는 인덱스 조회라 싸다 → 디코딩 전에 fingerprint 부터 비교
+    sessions = []
+    for session_id, camera_id, summary in df_unique.itertuples(index=False, name=None):
+        session_id, camera_id = str(session_id), str(camera_id)
+        text = str(summary).strip()
         if not text:
             continue
 
@@ -144,25 +104,54 @@ def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
         if not video_path or not Path(video_path).exists():
             print(f"[SKIP] no video file for {session_id}/{camera_id}")
             continue
+        sessions.append((session_id, camera_id, text, video_path))
+
+    # PCA 투영 설정인데 fit 전이면 vector_store 에 쌓인 원래 차원 fused 벡터로 fit
+    # (저장소가 비어 있는 첫 실행이면 아래에서 이번 실행 벡터로 fit)
+    ensure_projection("embedding_siglip_fused", lambda: store_sample("embedding_siglip_fused"))
+
+    manifest = IngestManifest(INDEX_NAME)
+    if recreated:
+        manifest.clear()   # 새 인덱스 → 기존 fingerprint 는 무효
+    def session_fps():
+        profile = profile_signature("embedding_siglip_fused")
+        return {
+            s[0]: fingerprint(SIGLIP_NAME, keyframe_signature(n_keyframes, keyframes), profile, s[2], video_signature(s[3]))
+            for s in sessions
+        }
 
-        # 10등분 샘플링 → 실패 시 첫 프레임 폴백
-        images = read_n_frames_evenly(str(video_path), n=n_keyframes, target_w=384, target_h=384, strict=False)
-        if not images:
-            img0 = read_first_frame(str(video_path))
-            if img0:
-                images = [img0]
-            else:
-                print(f"[SKIP] cannot read frames from {video_path}")
+    fps = session_fps()
+    op_types, unchanged = plan_sessions(es, INDEX_NAME, manifest, fps, skip_existing)
+
+    actions = []
+    fused_store = VectorStoreWriter("embedding_siglip_fused", 1152)
+
+    # 10등분 샘플링(실패 시 첫 프레임 폴백)은 디코더 프로세스에서, 임베딩은 여기서 → 겹쳐서 진행
+    todo = {s[0]: s for s in sessions if s[0] in op_types}
+    # keyframes="scene" 이면 균등 n 장 대신 장면 변화 지점 최대 n 장 (정적인 세션은 프레임 수가 줄어듦)
+    tasks = ((sid, str(s[3]), n_keyframes, 384, 384, keyframes) for sid, s in todo.items())
+
+    # previews=True 면 디코더 프로세스가 같은 키프레임으로 스프라이트/프리뷰 mp4 도 씀
+    decode_fn = decode_keyframes_with_previews if previews else decode_keyframes
+
+    n_frames = {"sessions": 0, "frames": 0}
+
+    def decoded_sessions():
+        for session_id, images in iter_decoded(tasks, decode_fn=decode_fn):
+            if not images:
+                print(f"[SKIP] cannot read frames from {todo[session_id][3]}")
                 continue
+            n_frames["sessions"] += 1
+            n_frames["frames"] += len(images)
+            yield session_id, todo[session_id][2], images
 
-        try:
-            emb_fused_mean = embed_text_with_images_mean(siglip, text, images).tolist()
-        except Exception as e:
-            print(f"[ERR] session={session_id} embed fail: {e}")
-            continue
+    # 디코딩 끝난 세션들을 모아서 이미지 배치를 꽉 채워 임베딩 (텍스트는 세션당 1번만)
+    siglip = get_ingest_siglip()
+    for session_id, vec_fused in siglip.iter_sessions_fused(decoded_sessions()):
+        _, camera_id, text, video_path = todo[session_id]
 
         actions.append({
-            "_op_type": op_type,              # 없을 때만 생성
+            "_op_type": op_types[session_id], # create → 존재 시 409로 스킵
             "_index": INDEX_NAME,
             "_id": session_id,                # 세션 단위 문서
             "_source": {
@@ -170,12 +159,27 @@ def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
                 "camera_id": camera_id,
                 "text": text,
                 "video_file": Path(video_path).name,
-                "embedding_siglip_fused": emb_fused_mean,
+                "embedding_siglip_fused": vec_fused,   # 투영(설정 시)은 아래에서 한 번에
             }
         })
+        fused_store.add([session_id], vec_fused[None, :])
+
+    fused_store.close()
+
+    if actions:
+        raw = np.stack([a["_source"]["embedding_siglip_fused"] for a in actions])
+        if needs_fit("embedding_siglip_fused"):
+            fit_projection("embedding_siglip_fused", raw)
+            fps = session_fps()   # fit 된 투영 digest 로 기록 (다음 실행 때 다시 색인하지 않게)
+        for a, vec in zip(actions, project("embedding_siglip_fused", raw)):
+            a["_source"]["embedding_siglip_fused"] = vec.tolist()
+    if n_frames["sessions"]:
+        print(f"[INFO] keyframes ({keyframes}): {n_frames['frames']} frames / {n_frames['sessions']} sessions "
+              f"(avg {n_frames['frames'] / n_frames['sessions']:.1f}, max {n_keyframes})")
 
     if not actions:
-        print("[INFO] no actions to index")
+        manifest.save()
+        print(f"[INFO] no actions to index (unchanged: {unchanged})")
         return
 
     success, errors = helpers.bulk(
@@ -188,6 +192,7 @@ def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
     # 409(conflict) 스킵 집계
     skipped = 0
     other_errors = 0
+    failed_ids = set()
     for e in errors:
         if isinstance(e, dict):
             rec = e.get("create") or e.get("index") or e.get("update") or {}
@@ -195,10 +200,17 @@ def embed_and_ingest(n_keyframes: int = 10, skip_existing: bool = True) -> None:
                 skipped += 1
             else:
                 other_errors += 1
+                failed_ids.add(rec.get("_id"))
         else:
             other_errors += 1
 
-    print(f"[OK] indexed: {success}, skipped(existing): {skipped}, errors: {other_errors}")
+    # 실패한 문서만 빼고 fingerprint 기록 → 다음 실행 때 건너뜀
+    for a in actions:
+        if a["_id"] not in failed_ids:
+            manifest.update(a["_id"], fps[a["_id"]])
+    manifest.save()
+
+    print(f"[OK] indexed: {success}, skipped(existing): {skipped + unchanged}, errors: {other_errors}")
 
 if __name__ == "__main__":
     embed_and_ingest(n_keyframes=10, skip_existing=True)
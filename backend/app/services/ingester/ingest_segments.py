@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+구간(segment) 단위 SigLIP 이미지 임베딩 인덱스 (embeddings_segments)
+- ingest_imgemb 는 키프레임 10장을 세션 벡터 하나로 평균 → 짧은 사건(파지 실패 등)이 묻히고 "언제"인지 모름
+- 여기서는 SEGMENT_SECONDS 길이 구간마다 프레임 SEGMENT_FRAMES 장 → 구간 벡터 1개 (+ 시작/끝 초)
+    _id = "<session_id>:<camera_id>:<구간 번호>"
+- 검색은 search_segments.py (ES collapse 로 세션당 가장 잘 맞는 구간 하나)
+- 문서 수가 세션 수 × 구간 수라 수백만 단위 → 대량 적재 설정
+    · 디코딩(프로세스 풀) / 임베딩(세션 경계 무시하고 이미지 배치 꽉 채움) / streaming_bulk 가 겹쳐서 진행
+    · 적재 중에는 refresh_interval=-1, 끝나면 원래 값으로 되돌리고 refresh 한 번
+    · 바뀐 세션은 delete_by_query 로 기존 구간을 지우고 다시 씀 (구간 수가 줄어도 찌꺼기 없음)
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from elasticsearch import helpers
+
+from app.es.client import get_client
+from app.es.index_profile import dense_vector_mapping, ensure_vector_index, profile_signature, project
+from app.models_emb.cpu_backend import backend_model_id
+from app.models_emb.registry import SIGLIP_MODEL_NAME, get_ingest_siglip
+from app.services.env_loader import env_loader
+from app.services.ingester.frames import decode_segments, iter_decoded, video_segments
+from app.services.ingester.manifest import IngestManifest, fingerprint, plan_grouped_sessions, video_signature
+from app.services.session_store import load_sessions
+from app.services.video_service import find_video_path
+
+# 설정
+BASE_DIR = env_loader.env_loader()
+CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
+INDEX_NAME = "embeddings_segments"
+VECTOR_FIELD = "embedding_siglip_segment"
+SIGLIP_DIM = 1152
+SEGMENT_SECONDS = float(os.getenv("SEGMENT_SECONDS", "4"))          # 구간 길이 (초)
+SEGMENT_FRAMES = int(os.getenv("SEGMENT_FRAMES", "2"))              # 구간당 임베딩할 프레임 수
+BULK_CHUNK_SIZE = int(os.getenv("INGEST_SEGMENT_BULK_CHUNK", "2000"))   # bulk 요청 하나당 문서 수
+BULK_MAX_BYTES = int(os.getenv("INGEST_SEGMENT_BULK_BYTES", str(50 * 1024 * 1024)))
+SEGMENT_DECODE_CHUNK = int(os.getenv("SEGMENT_DECODE_CHUNK", "32"))   # 디코더 작업 하나당 구간 수
+DELETE_CHUNK = 500   # delete_by_query / terms 조회 한 번에 넣을 session_id 수
+
+
+# 인덱스 생성(없거나 벡터 매핑이 바뀌었으면)
+def ensure_index(es) -> bool:
+    """없으면 생성, 벡터 매핑이 현재 인덱스 프로파일과 다르면 다시 생성 (→ True)"""
+    mapping = {
+        "mappings": {
+            "properties": {
+                "session_id": {"type": "keyword"},   # collapse 대상
+                "camera_id": {"type": "keyword"},
+                "segment_idx": {"type": "integer"},
+                "start_s": {"type": "float"},
+                "end_s": {"type": "float"},
+                # SigLIP so400m 1152차원 이미지 임베딩 (양자화는 index_profile 설정)
+                VECTOR_FIELD: dense_vector_mapping(VECTOR_FIELD, SIGLIP_DIM),
+            }
+        }
+    }
+    return ensure_vector_index(es, INDEX_NAME, mapping)
+
+
+def _chunks(items: List[str], n: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+def segment_counts(es, session_ids: Iterable[str]) -> Dict[str, int]:
+    """세션별 구간 문서 수 (_id 가 세션 단위가 아니라 mget 대신 terms 집계)"""
+    counts: Dict[str, int] = {}
+    for chunk in _chunks(list(session_ids), DELETE_CHUNK):
+        res = es.search(index=INDEX_NAME, body={
+            "size": 0,
+            "query": {"terms": {"session_id": chunk}},
+            "aggs": {"sids": {"terms": {"field": "session_id", "size": len(chunk)}}},
+        })
+        counts.update((b["key"], int(b["doc_count"])) for b in res["aggregations"]["sids"]["buckets"])
+    return counts
+
+
+def delete_sessions(es, session_ids: Iterable[str]) -> int:
+    """세션들의 기존 구간 문서 삭제 → 지운 문서 수"""
+    deleted = 0
+    for chunk in _chunks(list(session_ids), DELETE_CHUNK):
+        res = es.delete_by_query(
+            index=INDEX_NAME,
+            body={"query": {"terms": {"session_id": chunk}}},
+            conflicts="proceed",
+            refresh=False,
+        )
+        deleted += int(res.get("deleted", 0))
+    return deleted
+
+
+def generate_actions(todo: Dict[str, tuple], siglip, progress: Dict[str, Dict], expected: Dict[str, int]):
+    """
+    디코딩 → 구간 임베딩 → bulk action 을 한 건씩 흘려보냄 (전체를 메모리에 올리지 않음)
+    - 영상 하나를 SEGMENT_DECODE_CHUNK 구간씩 나눠서 디코더 프로세스에 넘김
+      (긴 영상도 결과 하나는 구간 묶음 크기 → 대기 중인 결과 메모리 ≤ max_pending × 묶음)
+    - progress[session_id] = {"chunks": 남은 묶음 수, "segments": 임베딩한 구간 수, "failed": 디코딩 실패 여부}
+    """
+    def tasks():
+        for sid, (_, video_path) in todo.items():
+            n = expected.get(sid)
+            if n is None:
+                n = expected[sid] = len(video_segments(str(video_path), SEGMENT_SECONDS, SEGMENT_FRAMES))
+            if n == 0:
+                print(f"[SKIP] cannot read frames from {video_path}")
+                continue
+            starts = range(0, n, SEGMENT_DECODE_CHUNK)
+            progress[sid] = {"chunks": len(starts), "segments": 0, "failed": False}
+            for start in starts:
+                yield (sid, str(video_path), SEGMENT_SECONDS, SEGMENT_FRAMES, 384, 384, start, SEGMENT_DECODE_CHUNK)
+
+    meta_of: Dict[tuple, tuple] = {}
+
+    def segment_groups():
+        for session_id, images, meta in iter_decoded(tasks(), decode_fn=decode_segments):
+            state = progress[session_id]
+            state["chunks"] -= 1
+            if images is None:
+                state["failed"] = True
+                print(f"[SKIP] cannot read frames from {todo[session_id][1]}")
+                continue
+            state["segments"] += len(meta)
+            pos = 0
+            for seg_idx, start_s, end_s, n in meta:
+                key = (session_id, seg_idx)
+                meta_of[key] = (start_s, end_s)
+                yield key, images[pos:pos + n]
+                pos += n
+
+    for (session_id, seg_idx), vec in siglip.iter_image_groups(segment_groups()):
+        start_s, end_s = meta_of.pop((session_id, seg_idx))
+        camera_id = todo[session_id][0]
+        yield {
+            "_op_type": "index",
+            "_index": INDEX_NAME,
+            "_id": f"{session_id}:{camera_id}:{seg_idx}",
+            "_source": {
+                "session_id": session_id,
+                "camera_id": camera_id,
+                "segment_idx": seg_idx,
+                "start_s": round(start_s, 3),
+                "end_s": round(end_s, 3),
+                VECTOR_FIELD: project(VECTOR_FIELD, vec).tolist(),
+            },
+        }
+
+
+# 인덱싱(바뀐 세션만)
+def embed_and_ingest(skip_existing: bool = True, chunk_size: int = BULK_CHUNK_SIZE) -> None:
+    es = get_client()
+    recreated = ensure_index(es)
+
+    df = load_sessions(columns=["session_id", "camera_id"], csv_path=CSV_PATH)
+    df_unique = df.dropna(subset=["session_id"]).drop_duplicates(subset=["session_id"])[["session_id", "camera_id"]]
+
+    sessions = {}
+    for session_id, camera_id in df_unique.itertuples(index=False, name=None):
+        session_id, camera_id = str(session_id), str(camera_id)
+        video_path = find_video_path(session_id, camera_id)
+        if not video_path or not Path(video_path).exists():
+            print(f"[SKIP] no video file for {session_id}/{camera_id}")
+            continue
+        sessions[session_id] = (camera_id, video_path)
+    del df, df_unique
+
+    # 모델 id(백엔드 포함) + 구간 설정 + 인덱스 프로파일 + 영상 크기/mtime 이 같으면 디코딩 전에 스킵
+    manifest = IngestManifest(INDEX_NAME)
+    if recreated:
+        manifest.clear()   # 새 인덱스 → 기존 fingerprint 는 무효
+    profile = profile_signature(VECTOR_FIELD)
+    fps = {
+        sid: fingerprint(backend_model_id(SIGLIP_MODEL_NAME), SEGMENT_SECONDS, SEGMENT_FRAMES, profile, video_signature(s[1]))
+        for sid, s in sessions.items()
+    }
+
+    # manifest 없이(첫 실행/다른 머신) 이미 들어있는 세션은 구간 수가 영상과 맞을 때만 채택
+    # (이전 실행이 중간에 죽어서 일부만 들어간 세션은 지우고 다시)
+    expected: Dict[str, int] = {}
+
+    def expected_count(sid: str) -> int:
+        if sid not in expected:
+            expected[sid] = len(video_segments(str(sessions[sid][1]), SEGMENT_SECONDS, SEGMENT_FRAMES))
+        return expected[sid]
+
+    todo_ids, stale, unchanged = plan_grouped_sessions(
+        manifest, fps, lambda ids: segment_counts(es, ids), expected_count, skip_existing,
+    )
+
+    if not todo_ids:
+        manifest.save()
+        print(f"[INFO] no actions to index (unchanged: {unchanged})")
+        return
+
+    # 바뀐 세션 / 일부만 들어있던 세션은 기존 구간부터 지움 (skip_existing=False 면 전부)
+    if stale:
+        print(f"[INFO] deleted {delete_sessions(es, stale)} stale segments of {len(stale)} sessions")
+
+    todo = {sid: sessions[sid] for sid in todo_ids}
+    progress: Dict[str, Dict] = {}
+    indexed: Dict[str, int] = {}
+    success = 0
+    errors = 0
+
+    # 대량 적재 중에는 refresh 끔 (세그먼트 병합/검색 가능화 비용을 끝에 한 번만)
+    settings = es.indices.get_settings(index=INDEX_NAME)
+    old_refresh = (
+        settings.get(INDEX_NAME, {}).get("settings", {}).get("index", {}).get("refresh_interval")
+    )
+    es.indices.put_settings(index=INDEX_NAME, body={"index": {"refresh_interval": "-1"}})
+    try:
+        for ok, item in helpers.streaming_bulk(
+            es,
+            generate_actions(todo, get_ingest_siglip(), progress, expected),
+            chunk_size=chunk_size,
+            max_chunk_bytes=BULK_MAX_BYTES,
+            raise_on_error=False,
+        ):
+            rec = item.get("index") or {}
+            if not ok:
+                errors += 1
+                print(f"[ERR] bulk failed {rec.get('_id')}: {rec.get('error')}")
+                continue
+            success += 1
+            sid = rec.get("_id", "").rsplit(":", 2)[0]
+            indexed[sid] = indexed.get(sid, 0) + 1
+            if success % 100000 == 0:
+                print(f"[INFO] indexed {success} segments")
+    finally:
+        es.indices.put_settings(index=INDEX_NAME, body={"index": {"refresh_interval": old_refresh}})
+        es.indices.refresh(index=INDEX_NAME)
+        # 구간이 전부 들어간 세션만 fingerprint 기록 → 일부 실패한 세션은 다음 실행 때 다시
+        for sid, state in progress.items():
+            if state["chunks"] == 0 and not state["failed"] and indexed.get(sid, 0) == state["segments"]:
+                manifest.update(sid, fps[sid])
+        manifest.save()
+
+    print(
+        f"[OK] segments indexed: {success} from {len(progress)} sessions, "
+        f"skipped(unchanged): {unchanged}, errors: {errors}"
+    )
+
+
+if __name__ == "__main__":
+    embed_and_ingest(skip_existing=True)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+세션 센서 시계열 → 다해상도 피라미드 (app.services.sensor_store)
+    python -m app.services.ingester.ingest_sensors
+- 세션 행 순서(= 기록 순서)를 시간축으로 사용
+- 세션 행 내용 해시가 그대로면 다시 만들지 않음 (manifest)
+"""
+
+import pandas as pd
+
+from app.services.env_loader import env_loader
+from app.services.session_store import load_sessions
+from app.services.sensor_store import PYRAMID_FACTOR, SENSOR_STORE_DIR, build_session_pyramid, load_meta
+from app.services.ingester.manifest import IngestManifest, fingerprint
+
+
+# 설정
+BASE_DIR = env_loader.env_loader()
+CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
+MANIFEST_NAME = "sensor_pyramids"
+SENSOR_VERSION = f"v1:f{PYRAMID_FACTOR}"   # 저장 형식/축소 비율이 바뀌면 전체 재생성
+
+
+def ingest_sensors(skip_existing: bool = True) -> None:
+    df = load_sessions(columns=None, csv_path=CSV_PATH)
+    df = df[df["session_id"].notna()]
+    keys = df["session_id"].astype(str)
+
+    row_hash = pd.util.hash_pandas_object(df, index=False)
+    grouped_hash = row_hash.groupby(keys).agg(["sum", "count"])
+    fps = {
+        sid: fingerprint(SENSOR_VERSION, int(h), int(n))
+        for sid, h, n in grouped_hash.itertuples(name=None)
+    }
+
+    manifest = IngestManifest(MANIFEST_NAME)
+    built = skipped = 0
+    for sid, group in df.groupby(keys, sort=False):
+        if skip_existing and manifest.is_current(sid, fps[sid]) and load_meta(sid) is not None:
+            skipped += 1
+            continue
+        build_session_pyramid(sid, group)
+        manifest.update(sid, fps[sid])
+        built += 1
+    manifest.save()
+
+    print(f"[OK] sensor pyramids → {SENSOR_STORE_DIR} (built: {built}, skipped: {skipped})")
+
+
+if __name__ == "__main__":
+    ingest_sensors(skip_existing=True)
@@ -2,18 +2,22 @@
 import math
 from typing import Dict, Any, List, Tuple
 
+import numpy as np
 import pandas as pd
 from elasticsearch import helpers
 from elasticsearch.exceptions import NotFoundError, RequestError
 
 from app.es.client import get_client
 from app.services.env_loader import env_loader  
+from app.services.session_store import load_sessions
+from app.services.ingester.manifest import IngestManifest, fingerprint, plan_sessions
 
 
 # 설정
 BASE_DIR = env_loader.env_loader()  
 CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
 INDEX_NAME = "sessions_stats"
+STATS_VERSION = "v1"   # compute_stats 결과 형식이 바뀌면 올려서 전체 재계산
 
 PAIR_COLS: List[Tuple[str, str]] = [
     ("action/target_cartesian_position_col0", "observation/robot_state/cartesian_position_col0"),
@@ -23,6 +27,19 @@ PAIR_COLS: List[Tuple[str, str]] = [
     ("action/joint_velocity_col1", "observation/robot_state/joint_velocities_col1"),
     ("action/joint_velocity_col2", "observation/robot_state/joint_velocities_col2"),
 ]
+LATENCY_COLS: List[Tuple[str, str]] = [
+    ("action_prev", "action/robot_state/prev_controller_latency_ms"),
+    ("observation_prev", "observation/robot_state/prev_controller_latency_ms"),
+]
+COMMAND_COL = "observation/robot_state/prev_command_successful"
+
+# 통계에 쓰는 컬럼만 읽음 (전체 300+ 컬럼 X)
+STATS_COLUMNS: List[str] = (
+    ["session_id"]
+    + [c for _, c in LATENCY_COLS]
+    + [COMMAND_COL]
+    + [c for pair in PAIR_COLS for c in pair]
+)
 
 
 # 유틸
@@ -65,17 +82,14 @@ def compute_stats(df: pd.DataFrame) -> Dict[str, Any]:
     }
 
     #  latency
-    if "action/robot_state/prev_controller_latency_ms" in df.columns:
-        s = df["action/robot_state/prev_controller_latency_ms"].dropna()
-        stats["latency"]["action_prev"] = _agg_series(s.tolist())
-
-    if "observation/robot_state/prev_controller_latency_ms" in df.columns:
-        s = df["observation/robot_state/prev_controller_latency_ms"].dropna()
-        stats["latency"]["observation_prev"] = _agg_series(s.tolist())
+    for key, col in LATENCY_COLS:
+        if col in df.columns:
+            s = df[col].dropna()
+            stats["latency"][key] = _agg_series(s.tolist())
 
     #  command success rate
-    if "observation/robot_state/prev_command_successful" in df.columns:
-        s = df["observation/robot_state/prev_command_successful"].dropna()
+    if COMMAND_COL in df.columns:
+        s = df[COMMAND_COL].dropna()
         stats["command"]["success_rate"] = _to_py_float(s.mean()) if not s.empty else None
 
     #  position error (target vs observed)
@@ -95,6 +109,76 @@ def compute_stats(df: pd.DataFrame) -> Dict[str, Any]:
     return stats
 
 
+# 전체 세션 한 번에 (세션별 파이썬 리스트/Series 없음)
+def _grouped_mean_std(values: pd.Series, keys: pd.Series) -> Dict[str, Dict[str, Any]]:
+    """
+    세션별 mean/std(ddof=1). 값이 하나도 없는 세션은 결과에 없음 → 호출부에서 None 처리
+    - groupby().agg 는 합을 다른 순서/알고리즘으로 구해서 compute_stats 와 마지막 몇 ulp 가 달라짐
+      → 값을 세션별로 (원래 순서 그대로) 모은 연속 구간마다 pd.Series.mean/std 와 같은 방식으로 계산
+        (float64 numpy sum, 분산은 평균을 먼저 구하는 two-pass)
+    """
+    vals = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = ~np.isnan(vals)
+    codes, uniques = pd.factorize(keys[mask], sort=False)
+    if len(uniques) == 0:
+        return {}
+    vals = vals[mask][np.argsort(codes, kind="stable")]
+    ends = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+
+    out: Dict[str, Dict[str, Any]] = {}
+    start = 0
+    for sid, end in zip(uniques, ends):
+        seg = vals[start:end]
+        start = end
+        mean = seg.sum(dtype=np.float64) / len(seg)
+        var = ((mean - seg) ** 2).sum(dtype=np.float64) / (len(seg) - 1) if len(seg) > 1 else np.nan
+        out[sid] = {"mean": _to_py_float(mean), "std": _to_py_float(np.sqrt(var))}
+    return out
+
+
+def _pooled_diffs(df: pd.DataFrame, keys: pd.Series, pairs: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """여러 (target, observed) 쌍의 차이를 세션별로 합쳐서 mean/std (compute_stats 의 extend 와 동일)"""
+    parts = [df[a] - df[o] for a, o in pairs if a in df.columns and o in df.columns]
+    if not parts:
+        return {}
+    diffs = pd.concat(parts, ignore_index=True)
+    diff_keys = pd.concat([keys] * len(parts), ignore_index=True)
+    mask = diffs.notna()
+    return _grouped_mean_std(diffs[mask], diff_keys[mask])
+
+
+def compute_stats_all(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    {session_id: stats} — 세션마다 compute_stats(group) 한 결과와 같은 문서
+    - latency/명령 성공률/추적 오차/관절 속도 차이를 지표마다 정렬 한 번 + 세션 구간별 numpy 합으로 계산
+    - 합산 순서가 compute_stats 와 같아서 값도 같음 (pandas 가 bottleneck 을 쓰는 환경이면 반올림 오차 수준 차이 가능)
+    """
+    df = df[df["session_id"].notna()]
+    keys = df["session_id"].astype(str)
+    empty = {"mean": None, "std": None}
+
+    latency = {
+        key: _grouped_mean_std(df[col], keys)
+        for key, col in LATENCY_COLS if col in df.columns
+    }
+    success = _grouped_mean_std(df[COMMAND_COL], keys) if COMMAND_COL in df.columns else None
+    tracking = _pooled_diffs(df, keys, PAIR_COLS[:3])
+    velocity = _pooled_diffs(df, keys, PAIR_COLS[3:])
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for sid in sorted(keys.unique()):
+        stats: Dict[str, Any] = {
+            "latency": {key: per.get(sid, empty) for key, per in latency.items()},
+            "command": {},
+            "tracking_error": tracking.get(sid, empty),
+            "joint_velocity_diff": velocity.get(sid, empty),
+        }
+        if success is not None:
+            stats["command"]["success_rate"] = success.get(sid, empty)["mean"]
+        out[sid] = stats
+    return out
+
+
 # 인덱싱
 def ingest_stats(skip_existing: bool = True) -> None:
     """
@@ -102,23 +186,37 @@ def ingest_stats(skip_existing: bool = True) -> None:
     - 구현: _op_type="create" 사용 → 존재 시 409 충돌 → errors로 수집 → 스킵 집계
     """
     es = get_client()
-    df = pd.read_csv(CSV_PATH)
+    df = load_sessions(columns=STATS_COLUMNS, csv_path=CSV_PATH)
+
+    # 세션별 행 내용 해시 (행 해시를 세션 단위로 합산) → 바뀐 세션만 다시 계산
+    row_hash = pd.util.hash_pandas_object(df, index=False)
+    grouped_hash = row_hash.groupby(df["session_id"].astype(str)).agg(["sum", "count"])
+    manifest = IngestManifest(INDEX_NAME)
+    fps = {
+        sid: fingerprint(STATS_VERSION, int(h), int(n))
+        for sid, h, n in grouped_hash.itertuples(name=None)
+    }
+    op_types, unchanged = plan_sessions(es, INDEX_NAME, manifest, fps, skip_existing)
 
+    # 바뀐 세션 행만 골라서 한 번에 집계
+    df_todo = df[df["session_id"].astype(str).isin(op_types.keys())]
     actions = []
-    op_type = "create" if skip_existing else "index"
-
-    for session_id, group in df.groupby("session_id"):
-        stats = compute_stats(group)
+    for session_id, stats in compute_stats_all(df_todo).items():
         actions.append({
-            "_op_type": op_type,              #  create → 없을 때만 생성
+            "_op_type": op_types[session_id],  #  create → 없을 때만 생성
             "_index": INDEX_NAME,
-            "_id": str(session_id),
+            "_id": session_id,
             "_source": {
-                "session_id": str(session_id),
+                "session_id": session_id,
                 "stats": stats,
             }
         })
 
+    if not actions:
+        manifest.save()
+        print(f"[INFO] no actions to index (unchanged: {unchanged})")
+        return
+
     success, errors = helpers.bulk(
         es,
         actions,
@@ -129,6 +227,7 @@ def ingest_stats(skip_existing: bool = True) -> None:
     # 409(conflict) 스킵 집계
     skipped = 0
     other_errors = 0
+    failed_ids = set()
     for e in errors:
         # bulk 에러 구조: {'create': {'_index':..., 'status': 409, 'error': {...}}}
         if isinstance(e, dict):
@@ -137,10 +236,16 @@ def ingest_stats(skip_existing: bool = True) -> None:
                 skipped += 1
             else:
                 other_errors += 1
+                failed_ids.add(rec.get("_id"))
         else:
             other_errors += 1
 
-    print(f"[OK] indexed: {success}, skipped(existing): {skipped}, errors: {other_errors}")
+    for a in actions:
+        if a["_id"] not in failed_ids:
+            manifest.update(a["_id"], fps[a["_id"]])
+    manifest.save()
+
+    print(f"[OK] indexed: {success}, skipped(existing): {skipped + unchanged}, errors: {other_errors}")
 
 
 if __name__ == "__main__":
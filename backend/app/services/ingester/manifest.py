@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+인제스트 증분 처리용 manifest
+- 세션마다 fingerprint(요약 텍스트, 영상 크기/mtime, 모델 id 등) 를 기록해두고
+  다음 실행 때 같으면 영상 디코딩/모델 추론 전에 건너뜀
+- manifest 가 없거나 비어 있으면(첫 실행, 다른 머신) ES mget 으로 이미 있는 _id 를 확인
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.env_loader import env_loader
+
+MANIFEST_DIR = Path(os.getenv("INGEST_MANIFEST_DIR", f"{env_loader.env_loader()}/data/manifests"))
+
+
+def fingerprint(*parts) -> str:
+    """순서 있는 값들 → sha1 hex"""
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def video_signature(video_path: Optional[str]) -> str:
+    """영상 파일 크기 + mtime (내용을 읽지 않는 가벼운 변경 감지)"""
+    if not video_path:
+        return "none"
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return "missing"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class IngestManifest:
+    """인덱스 하나의 {session_id: fingerprint}"""
+
+    def __init__(self, index_name: str, base_dir: Path = MANIFEST_DIR):
+        self.path = Path(base_dir) / f"{index_name}.json"
+        self.entries: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] manifest load failed ({self.path}): {e}")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.entries
+
+    def is_current(self, session_id: str, fp: str) -> bool:
+        return self.entries.get(session_id) == fp
+
+    def update(self, session_id: str, fp: str) -> None:
+        self.entries[session_id] = fp
+
+    def clear(self) -> None:
+        """인덱스를 새로 만들었을 때 (기존 기록은 더 이상 ES 와 맞지 않음)"""
+        self.entries = {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def existing_ids(es, index_name: str, ids: Iterable[str], chunk_size: int = 1000) -> Set[str]:
+    """ES 에 이미 있는 _id 집합 (_source 없이 mget)"""
+    ids = list(ids)
+    found: Set[str] = set()
+    for i in range(0, len(ids), chunk_size):
+        res = es.mget(index=index_name, ids=ids[i:i + chunk_size], _source=False)
+        found.update(d["_id"] for d in res.get("docs", []) if d.get("found"))
+    return found
+
+
+def plan_sessions(es, index_name: str, manifest: IngestManifest, fps: Dict[str, str], skip_existing: bool = True):
+    """
+    처리할 세션과 op_type 결정 (디코딩/추론 전에 호출)
+    - skip_existing=False → 전부 "index"
+    - fingerprint 가 manifest 와 같으면 스킵
+    - manifest 에 없는데 ES 에 이미 있으면 기존처럼 스킵하고 fingerprint 만 채택
+    - manifest 에 있는데 바뀌었으면 "index"(덮어쓰기), 처음 보는 세션은 "create"
+    반환: ({session_id: op_type}, 스킵 수)
+    """
+    if not skip_existing:
+        return {sid: "index" for sid in fps}, 0
+
+    unknown = [sid for sid in fps if sid not in manifest]
+    in_es = existing_ids(es, index_name, unknown) if unknown else set()
+
+    todo: Dict[str, str] = {}
+    for sid, fp in fps.items():
+        if manifest.is_current(sid, fp):
+            continue
+        if sid in in_es:
+            manifest.update(sid, fp)
+            continue
+        todo[sid] = "index" if sid in manifest else "create"
+    return todo, len(fps) - len(todo)
+
+
+def plan_grouped_sessions(
+    manifest: IngestManifest,
+    fps: Dict[str, str],
+    indexed_counts: Callable[[List[str]], Dict[str, int]],
+    expected_count: Callable[[str], int],
+    skip_existing: bool = True,
+) -> Tuple[List[str], List[str], int]:
+    """
+    세션 하나가 문서 여러 개인 인덱스(구간 인덱스 등)용 plan_sessions
+    - indexed_counts(session_ids) → {session_id: ES 에 있는 문서 수}  (manifest 에 없는 세션만 조회)
+    - expected_count(session_id) → 세션이 가져야 할 문서 수
+    - manifest 에 없는데 ES 에 문서가 있으면 개수가 expected_count 와 같을 때만 채택,
+      다르면(이전 실행이 중간에 죽었거나 일부 실패) 지우고 다시 색인
+    반환: (처리할 세션, 기존 문서를 먼저 지울 세션, 스킵 수)
+    """
+    if not skip_existing:
+        ids = list(fps)
+        return ids, ids, 0
+
+    todo: List[str] = []
+    stale: List[str] = []
+    unknown = [sid for sid in fps if sid not in manifest]
+    counts = indexed_counts(unknown) if unknown else {}
+    for sid, fp in fps.items():
+        if manifest.is_current(sid, fp):
+            continue
+        if sid in manifest:
+            todo.append(sid)      # 바뀐 세션
+            stale.append(sid)
+            continue
+        n = counts.get(sid, 0)
+        if n == 0:
+            todo.append(sid)      # 처음 보는 세션
+        elif n == expected_count(sid):
+            manifest.update(sid, fp)   # 온전히 들어있음 → fingerprint 만 채택
+        else:
+            todo.append(sid)      # 일부만 들어있음
+            stale.append(sid)
+    return todo, stale, len(fps) - len(todo)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+정적 미디어 파일 응답 (영상/프리뷰/스프라이트 공용)
+- ETag(크기+mtime) / Last-Modified → If-None-Match, If-Modified-Since 일치 시 304
+- Range / If-Range / 416 은 Starlette FileResponse 가 처리 (여기서 넘긴 ETag 로 If-Range 비교)
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(256 * 1024)))   # 파일 읽기 단위
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "86400"))   # Cache-Control max-age(초)
+
+
+def _etag(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def file_response(request: Request, path: str, media_type: str, max_age: int = MEDIA_MAX_AGE) -> Response:
+    """조건부 GET(304) 을 처리한 파일 응답 (Range 는 FileResponse)"""
+    st = os.stat(path)
+    etag = _etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    response = FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
+    response.chunk_size = MEDIA_CHUNK_SIZE
+    return response
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+동시 쿼리 인코딩 micro-batching
+- 여러 요청이 같은 모델로 한 문장씩 encode() 하던 것을
+  짧은 대기 시간(window) 동안 모아서 한 번의 배치 forward 로 처리
+- 모델마다 배치 스레드 1개 → 같은 모델 인스턴스를 동시에 두드리지 않음
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "5"))
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+
+
+class MicroBatcher:
+    """
+    encode_batch(List[str]) -> (N, D) 함수를 감싸서
+    submit(text) -> Future[np.ndarray(D,)] 로 노출
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = QUERY_BATCH_MAX,
+        max_wait_ms: float = QUERY_BATCH_WAIT_MS,
+        name: str = "batcher",
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        # 카운터를 먼저 만들고 나서 시작 (_loop 가 바로 갱신함)
+        self._thread = threading.Thread(target=self._loop, name=f"micro-batch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            # 같은 문장이 동시에 들어오면 한 번만 인코딩
+            uniq: Dict[str, int] = {}
+            for text, _ in batch:
+                uniq.setdefault(text, len(uniq))
+            try:
+                vecs = np.asarray(self.encode_batch(list(uniq)))
+            except BaseException as e:  # 배치 실패 → 모든 대기자에게 전달
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for text, fut in batch:
+                fut.set_result(vecs[uniq[text]])
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": (self.items / self.batches) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+_batchers: Dict[int, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model, encode_batch: Callable[[Sequence[str]], np.ndarray], name: str = "batcher") -> MicroBatcher:
+    """모델 인스턴스당 하나의 MicroBatcher 를 공유"""
+    key = id(model)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatcher(encode_batch, name=name)
+                _batchers[key] = batcher
+    return batcher
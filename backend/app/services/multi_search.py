@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+텍스트 + 이미지 동시 검색 (/api/search)
+- distil kNN(embeddings_text) 과 SigLIP fused kNN(embeddings_imgtxt) 을 _msearch 한 번으로
+  (RERANK_MODE=es 면 텍스트 쪽은 rescore body 그대로 → koe5 rerank 도 같은 요청 안에서)
+- 로컬 ANN 백엔드면 두 kNN 을 스레드 두 개로 동시에
+- 결과는 session_id 로 합치고 모달리티별 점수 + RRF 융합 점수로 정렬
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from app.es.client import get_client
+from app.es.index_profile import project_query
+from app.services.search_backend import get_backend, knn_body
+from app.services.txt2txt.search_services import (
+    DISPLAY_FIELDS, RERANK_MODE, rerank_candidates, es_rescore_body, search_with_distil,
+)
+from app.services.txt2img.search_servicesImg import search_with_fused
+
+FANOUT_RRF_K = int(os.getenv("FANOUT_RRF_K", "60"))
+TEXT_INDEX = "embeddings_text"
+IMAGE_INDEX = "embeddings_imgtxt"
+IMAGE_FIELDS = ["session_id", "camera_id", "video_file", "text"]
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fanout")
+
+
+def _msearch(q_vec_distil, q_vec_koe5, q_vec_fused, k: int, num_candidates: int, top_n: int):
+    """ES 왕복 한 번 → (텍스트 [(hit, score)], 이미지 [hit])"""
+    es_rescore = RERANK_MODE == "es"
+    text_body = (
+        es_rescore_body(q_vec_distil, q_vec_koe5, k=k, num_candidates=num_candidates, top_n=top_n)
+        if es_rescore else
+        knn_body("embedding_distiluse", project_query("embedding_distiluse", q_vec_distil),
+                 k, num_candidates, DISPLAY_FIELDS)
+    )
+    image_body = knn_body("embedding_siglip_fused", project_query("embedding_siglip_fused", q_vec_fused),
+                          k, num_candidates, IMAGE_FIELDS)
+    res = get_client().msearch(body=[{"index": TEXT_INDEX}, text_body, {"index": IMAGE_INDEX}, image_body])
+
+    # 한쪽이라도 실패하면(인덱스 없음, 매핑 불일치 등) 올림 → 빈 결과가 "매치 없음" 처럼 보이지 않게
+    # (단건 search 처럼 호출부까지 예외로 전달, 로컬 백엔드도 future.result() 에서 같은 동작)
+    text_res, image_res = res["responses"]
+    failed = {name: r["error"] for name, r in (("text", text_res), ("image", image_res)) if "error" in r}
+    if failed:
+        for name, err in failed.items():
+            print(f"[ERR] msearch {name} failed: {err}")
+        raise RuntimeError(f"msearch failed for {', '.join(failed)}: {failed}")
+    text_hits = text_res.get("hits", {}).get("hits", [])
+    image_hits = image_res.get("hits", {}).get("hits", [])
+
+    if es_rescore:
+        text_ranked = [(h, float(h["_score"]) - 1.0) for h in text_hits]
+    else:
+        # 후보는 이미 받았으니 koe5 벡터가 vector_store 에 없을 때만 다시 요청
+        def fetch(source_fields):
+            if source_fields == DISPLAY_FIELDS:
+                return text_hits
+            return search_with_distil(q_vec_distil, index=TEXT_INDEX, k=k, num_candidates=num_candidates,
+                                      source_fields=source_fields)
+
+        text_ranked = rerank_candidates(fetch, q_vec_koe5, top_n=top_n)
+    return text_ranked, image_hits[:top_n]
+
+
+def _parallel_local(q_vec_distil, q_vec_koe5, q_vec_fused, k: int, num_candidates: int, top_n: int):
+    """로컬 ANN 백엔드: 두 kNN 을 동시에"""
+    text_fut = _pool.submit(
+        rerank_candidates,
+        lambda src: search_with_distil(q_vec_distil, index=TEXT_INDEX, k=k, num_candidates=num_candidates, source_fields=src),
+        q_vec_koe5, top_n,
+    )
+    image_fut = _pool.submit(search_with_fused, q_vec_fused, IMAGE_INDEX, k, num_candidates, IMAGE_FIELDS)
+    return text_fut.result(), image_fut.result()[:top_n]
+
+
+def fanout_search(q_vec_distil, q_vec_koe5, q_vec_fused, k: int = 50, num_candidates: int = 100,
+                  top_n: int = 5) -> List[Dict[str, Any]]:
+    """
+    세션 단위로 합친 결과
+    - text_score: koe5 rerank 점수, image_score: SigLIP fused kNN 점수 (없으면 None)
+    - score: 두 목록 순위의 RRF 합 (한쪽에만 있으면 그쪽 순위만)
+    """
+    if get_backend().name == "es":
+        text_ranked, image_hits = _msearch(q_vec_distil, q_vec_koe5, q_vec_fused, k, num_candidates, top_n)
+    else:
+        text_ranked, image_hits = _parallel_local(q_vec_distil, q_vec_koe5, q_vec_fused, k, num_candidates, top_n)
+
+    merged: Dict[str, Dict[str, Any]] = {}
+
+    def entry(src: Dict[str, Any]) -> Dict[str, Any]:
+        sid = src["session_id"]
+        if sid not in merged:
+            merged[sid] = {
+                "session_id": sid,
+                "camera_id": src.get("camera_id"),
+                "video_summary": src.get("text"),
+                "text_score": None,
+                "image_score": None,
+                "score": 0.0,
+            }
+        return merged[sid]
+
+    for rank, (h, score) in enumerate(text_ranked):
+        e = entry(h["_source"])
+        e["text_score"] = float(score)
+        e["score"] += 1.0 / (FANOUT_RRF_K + rank + 1)
+    for rank, h in enumerate(image_hits):
+        e = entry(h["_source"])
+        e["image_score"] = float(h["_score"])
+        e["score"] += 1.0 / (FANOUT_RRF_K + rank + 1)
+
+    return sorted(merged.values(), key=lambda e: e["score"], reverse=True)
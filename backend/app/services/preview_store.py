@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+검색 결과 미리보기용 경량 파일 (인제스트 때 생성)
+    PREVIEW_DIR/<키>.sprite.jpg    키프레임 JPEG 스프라이트 (가로 SPRITE_COLS 칸)
+    PREVIEW_DIR/<키>.sprite.json   {tile_w, tile_h, cols, rows, count}
+    PREVIEW_DIR/<키>.preview.mp4   저비트레이트 프리뷰 (ffmpeg 가 있을 때만)
+- 키 = 원본 영상 경로의 sha1 → 엔드포인트는 video_index 로 찾은 경로에서 바로 계산
+- 원본 영상이 바뀌면 인제스트 manifest(video_signature) 가 재처리 → 같은 키로 덮어씀
+- 결과 파일이 원본 영상보다 새것이면 다시 만들지 않음 (manifest 없는 ingest_embeddings_10fps 도 매번 재인코딩 안 함)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.services.env_loader import env_loader
+
+PREVIEW_DIR = Path(os.getenv("PREVIEW_DIR", f"{env_loader.env_loader()}/data/previews"))
+SPRITE_TILE_W = int(os.getenv("SPRITE_TILE_W", "192"))
+SPRITE_COLS = int(os.getenv("SPRITE_COLS", "5"))
+SPRITE_QUALITY = int(os.getenv("SPRITE_QUALITY", "70"))
+PREVIEW_HEIGHT = int(os.getenv("PREVIEW_HEIGHT", "240"))
+PREVIEW_CRF = int(os.getenv("PREVIEW_CRF", "32"))
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+
+def preview_key(video_path: str) -> str:
+    return hashlib.sha1(str(Path(video_path).resolve()).encode("utf-8")).hexdigest()
+
+
+def sprite_path(video_path: str, base_dir: Path = PREVIEW_DIR) -> Path:
+    return Path(base_dir) / f"{preview_key(video_path)}.sprite.jpg"
+
+
+def sprite_meta_path(video_path: str, base_dir: Path = PREVIEW_DIR) -> Path:
+    return Path(base_dir) / f"{preview_key(video_path)}.sprite.json"
+
+
+def preview_path(video_path: str, base_dir: Path = PREVIEW_DIR) -> Path:
+    return Path(base_dir) / f"{preview_key(video_path)}.preview.mp4"
+
+
+def _up_to_date(video_path: str, *outputs: Path) -> bool:
+    """결과 파일이 전부 있고 원본 영상보다 나중에 쓰였으면 True"""
+    try:
+        src_mtime = os.stat(video_path).st_mtime_ns
+        return all(os.stat(p).st_mtime_ns >= src_mtime for p in outputs)
+    except OSError:
+        return False
+
+
+def write_sprite(video_path: str, frames: Sequence[np.ndarray], base_dir: Path = PREVIEW_DIR) -> Optional[Path]:
+    """
+    BGR 원본 프레임들 → 원본 비율을 유지한 타일 격자 JPEG
+    - 디코더 프로세스가 이미 읽은 키프레임을 그대로 씀 (추가 디코딩 없음)
+    """
+    if not frames:
+        return None
+    out = sprite_path(video_path, base_dir)
+    if _up_to_date(video_path, out, sprite_meta_path(video_path, base_dir)):
+        return out
+    h0, w0 = frames[0].shape[:2]
+    tile_w = SPRITE_TILE_W
+    tile_h = max(1, round(tile_w * h0 / w0))
+    cols = min(SPRITE_COLS, len(frames))
+    rows = -(-len(frames) // cols)
+
+    sheet = Image.new("RGB", (cols * tile_w, rows * tile_h))
+    for i, frame in enumerate(frames):
+        tile = cv2.resize(frame, (tile_w, tile_h), interpolation=cv2.INTER_AREA)
+        tile = Image.fromarray(cv2.cvtColor(tile, cv2.COLOR_BGR2RGB))
+        sheet.paste(tile, ((i % cols) * tile_w, (i // cols) * tile_h))
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".jpg.tmp")
+    sheet.save(tmp, format="JPEG", quality=SPRITE_QUALITY, optimize=True)
+    os.replace(tmp, out)
+    meta = {"tile_w": tile_w, "tile_h": tile_h, "cols": cols, "rows": rows, "count": len(frames)}
+    with open(sprite_meta_path(video_path, base_dir), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return out
+
+
+def write_preview_proxy(video_path: str, base_dir: Path = PREVIEW_DIR) -> Optional[Path]:
+    """ffmpeg 로 세로 PREVIEW_HEIGHT, 소리 없는 faststart mp4. ffmpeg 가 없거나 실패하면 None"""
+    out = preview_path(video_path, base_dir)
+    if _up_to_date(video_path, out):
+        return out
+    if shutil.which(FFMPEG_BIN) is None:
+        return None
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp.mp4")
+    cmd = [
+        FFMPEG_BIN, "-y", "-loglevel", "error", "-i", str(video_path),
+        "-vf", f"scale=-2:{PREVIEW_HEIGHT}", "-c:v", "libx264", "-preset", "veryfast",
+        "-crf", str(PREVIEW_CRF), "-an", "-movflags", "+faststart", str(tmp),
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[WARN] preview proxy failed {video_path}: {getattr(e, 'stderr', b'') or e}")
+        tmp.unlink(missing_ok=True)
+        return None
+    os.replace(tmp, out)
+    return out
+
+
+def load_sprite_meta(video_path: str, base_dir: Path = PREVIEW_DIR) -> Optional[Dict]:
+    path = sprite_meta_path(video_path, base_dir)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def available_previews(video_path: str, base_dir: Path = PREVIEW_DIR) -> List[str]:
+    """만들어져 있는 미리보기 종류 ("sprite", "preview")"""
+    kinds = []
+    if sprite_path(video_path, base_dir).exists():
+        kinds.append("sprite")
+    if preview_path(video_path, base_dir).exists():
+        kinds.append("preview")
+    return kinds
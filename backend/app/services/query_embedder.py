@@ -1,16 +1,52 @@
+from .embedding_cache import model_key, normalize_query, query_cache
+from .micro_batcher import get_batcher
+
+
+def _st_batcher(model):
+    # 동시에 들어온 쿼리들과 묶어서 한 번에 encode
+    return get_batcher(
+        model,
+        lambda texts: model.encode(texts, normalize_embeddings=True, convert_to_numpy=True),
+        name=model_key(model),
+    )
+
+def _encode_fused(model, query: str):
+    batcher = get_batcher(model, model.embed_texts, name=model_key(model))
+    return batcher.encode(query)
+
 def embed_query(query: str, distil_model, koe5_model):
     """
     문자열 쿼리를 임베딩 벡터 2개로 변환
     - distil_model: 50개 후보 검색용
     - koe5_model:   rerank (top-5)용
+    - 같은 쿼리가 다시 오면 query_cache 에서 꺼내고 모델은 돌리지 않음
+    - 캐시 miss 는 모델별 micro-batcher 에 동시에 넣고 같이 기다림
+      (캐시 키와 같은 정규화 텍스트를 인코딩 → 표기만 다른 쿼리도 같은 벡터)
     """
-    q_vec_distil = distil_model.encode(query, normalize_embeddings=True)
-    q_vec_koe5   = koe5_model.encode(query, normalize_embeddings=True)
+    vecs = []
+    pending = []
+    for model in (distil_model, koe5_model):
+        vec = query_cache.get(model_key(model), query)
+        if vec is None:
+            pending.append((len(vecs), model, _st_batcher(model).submit(normalize_query(query))))
+        vecs.append(vec)
+    for i, model, fut in pending:
+        vecs[i] = fut.result()
+        query_cache.put(model_key(model), query, vecs[i])
+
+    q_vec_distil, q_vec_koe5 = vecs
     return q_vec_distil.astype(float).tolist(), q_vec_koe5.astype(float).tolist()
 
+def embed_query_single(query: str, model):
+    """
+    SentenceTransformer 모델 하나로만 임베딩 (rerank 없는 하이브리드 검색 등)
+    """
+    vec = query_cache.get_or_compute(model_key(model), query, lambda q: _st_batcher(model).encode(q))
+    return vec.astype(float).tolist()
+
 def embed_query_fused(query: str, fused_model):
     """
     SigLIP 모델을 사용해 쿼리 텍스트를 벡터로 변환
     """
-    vec = fused_model.embed_texts([query])[0]   # 🔑 리스트로 넘기고 첫 결과만
+    vec = query_cache.get_or_compute(model_key(fused_model), query, lambda q: _encode_fused(fused_model, q))
     return vec.astype(float).tolist()                         # numpy → list 변환
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+kNN 검색 백엔드 추상화
+- SEARCH_BACKEND=es    → Elasticsearch knn (기본값)
+- SEARCH_BACKEND=local → app.services.ann_index 의 프로세스 내 인덱스 (네트워크 없음)
+- 두 백엔드 모두 ES hits 와 같은 모양({"_id", "_score", "_source"})을 돌려줘서
+  search_services 쪽 후처리 코드는 그대로 쓴다
+"""
+
+import abc
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "es")
+
+
+class SearchBackend(abc.ABC):
+    """백엔드는 knn 을 구현해야 생성 가능 (빠뜨리면 첫 검색이 아니라 생성 시점에 TypeError)"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def knn(
+        self,
+        index: str,
+        field: str,
+        query_vector: Sequence[float],
+        k: int = 50,
+        num_candidates: int = 100,
+        source_fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """ES hits 모양 목록 ({"_id", "_score", "_source"}), 점수 내림차순"""
+
+
+def knn_body(field, query_vector, k=50, num_candidates=100, source_fields=None) -> Dict[str, Any]:
+    """ES knn 검색 body (단건 search / msearch 공용)"""
+    body: Dict[str, Any] = {
+        "knn": {
+            "field": field,
+            "query_vector": query_vector,
+            "k": k,
+            "num_candidates": num_candidates
+        },
+        "size": k,
+    }
+    if source_fields is not None:
+        body["_source"] = list(source_fields)
+    return body
+
+
+def collapse_hits(hits: List[Dict[str, Any]], field: str, size: int) -> List[Dict[str, Any]]:
+    """점수순 hits → _source[field] 값마다 첫 hit 만 size 개 (ES collapse 와 같은 결과, 로컬 백엔드용)"""
+    seen = set()
+    out: List[Dict[str, Any]] = []
+    for h in hits:
+        key = h["_source"][field]
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(h)
+        if len(out) >= size:
+            break
+    return out
+
+
+class ElasticsearchBackend(SearchBackend):
+    name = "es"
+
+    def __init__(self, es=None):
+        if es is None:
+            from ..es.client import get_client
+            es = get_client()
+        self.es = es
+
+    def knn(self, index, field, query_vector, k=50, num_candidates=100, source_fields=None):
+        body = knn_body(field, query_vector, k, num_candidates, source_fields)
+        res = self.es.search(index=index, body=body)
+        return res["hits"]["hits"]
+
+
+class LocalAnnBackend(SearchBackend):
+    name = "local"
+
+    def knn(self, index, field, query_vector, k=50, num_candidates=100, source_fields=None):
+        from .ann_index import get_ann_index
+
+        ann = get_ann_index(index)
+        rows, cos = ann.search(field, query_vector, k=k, num_candidates=num_candidates)
+        return [
+            {
+                "_id": ann.ids[row],
+                "_score": float((1.0 + c) / 2.0),   # ES cosine similarity 점수와 같은 스케일
+                "_source": ann.source(int(row), source_fields),
+            }
+            for row, c in zip(rows, cos)
+        ]
+
+
+_backend: Optional[SearchBackend] = None
+
+
+def get_backend() -> SearchBackend:
+    """설정(SEARCH_BACKEND)에 맞는 백엔드 싱글톤"""
+    global _backend
+    if _backend is None:
+        if SEARCH_BACKEND == "local":
+            _backend = LocalAnnBackend()
+        elif SEARCH_BACKEND == "es":
+            _backend = ElasticsearchBackend()
+        else:
+            raise ValueError(f"unknown SEARCH_BACKEND: {SEARCH_BACKEND}")
+    return _backend
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+구간(segment) 인덱스 검색 (/api/search/segments)
+- SigLIP 텍스트 쿼리 벡터 ↔ 구간 이미지 벡터 (ingester/ingest_segments.py)
+- ES: kNN + collapse(session_id) → 세션마다 가장 잘 맞는 구간 하나만, 요청 한 번
+  (collapse 는 kNN 상위 k 개 안에서 일어나므로 k 는 top_n 보다 넉넉하게)
+- 로컬 ANN 백엔드: 같은 kNN 후 여기서 session_id 별 첫 hit 만 남김
+"""
+
+import os
+from typing import Any, Dict, List
+
+from app.es.client import get_client
+from app.es.index_profile import project_query
+from app.services.search_backend import collapse_hits, get_backend, knn_body
+
+SEGMENT_INDEX = "embeddings_segments"
+SEGMENT_FIELD = "embedding_siglip_segment"
+SEGMENT_SEARCH_K = int(os.getenv("SEGMENT_SEARCH_K", "200"))
+SEGMENT_NUM_CANDIDATES = int(os.getenv("SEGMENT_NUM_CANDIDATES", "400"))
+SEGMENT_FIELDS = ["session_id", "camera_id", "segment_idx", "start_s", "end_s"]
+
+
+def search_segments(q_vec, k: int = SEGMENT_SEARCH_K, num_candidates: int = SEGMENT_NUM_CANDIDATES,
+                    top_n: int = 5) -> List[Dict[str, Any]]:
+    """세션당 최고 구간 top_n 개 → [{id, session_id, camera_id, segment_idx, start_s, end_s, score}]"""
+    qv = project_query(SEGMENT_FIELD, q_vec)
+    backend = get_backend()
+    if backend.name == "es":
+        body = knn_body(SEGMENT_FIELD, qv, k, max(num_candidates, k), SEGMENT_FIELDS)
+        body["collapse"] = {"field": "session_id"}
+        body["size"] = top_n
+        hits = get_client().search(index=SEGMENT_INDEX, body=body)["hits"]["hits"]
+    else:
+        hits = collapse_hits(
+            backend.knn(SEGMENT_INDEX, SEGMENT_FIELD, qv, k=k, num_candidates=max(num_candidates, k),
+                        source_fields=SEGMENT_FIELDS),
+            "session_id", top_n,
+        )
+
+    return [
+        {
+            "id": h["_id"],
+            "session_id": h["_source"]["session_id"],
+            "camera_id": h["_source"].get("camera_id"),
+            "segment_idx": int(h["_source"].get("segment_idx", 0)),
+            "start_s": float(h["_source"]["start_s"]),
+            "end_s": float(h["_source"]["end_s"]),
+            "score": float(h["_score"]),
+        }
+        for h in hits
+    ]
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+세션 센서 시계열 다해상도 저장소
+- 인제스트 때 세션마다 min/max/mean 피라미드를 미리 만들어 둠
+    SENSOR_STORE_DIR/<session_id>/meta.json   컬럼 목록, 샘플 수, 레벨별 버킷 크기
+    SENSOR_STORE_DIR/<session_id>/L0.npy      원본 (T, C) float32
+    SENSOR_STORE_DIR/<session_id>/L<k>.npy    (T / factor^k, 3, C) float32  [min, max, mean]
+- 조회 시 요청 해상도(점 개수) 이하가 되는 가장 촘촘한 레벨을 mmap 으로 열어 필요한 컬럼만 잘라 반환
+  (가장 성긴 레벨도 resolution 보다 많으면 원본에서 resolution 개 이하 버킷으로 바로 집계)
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.services.env_loader import env_loader
+
+SENSOR_STORE_DIR = Path(os.getenv("SENSOR_STORE_DIR", f"{env_loader.env_loader()}/data/sensors"))
+PYRAMID_FACTOR = int(os.getenv("SENSOR_PYRAMID_FACTOR", "4"))
+PYRAMID_MIN_BUCKETS = int(os.getenv("SENSOR_PYRAMID_MIN_BUCKETS", "32"))   # 이보다 적어지면 레벨 생성 중단
+
+# 시계열이 아닌 컬럼 (피라미드 대상에서 제외)
+NON_SERIES_COLS = {"session_id", "camera_id"}
+
+
+def _session_dir(session_id: str, base_dir: Path = SENSOR_STORE_DIR) -> Path:
+    return Path(base_dir) / re.sub(r"[^\w.\-]", "_", str(session_id))
+
+
+def _downsample(raw: np.ndarray, bucket: int) -> np.ndarray:
+    """(T, C) → (ceil(T/bucket), 3, C) [min, max, mean], NaN 무시"""
+    t, c = raw.shape
+    nb = -(-t // bucket)
+    padded = np.full((nb * bucket, c), np.nan, dtype=np.float32)
+    padded[:t] = raw
+    blocks = padded.reshape(nb, bucket, c)
+    valid = ~np.isnan(blocks)
+    cnt = valid.sum(axis=1)
+    out = np.full((nb, 3, c), np.nan, dtype=np.float32)
+    has = cnt > 0
+    out[:, 0][has] = np.where(valid, blocks, np.inf).min(axis=1)[has]
+    out[:, 1][has] = np.where(valid, blocks, -np.inf).max(axis=1)[has]
+    out[:, 2][has] = (np.where(valid, blocks, 0.0).sum(axis=1)[has] / cnt[has])
+    return out
+
+
+def build_session_pyramid(
+    session_id: str,
+    df: pd.DataFrame,
+    base_dir: Path = SENSOR_STORE_DIR,
+    factor: int = PYRAMID_FACTOR,
+    min_buckets: int = PYRAMID_MIN_BUCKETS,
+) -> None:
+    """세션 하나의 DataFrame(행 = 시간순 샘플) → 피라미드 파일"""
+    cols = [
+        c for c in df.columns
+        if c not in NON_SERIES_COLS and pd.api.types.is_numeric_dtype(df[c])
+    ]
+    raw = df[cols].to_numpy(dtype=np.float32, na_value=np.nan)
+
+    out = _session_dir(session_id, base_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    np.save(out / "L0.npy", raw)
+
+    levels = [{"level": 0, "bucket": 1, "n": int(raw.shape[0])}]
+    bucket = factor
+    while raw.shape[0] // bucket >= min_buckets:
+        level = len(levels)
+        np.save(out / f"L{level}.npy", _downsample(raw, bucket))
+        levels.append({"level": level, "bucket": bucket, "n": -(-raw.shape[0] // bucket)})
+        bucket *= factor
+
+    with open(out / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {"session_id": str(session_id), "columns": cols, "n_samples": int(raw.shape[0]), "levels": levels},
+            f, ensure_ascii=False,
+        )
+
+
+def load_meta(session_id: str, base_dir: Path = SENSOR_STORE_DIR) -> Optional[Dict[str, Any]]:
+    path = _session_dir(session_id, base_dir) / "meta.json"
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _to_list(a: np.ndarray) -> List[Optional[float]]:
+    """NaN → None (JSON 직렬화용)"""
+    return [None if v != v else float(v) for v in a.tolist()]
+
+
+def query_series(
+    session_id: str,
+    cols: Optional[Sequence[str]] = None,
+    resolution: int = 500,
+    base_dir: Path = SENSOR_STORE_DIR,
+) -> Optional[Dict[str, Any]]:
+    """
+    점 개수 resolution 이하가 되는 가장 촘촘한 레벨에서 컬럼별 min/max/mean (항상 resolution 점 이하)
+    - 세션이 없으면 None, 없는 컬럼이 있으면 KeyError
+    """
+    meta = load_meta(session_id, base_dir)
+    if meta is None:
+        return None
+
+    columns: List[str] = meta["columns"]
+    cols = list(cols) if cols else columns
+    unknown = [c for c in cols if c not in columns]
+    if unknown:
+        raise KeyError(unknown)
+    col_idx = [columns.index(c) for c in cols]
+
+    levels = meta["levels"]
+    resolution = max(1, resolution)
+    chosen = next((lv for lv in levels if lv["n"] <= resolution), None)
+    if chosen is None:
+        # 가장 성긴 레벨도 resolution 보다 많음 (아주 작은 resolution / 레벨이 없는 짧은 세션)
+        # → 원본에서 필요한 컬럼만 resolution 개 이하 버킷으로 바로 집계 (NaN 이 섞여도 정확한 mean)
+        bucket = -(-meta["n_samples"] // resolution)
+        raw = np.load(_session_dir(session_id, base_dir) / "L0.npy", mmap_mode="r")
+        sub = _downsample(np.asarray(raw[:, col_idx]), bucket)
+    else:
+        bucket = chosen["bucket"]
+        arr = np.load(_session_dir(session_id, base_dir) / f"L{chosen['level']}.npy", mmap_mode="r")
+        sub = np.asarray(arr[:, col_idx]) if chosen["level"] == 0 else np.asarray(arr[:, :, col_idx])
+    n_points = sub.shape[0]
+
+    series: Dict[str, Dict[str, List[Optional[float]]]] = {}
+    if sub.ndim == 2:
+        for j, c in enumerate(cols):
+            values = _to_list(sub[:, j])
+            series[c] = {"min": values, "max": values, "mean": values}
+    else:
+        for j, c in enumerate(cols):
+            series[c] = {
+                "min": _to_list(sub[:, 0, j]),
+                "max": _to_list(sub[:, 1, j]),
+                "mean": _to_list(sub[:, 2, j]),
+            }
+
+    return {
+        "session_id": meta["session_id"],
+        "n_samples": meta["n_samples"],
+        "bucket": bucket,
+        "x": list(range(0, n_points * bucket, bucket)),   # 버킷 시작 샘플 번호
+        "series": series,
+    }
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+세션 데이터 Parquet 저장소
+- all_labs_merged.csv (센서 컬럼 300+개) 를 한 번만 Parquet 데이터셋으로 변환
+    SESSION_PARQUET_DIR/<lab>=<값>/part-*.parquet   (lab 컬럼이 있으면 hive 파티션)
+    SESSION_PARQUET_DIR/_session_index.json         {session_id: 파티션 값, 변환한 CSV 의 크기/mtime}
+- 인제스터는 load_sessions(columns=..., session_ids=...) 로 필요한 컬럼/세션만 읽음
+- Parquet 가 아직 없으면 CSV 에서 usecols 로 필요한 컬럼만 읽는 방식으로 동작
+- CSV 가 변환 이후 바뀌었으면(크기/mtime 불일치) 다시 변환, 변환이 실패하면 CSV 를 직접 읽음
+  (SESSION_PARQUET_AUTOCONVERT=0 이면 다시 변환하지 않고 바로 CSV)
+    변환: python -m app.services.session_store
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from app.services.env_loader import env_loader
+
+BASE_DIR = env_loader.env_loader()
+CSV_PATH = f"{BASE_DIR}/data/all_labs_merged.csv"
+PARQUET_DIR = Path(os.getenv("SESSION_PARQUET_DIR", f"{BASE_DIR}/data/sessions_parquet"))
+PARTITION_COL = os.getenv("SESSION_PARTITION_COL", "lab")
+ROW_GROUP_SIZE = int(os.getenv("SESSION_ROW_GROUP_SIZE", "65536"))
+AUTOCONVERT = os.getenv("SESSION_PARQUET_AUTOCONVERT", "1") == "1"
+
+INDEX_FILE = "_session_index.json"
+
+
+def _index_path(out_dir: Path) -> Path:
+    return Path(out_dir) / INDEX_FILE
+
+
+def _csv_signature(csv_path: str) -> Optional[Dict]:
+    """CSV 크기 + mtime (없으면 None)"""
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def convert_csv_to_parquet(csv_path: str = CSV_PATH, out_dir: Path = PARQUET_DIR) -> None:
+    """CSV → (lab 파티션) Parquet + 세션 인덱스. 세션 순으로 정렬해서 row group 통계로 세션 필터가 먹게 함"""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+
+    out_dir = Path(out_dir)
+    source = _csv_signature(csv_path)   # 읽기 전에 기록 → 변환 중에 CSV 가 바뀌면 다음에 다시 변환
+    table = pacsv.read_csv(csv_path)
+    # session_id / 파티션 컬럼은 항상 문자열로 (숫자처럼 보이는 값이 섞여도 타입 고정)
+    for col in ("session_id", PARTITION_COL):
+        if col in table.column_names and not pa.types.is_string(table.schema.field(col).type):
+            idx = table.schema.get_field_index(col)
+            table = table.set_column(idx, col, table.column(col).cast(pa.string()))
+
+    partitioned = PARTITION_COL in table.column_names
+    sort_keys = ([(PARTITION_COL, "ascending")] if partitioned else []) + [("session_id", "ascending")]
+    table = table.sort_by(sort_keys)
+
+    ds.write_dataset(
+        table,
+        out_dir,
+        format="parquet",
+        partitioning=[PARTITION_COL] if partitioned else None,
+        partitioning_flavor="hive" if partitioned else None,
+        max_rows_per_group=ROW_GROUP_SIZE,
+        existing_data_behavior="delete_matching",
+    )
+
+    # 세션 → 파티션 값 (세션 필터 시 읽을 파티션만 고르기 위함)
+    sessions = table.select(["session_id"] + ([PARTITION_COL] if partitioned else [])).to_pandas()
+    sessions = sessions.drop_duplicates(subset=["session_id"])
+    index = {
+        "partition_col": PARTITION_COL if partitioned else None,
+        "columns": table.column_names,
+        "source": source,
+        "sessions": {
+            str(row[0]): (None if not partitioned else str(row[1]))
+            for row in sessions.itertuples(index=False, name=None)
+        },
+    }
+    tmp = _index_path(out_dir).with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, _index_path(out_dir))
+    print(f"[OK] {csv_path} → {out_dir} ({table.num_rows} rows, {len(index['sessions'])} sessions)")
+
+
+def load_session_index(out_dir: Path = PARQUET_DIR) -> Optional[Dict]:
+    path = _index_path(out_dir)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _current_index(parquet_dir: Path, csv_path: str) -> Optional[Dict]:
+    """
+    CSV 와 맞는 세션 인덱스 (None → CSV 를 직접 읽어야 함)
+    - CSV 가 없으면 Parquet 가 유일한 사본이므로 그대로 사용
+    - CSV 크기/mtime 이 변환 당시와 다르면 다시 변환 (실패하면 None)
+    """
+    index = load_session_index(parquet_dir)
+    if index is None:
+        return None
+    current = _csv_signature(csv_path)
+    if current is None or index.get("source") == current:
+        return index
+
+    if not AUTOCONVERT:
+        print(f"[WARN] {csv_path} changed since Parquet conversion → reading CSV")
+        return None
+    print(f"[INFO] {csv_path} changed since Parquet conversion → reconverting")
+    try:
+        convert_csv_to_parquet(csv_path, parquet_dir)
+    except Exception as e:
+        print(f"[WARN] Parquet reconversion failed ({e}) → reading CSV")
+        return None
+    return load_session_index(parquet_dir)
+
+
+def load_sessions(
+    columns: Optional[Iterable[str]] = None,
+    session_ids: Optional[Iterable[str]] = None,
+    parquet_dir: Path = PARQUET_DIR,
+    csv_path: str = CSV_PATH,
+) -> pd.DataFrame:
+    """
+    필요한 컬럼/세션만 DataFrame 으로 읽음
+    - columns 중 데이터에 없는 컬럼은 조용히 제외 (호출부에서 컬럼 존재 여부로 분기)
+    - session_ids 가 주어지면 해당 세션 행만
+    """
+    wanted: Optional[List[str]] = list(dict.fromkeys(columns)) if columns is not None else None
+    ids = None if session_ids is None else {str(s) for s in session_ids}
+
+    index = _current_index(parquet_dir, csv_path)
+    if index is None:
+        # Parquet 변환 전: CSV 에서 필요한 컬럼만
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        df = pd.read_csv(csv_path, usecols=usecols)
+        if ids is not None:
+            df = df[df["session_id"].astype(str).isin(ids)]
+        return df
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    part_col = index.get("partition_col")
+    partitioning = ds.partitioning(pa.schema([(part_col, pa.string())]), flavor="hive") if part_col else None
+    dataset = ds.dataset(parquet_dir, format="parquet", partitioning=partitioning)
+    available = set(dataset.schema.names)
+    cols = [c for c in wanted if c in available] if wanted is not None else None
+
+    flt = None
+    if ids is not None:
+        flt = ds.field("session_id").isin(sorted(ids))
+        if part_col:
+            # 세션이 속한 파티션만 스캔
+            parts = sorted({index["sessions"][s] for s in ids if s in index["sessions"]})
+            flt = flt & ds.field(part_col).isin(parts)
+
+    return dataset.to_table(columns=cols, filter=flt).to_pandas()
+
+
+if __name__ == "__main__":
+    convert_csv_to_parquet()
@@ -1,37 +1,33 @@
-import numpy as np
-from ...es.client import get_client
 from ..query_embedder import embed_query_fused   # ✅ SigLIP fused 전용
-from ...models_emb.embedder_siglip import UnifiedEmbedder
-es = get_client()
+from ...models_emb.registry import get_model
+from ..search_backend import get_backend
+from ...es.index_profile import project_query
+from ..hybrid_search import hybrid_search
 
 # fused 벡터 기반 KNN 검색
-def search_with_fused(query_vec, index="embeddings_imgtxt"):
-    body = {
-        "knn": {
-            "field": "embedding_siglip_fused",   # ✅ ingest 단계와 맞춤
-            "query_vector": query_vec,
-            "k": 50,             # 후보는 넉넉히 뽑고
-            "num_candidates": 100
-        }
-    }
-    res = es.search(index=index, body=body)
-    return res["hits"]["hits"]
+def search_with_fused(query_vec, index="embeddings_imgtxt", k=50, num_candidates=100, source_fields=None):
+    return get_backend().knn(
+        index,
+        "embedding_siglip_fused",   # ✅ ingest 단계와 맞춤
+        project_query("embedding_siglip_fused", query_vec),   # PCA 투영 프로파일이면 인덱스와 같은 공간으로
+        k=k,                 # 후보는 넉넉히 뽑고
+        num_candidates=num_candidates,
+        # 1152 차원 벡터는 응답에서 제외 (화면 필드만)
+        source_fields=source_fields if source_fields is not None else ["session_id", "camera_id", "video_file", "text"],
+    )
 
 
-siglip = UnifiedEmbedder(
-    "google/siglip-so400m-patch14-384",
-    device="cuda",
-    dtype="float16",
-    normalize=True
-)
+# SigLIP 은 모델 레지스트리에서 처음 쓸 때 로드 (import 시점 로드 X)
+def __getattr__(name):
+    # 예전 `from ...search_servicesImg import siglip` 호환
+    if name == "siglip":
+        return get_model("siglip")
+    raise AttributeError(name)
 
 
 
-# 최종 search 함수 (상위 5개만 반환)
-def search_fused(q: str, index="embeddings_imgtxt"):
-
-    # ✅ 쿼리 임베딩 (인스턴스 siglip 사용!)
-    q_vec = embed_query_fused(q, siglip)
+# 임베딩이 끝난 쿼리 벡터로 검색 (상위 5개만 반환)
+def search_fused_by_vector(q_vec, index="embeddings_imgtxt"):
 
     # 후보 검색
     candidates = search_with_fused(q_vec, index=index)
@@ -48,3 +44,31 @@ def search_fused(q: str, index="embeddings_imgtxt"):
         }
         for h in candidates[:5]
     ]
+
+
+# 하이브리드: BM25(text) + fused kNN 을 ES 요청 한 번으로 (hybrid_search 참고)
+def search_fused_hybrid_by_vector(q, q_vec, index="embeddings_imgtxt"):
+    hits = hybrid_search(
+        index, q, "embedding_siglip_fused", q_vec,
+        k=50, num_candidates=100,
+        source_fields=["session_id", "camera_id", "video_file", "text"],
+    )
+    return [
+        {
+            "id": h["_id"],
+            "session_id": h["_source"]["session_id"],
+            "camera_id": h["_source"].get("camera_id"),
+            "video_file": h["_source"].get("video_file"),
+            "text": h["_source"].get("text"),
+            "score": h["_score"],   # RRF 면 순위 점수, weighted 면 가중합
+        }
+        for h in hits[:5]
+    ]
+
+
+# 최종 search 함수 (상위 5개만 반환)
+def search_fused(q: str, index="embeddings_imgtxt"):
+
+    # ✅ 쿼리 임베딩 (레지스트리의 공용 siglip 인스턴스)
+    q_vec = embed_query_fused(q, get_model("siglip"))
+    return search_fused_by_vector(q_vec, index=index)
@@ -1,50 +1,138 @@
+import os
 import numpy as np
 from ...es.client import get_client
+from ...es.index_profile import project_query
 from ..query_embedder import embed_query
+from ..search_backend import get_backend
+from ..hybrid_search import hybrid_search
+from ..vector_store import get_vector_store
 
-es = get_client()   
+# rerank 위치: "local" → 후보의 koe5 벡터를 받아와서 여기서 행렬곱
+#              "es"    → ES rescore(script_score)로 처리, 벡터는 네트워크로 안 나옴
+RERANK_MODE = os.getenv("RERANK_MODE", "local")
+
+# 화면에 필요한 필드만 (_source 에 들어있는 512/768 차원 벡터는 받지 않음)
+DISPLAY_FIELDS = ["session_id", "camera_id", "text"]
 
 # distil 모델로 1차 필터링  
-def search_with_distil(query_vec, index="embeddings_text"):
-    body = {
-        "knn": {
-            "field": "embedding_distiluse",   # ✅ ingest 단계와 필드명 맞추기
-            "query_vector": query_vec,
-            "k": 50,
-            "num_candidates": 100
-        }
-    }
-    res = es.search(index=index, body=body)
-    return res["hits"]["hits"]
+def search_with_distil(query_vec, index="embeddings_text", k=50, num_candidates=100, source_fields=None):
+    # SEARCH_BACKEND 설정에 따라 ES knn 또는 로컬 ANN 인덱스
+    return get_backend().knn(
+        index,
+        "embedding_distiluse",   # ✅ ingest 단계와 필드명 맞추기
+        project_query("embedding_distiluse", query_vec),   # PCA 투영 프로파일이면 인덱스와 같은 공간으로
+        k=k,
+        num_candidates=num_candidates,
+        source_fields=source_fields if source_fields is not None else DISPLAY_FIELDS + ["embedding_koe5"],
+    )
 
 # 조금 더 무겁지만 정확도는 좋은 koe5로 마지막 필터링
-def rerank_with_koe5(hits, query_vec):
-    rescored = []
-    for h in hits:
-        doc_vec = np.array(h["_source"]["embedding_koe5"])
-        score = np.dot(query_vec, doc_vec) / (
-            np.linalg.norm(query_vec) * np.linalg.norm(doc_vec) + 1e-8
-        )
-        rescored.append((h, score))
-    
-    rescored.sort(key=lambda x: x[1], reverse=True)
-    return rescored[:5]
+def rerank_with_koe5(hits, query_vec, top_n=5, doc_mat=None):
+    if not hits:
+        return []
+    # 후보 전체를 (N, D) 행렬로 쌓고 행렬-벡터 곱 한 번
+    if doc_mat is None:
+        doc_mat = np.asarray([h["_source"]["embedding_koe5"] for h in hits], dtype=np.float32)
+    q = np.asarray(query_vec, dtype=np.float32)   # 쿼리는 embed_query 에서 이미 정규화됨
+    scores = doc_mat @ q
+    scores /= np.linalg.norm(doc_mat, axis=1) + 1e-8
+
+    top_n = min(top_n, len(hits))
+    top = np.argpartition(-scores, top_n - 1)[:top_n]
+    top = top[np.argsort(-scores[top])]
+    return [(hits[i], float(scores[i])) for i in top]
+
+# ES 안에서 koe5 rescore → 최종 top_n 의 화면 필드만 받아옴
+def es_rescore_body(q_vec_distil, q_vec_koe5, k=50, num_candidates=100, top_n=5):
+    return {
+        "size": top_n,
+        "query": {
+            "knn": {
+                "field": "embedding_distiluse",
+                "query_vector": project_query("embedding_distiluse", q_vec_distil),
+                "num_candidates": num_candidates
+            }
+        },
+        "rescore": {
+            "window_size": k,
+            "query": {
+                "rescore_query": {
+                    "script_score": {
+                        "query": {"match_all": {}},
+                        "script": {
+                            # script_score 는 음수 점수 불가 → +1 후 받아서 다시 -1
+                            "source": "cosineSimilarity(params.q, 'embedding_koe5') + 1.0",
+                            "params": {"q": q_vec_koe5}
+                        }
+                    }
+                },
+                "query_weight": 0.0,
+                "rescore_query_weight": 1.0
+            }
+        },
+        "_source": DISPLAY_FIELDS,
+    }
+
+def search_with_es_rescore(q_vec_distil, q_vec_koe5, index="embeddings_text", k=50, num_candidates=100, top_n=5):
+    body = es_rescore_body(q_vec_distil, q_vec_koe5, k=k, num_candidates=num_candidates, top_n=top_n)
+    res = get_client().search(index=index, body=body)
+    return [(h, float(h["_score"]) - 1.0) for h in res["hits"]["hits"]]
+
+# 1차 후보 + 로컬 rerank
+# - float16 벡터 저장소(vector_store)에 후보가 다 있으면 ES 에서는 화면 필드만 받음
+# - 저장소가 없거나 오래돼서 빠진 후보가 있으면 _source 의 koe5 벡터로 다시 받음
+# - fetch(source_fields) → 후보 hits (distil kNN 또는 하이브리드)
+def rerank_candidates(fetch, q_vec_koe5, top_n=5):
+    store = get_vector_store("embedding_koe5")
+    if store is not None:
+        candidates = fetch(DISPLAY_FIELDS)
+        doc_mat, found = store.gather([h["_id"] for h in candidates])
+        if all(found):
+            return rerank_with_koe5(candidates, q_vec_koe5, top_n=top_n, doc_mat=doc_mat)
+
+    candidates = fetch(DISPLAY_FIELDS + ["embedding_koe5"])
+    return rerank_with_koe5(candidates, q_vec_koe5, top_n=top_n)
+
+def _search_and_rerank_local(q_vec_distil, q_vec_koe5, index="embeddings_text"):
+    return rerank_candidates(
+        lambda src: search_with_distil(q_vec_distil, index=index, source_fields=src), q_vec_koe5
+    )
+
+# ES hit → API 결과 dict
+def _to_result(h, score):
+    return {
+        "id": h["_id"],
+        "session_id": h["_source"]["session_id"],
+        "camera_id": h["_source"].get("camera_id"),   # ✅ 추가
+        "video_summary": h["_source"]["text"],
+        "score": score
+    }
+
+# 임베딩이 끝난 쿼리 벡터로 검색 (ES 호출만, 모델 추론 없음)
+def search_by_vectors(q_vec_distil, q_vec_koe5, index="embeddings_text"):
+
+    if RERANK_MODE == "es" and get_backend().name == "es":
+        final_results = search_with_es_rescore(q_vec_distil, q_vec_koe5, index=index)
+    else:
+        final_results = _search_and_rerank_local(q_vec_distil, q_vec_koe5, index=index)
+
+    return [_to_result(h, score) for h, score in final_results]
+
+# 하이브리드: BM25(text) + distil kNN 을 ES 요청 한 번으로 (hybrid_search 참고)
+# - q_vec_koe5 가 있으면 하이브리드 후보를 koe5 로 rerank, 없으면 융합 순위 그대로 top_n
+def search_hybrid_by_vectors(q, q_vec_distil, q_vec_koe5=None, index="embeddings_text",
+                             k=50, num_candidates=100, top_n=5):
+    def fetch(source_fields):
+        return hybrid_search(index, q, "embedding_distiluse", q_vec_distil,
+                             k=k, num_candidates=num_candidates, source_fields=source_fields)
+
+    if q_vec_koe5 is None:
+        return [_to_result(h, float(h["_score"])) for h in fetch(DISPLAY_FIELDS)[:top_n]]
+    return [_to_result(h, score) for h, score in rerank_candidates(fetch, q_vec_koe5, top_n=top_n)]
+
 
 # 최종 search 함수
 def search(q: str, distil_model, koe5_model, index="embeddings_text"):
 
     q_vec_distil, q_vec_koe5 = embed_query(q, distil_model, koe5_model)
-    
-    candidates = search_with_distil(q_vec_distil, index=index)
-    final_results = rerank_with_koe5(candidates, q_vec_koe5)
-    
-    return [
-        {
-            "id": h["_id"],
-            "session_id": h["_source"]["session_id"],
-            "camera_id": h["_source"].get("camera_id"),   # ✅ 추가
-            "video_summary": h["_source"]["text"],
-            "score": score
-        }
-        for h, score in final_results
-    ]
+    return search_by_vectors(q_vec_distil, q_vec_koe5, index=index)
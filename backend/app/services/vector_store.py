@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+float16 벡터 저장소 (rerank 단계 조회용)
+- 모델(= ES 벡터 필드)마다 파일 2개: VECTOR_STORE_DIR/<field>.f16 / <field>.json
+    .f16   헤더 없는 연속 float16 행렬 (count, dim)
+    .json  {"dim", "count", "rows": {session_id: 행 번호}}
+- 인제스터가 ES 에 넣는 동시에 append, 검색 서비스는 mmap 으로 열어서 후보 행만 읽어 float32 로 복사
+  → ES 응답에 768 차원 JSON 벡터를 실을 필요가 없음
+- 같은 id 를 다시 쓰면 새 행이 추가되고 옛 행은 죽은 행으로 남음
+  → close() 때 죽은 행 비율이 VECTOR_STORE_COMPACT_RATIO 를 넘으면 살아 있는 행만 새 파일로 압축
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_STORE_DIR = Path(os.getenv("VECTOR_STORE_DIR", str(Path(__file__).resolve().parents[1] / "data" / "vectors")))
+VECTOR_STORE_COMPACT_RATIO = float(os.getenv("VECTOR_STORE_COMPACT_RATIO", "0.3"))   # 죽은 행 비율 임계값
+
+
+class VectorStoreWriter:
+    """
+    인제스트용 writer
+    - append=False 면 기존 파일을 새로 씀, True 면 뒤에 이어 씀 (같은 id 는 새 행으로 덮어씀)
+    - close() 때 죽은 행(덮어써진 옛 행) 비율이 compact_ratio 를 넘으면 압축
+    """
+
+    def __init__(self, field: str, dim: int, base_dir: Path = VECTOR_STORE_DIR, append: bool = True,
+                 compact_ratio: float = VECTOR_STORE_COMPACT_RATIO):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.base_dir / f"{field}.f16"
+        self.meta_path = self.base_dir / f"{field}.json"
+        self.dim = int(dim)
+        self.compact_ratio = compact_ratio
+        self.rows: Dict[str, int] = {}
+        self.count = 0
+
+        if append and self.meta_path.exists() and self.data_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if int(meta.get("dim", 0)) == self.dim:
+                self.rows = meta.get("rows", {})
+                self.count = int(meta.get("count", 0))
+            else:
+                append = False   # 차원이 바뀌면 이어 쓸 수 없음
+        if append and self.count:
+            self._f = open(self.data_path, "r+b")
+            self._f.seek(self.count * self.dim * 2)   # 마지막 flush 이후 쓰다 만 부분은 버림
+            self._f.truncate()
+        else:
+            self.rows, self.count = {}, 0
+            self._f = open(self.data_path, "wb")
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        mat = np.ascontiguousarray(np.asarray(vectors, dtype=np.float16).reshape(len(ids), self.dim))
+        self._f.write(mat.tobytes())
+        for i, sid in enumerate(ids):
+            self.rows[str(sid)] = self.count + i
+        self.count += len(ids)
+
+    def flush(self) -> None:
+        self._f.flush()
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "rows": self.rows}, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+
+    def close(self) -> None:
+        dead = self.count - len(self.rows)
+        if self.count and dead / self.count > self.compact_ratio:
+            self._compact()
+        self.flush()
+        self._f.close()
+
+    def _compact(self) -> None:
+        """살아 있는 행만 행 번호 순서대로 새 파일에 복사 → 데이터 파일 교체 (메타는 close 의 flush 에서)"""
+        self._f.flush()
+        old = np.memmap(self.data_path, dtype=np.float16, mode="r", shape=(self.count, self.dim))
+        items = sorted(self.rows.items(), key=lambda kv: kv[1])
+        tmp = self.data_path.with_suffix(".f16.tmp")
+        with open(tmp, "wb") as f:
+            for start in range(0, len(items), 65536):
+                rows = np.fromiter((r for _, r in items[start:start + 65536]), dtype=np.int64)
+                f.write(np.ascontiguousarray(old[rows]).tobytes())
+        del old
+        self._f.close()
+        # 데이터가 먼저 바뀌므로 그 사이 옛 메타로 여는 reader 는 memmap 크기가 안 맞아 실패
+        # → get_vector_store 가 이전 reader 를 계속 씀 (잘못된 행을 읽지는 않음)
+        os.replace(tmp, self.data_path)
+        self._f = open(self.data_path, "ab")
+        print(f"[INFO] vector store {self.data_path.name} compacted: {self.count} → {len(items)} rows")
+        self.rows = {sid: i for i, (sid, _) in enumerate(items)}
+        self.count = len(items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class VectorStore:
+    """검색용 reader (mmap, gather 는 요청한 행만 읽어서 복사)"""
+
+    def __init__(self, field: str, base_dir: Path = VECTOR_STORE_DIR):
+        self.data_path = Path(base_dir) / f"{field}.f16"
+        self.meta_path = Path(base_dir) / f"{field}.json"
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = int(meta["dim"])
+        self.count = int(meta["count"])
+        self.rows: Dict[str, int] = meta["rows"]
+        self.mtime = self.meta_path.stat().st_mtime
+        if self.count:
+            self.matrix = np.memmap(self.data_path, dtype=np.float16, mode="r", shape=(self.count, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float16)
+
+    def gather(self, ids: Sequence[str]) -> Tuple[np.ndarray, List[bool]]:
+        """
+        ids 순서대로 (N, dim) float32 행렬 반환
+        - 저장소에 없는 id 는 0 벡터 + found=False
+        """
+        found = [str(i) in self.rows for i in ids]
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        pos = [i for i, ok in enumerate(found) if ok]
+        if pos:
+            rows = np.fromiter((self.rows[str(ids[i])] for i in pos), dtype=np.int64, count=len(pos))
+            out[pos] = self.matrix[rows]   # 필요한 행만 페이지 인
+        return out, found
+
+
+_stores: Dict[str, Optional[VectorStore]] = {}
+_lock = threading.Lock()
+
+
+def get_vector_store(field: str) -> Optional[VectorStore]:
+    """
+    field 의 저장소 (없으면 None)
+    - 인제스트로 메타 파일이 갱신되면 다시 연다
+    """
+    meta_path = VECTOR_STORE_DIR / f"{field}.json"
+    if not meta_path.exists():
+        return None
+    store = _stores.get(field)
+    if store is None or store.mtime != meta_path.stat().st_mtime:
+        with _lock:
+            try:
+                store = VectorStore(field)
+            except (OSError, ValueError) as e:   # 압축/쓰기 도중 (메타와 데이터 크기가 안 맞음)
+                print(f"[WARN] vector store {field} not readable yet: {e}")
+                return store
+            _stores[field] = store
+    return store
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+세션/카메라 → mp4 경로 인덱스
+- 서버 시작 시 BASE_DIR 를 한 번만 훑어서 (세션 폴더명, camera_id) → 경로 dict 구성
+- 조회는 dict lookup 한 번 (데이터셋 크기와 무관)
+- watchdog 으로 mp4 생성/삭제/이동을 받아 인덱스를 갱신
+- VIDEO_INDEX_CACHE 가 지정되면 디스크(JSON)에 저장/로드해서 재시작 시 바로 조회 가능
+  (서버가 꺼져 있던 동안 추가된 영상은 캐시에 없으므로 로드 후 백그라운드에서 다시 스캔,
+   VIDEO_INDEX_RESCAN=0 이면 생략)
+- 재스캔은 새 dict 에 다 채운 뒤 한 번에 교체 → 스캔 중에도 조회는 이전 인덱스를 봄
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = Path(os.getenv("VIDEO_BASE_DIR", "/home/user2/문서/agentApp"))
+CACHE_PATH = os.getenv("VIDEO_INDEX_CACHE")  # 예: /var/cache/agentApp/video_index.json
+RESCAN_AFTER_CACHE = os.getenv("VIDEO_INDEX_RESCAN", "1") == "1"
+
+VIDEO_EXT = ".mp4"
+
+
+def normalize_session_id(session_id: str) -> str:
+    """
+    ES에 저장된 session_id (Fri_Aug_18_12_06_27_2023) →
+    실제 폴더명 (Fri_Aug_18_12:06:27_2023) 변환
+    """
+    return re.sub(
+        r'_(\d{2})_(\d{2})_(\d{2})_(\d{4})$',
+        lambda m: f"_{m.group(1)}:{m.group(2)}:{m.group(3)}_{m.group(4)}",
+        session_id
+    )
+
+
+class VideoPathIndex:
+    """
+    (세션 폴더명, camera_id) → mp4 절대경로
+    - 기존 rglob + `session_id in str(p)` 와 같은 의미가 되도록
+      mp4 의 모든 상위 폴더명을 키로 등록한다 (먼저 찾은 경로 우선)
+    """
+
+    def __init__(self, base_dir: Path = BASE_DIR, cache_path: Optional[str] = CACHE_PATH):
+        self.base_dir = Path(base_dir)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._paths: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.RLock()
+        self._built = False
+        self._observer = None
+
+    # -----------------------------
+    # 구축
+    # -----------------------------
+    def _keys_for(self, path: Path) -> List[Tuple[str, str]]:
+        camera_id = path.stem
+        try:
+            rel_parts = path.relative_to(self.base_dir).parts[:-1]
+        except ValueError:
+            rel_parts = path.parts[:-1]
+        return [(part, camera_id) for part in rel_parts]
+
+    def _add(self, path: Path, paths: Optional[Dict[Tuple[str, str], str]] = None) -> None:
+        paths = self._paths if paths is None else paths
+        for key in self._keys_for(path):
+            paths.setdefault(key, str(path))
+
+    def _remove(self, path: Path) -> None:
+        p = str(path)
+        for key in self._keys_for(path):
+            if self._paths.get(key) == p:
+                del self._paths[key]
+
+    def build(self, use_cache: bool = True, rescan: bool = RESCAN_AFTER_CACHE) -> None:
+        """
+        BASE_DIR 전체를 한 번 스캔 (캐시가 있으면 캐시 로드)
+        - 캐시를 쓴 경우 rescan=True 면 백그라운드 스레드에서 다시 스캔해서 교체
+        """
+        with self._lock:
+            if use_cache and self._load_cache():
+                self._built = True
+                if rescan:
+                    threading.Thread(
+                        target=self.build, kwargs={"use_cache": False}, name="video-index-rescan", daemon=True,
+                    ).start()
+                return
+
+            # 조회는 락 없이 self._paths 를 읽으므로 다 채운 뒤에 교체
+            # (스캔 동안 watcher 이벤트는 락에서 기다렸다가 새 dict 에 반영됨)
+            paths: Dict[Tuple[str, str], str] = {}
+            for root, dirs, files in os.walk(self.base_dir):
+                dirs.sort()  # rglob 과 비슷하게 결정적인 순서 유지
+                for name in sorted(files):
+                    if name.endswith(VIDEO_EXT):
+                        self._add(Path(root) / name, paths)
+            self._paths = paths
+            self._built = True
+            print(f"[INFO] video index built: {len(self._paths)} keys under {self.base_dir}")
+            self._save_cache()
+
+    def ensure_built(self) -> None:
+        if not self._built:
+            self.build()
+
+    # -----------------------------
+    # 디스크 캐시
+    # -----------------------------
+    def _load_cache(self) -> bool:
+        if not self.cache_path or not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("base_dir") != str(self.base_dir):
+                return False
+            self._paths = {(s, c): p for s, c, p in data.get("entries", [])}
+            print(f"[INFO] video index loaded from cache: {len(self._paths)} keys")
+            return True
+        except (OSError, ValueError) as e:
+            print(f"[WARN] video index cache load failed: {e}")
+            return False
+
+    def _save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        with self._lock:
+            entries = [[s, c, p] for (s, c), p in self._paths.items()]
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"base_dir": str(self.base_dir), "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"[WARN] video index cache save failed: {e}")
+
+    # -----------------------------
+    # 조회
+    # -----------------------------
+    def lookup(self, session_id: str, camera_id) -> Optional[str]:
+        self.ensure_built()
+        return self._paths.get((normalize_session_id(str(session_id)), str(camera_id)))
+
+    def lookup_many(self, pairs: Iterable[Tuple[str, object]]) -> List[Optional[str]]:
+        """(session_id, camera_id) 목록을 한 번에 조회"""
+        self.ensure_built()
+        paths = self._paths
+        return [paths.get((normalize_session_id(str(s)), str(c))) for s, c in pairs]
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    # -----------------------------
+    # 파일시스템 감시
+    # -----------------------------
+    def on_created(self, path: str) -> None:
+        if path.endswith(VIDEO_EXT):
+            with self._lock:
+                self._add(Path(path))
+
+    def on_deleted(self, path: str) -> None:
+        if path.endswith(VIDEO_EXT):
+            with self._lock:
+                self._remove(Path(path))
+
+    def start_watcher(self) -> None:
+        """watchdog Observer 로 BASE_DIR 하위 mp4 변경을 인덱스에 반영"""
+        if self._observer is not None:
+            return
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("[WARN] watchdog not installed → video index watcher disabled")
+            return
+
+        index = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    index.on_created(event.src_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    index.on_deleted(event.src_path)
+
+            def on_moved(self, event):
+                if event.is_directory:
+                    # 세션 폴더 자체가 옮겨지면 전체 재스캔이 가장 안전
+                    index.build(use_cache=False)
+                    return
+                index.on_deleted(event.src_path)
+                index.on_created(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.base_dir), recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        print(f"[WATCHING] {self.base_dir} for video changes...")
+
+    def stop_watcher(self) -> None:
+        if self._observer is None:
+            return
+        self._observer.stop()
+        self._observer.join()
+        self._observer = None
+        self._save_cache()
+
+
+# 프로세스 전역 인덱스 (API / ingester 공용)
+video_index = VideoPathIndex()
@@ -1,28 +1,19 @@
-from pathlib import Path
-import re
+from typing import Iterable, List, Optional, Tuple
 
-BASE_DIR = Path("/home/user2/문서/agentApp")
+from .video_index import BASE_DIR, normalize_session_id, video_index
 
 # 리눅스에서는 파일이름에 : 가 들어가는게 가능하다고 한다 윈도우에서는 세션 파일 받을때 불가능해서 자동으로  : 를 _ 로 바꾼단다
+# (session_id → 폴더명 변환은 video_index.normalize_session_id 참고)
 
-def normalize_session_id(session_id: str) -> str:
+def find_video_path(session_id: str, camera_id: str) -> str | None:
     """
-    ES에 저장된 session_id (Fri_Aug_18_12_06_27_2023) → 
-    실제 폴더명 (Fri_Aug_18_12:06:27_2023) 변환
+    session_id와 camera_id를 기반으로 실제 mp4 경로를 찾는다.
+    - 매번 rglob 하지 않고 시작 시 구축된 video_index 에서 O(1) 조회
     """
-    return re.sub(
-        r'_(\d{2})_(\d{2})_(\d{2})_(\d{4})$',
-        lambda m: f"_{m.group(1)}:{m.group(2)}:{m.group(3)}_{m.group(4)}",
-        session_id
-    )
+    return video_index.lookup(session_id, camera_id)
 
-def find_video_path(session_id: str, camera_id: str) -> str | None:
+def find_video_paths(pairs: Iterable[Tuple[str, str]]) -> List[Optional[str]]:
     """
-    session_id와 camera_id를 기반으로 실제 mp4 경로를 찾는다.
+    (session_id, camera_id) 목록의 mp4 경로를 한 번에 조회 (검색 결과 일괄 처리용)
     """
-    
-    real_session_id = normalize_session_id(session_id)
-    for p in BASE_DIR.rglob(f"{camera_id}.mp4"):
-        if real_session_id in str(p):
-            return str(p)
-    return None
+    return video_index.lookup_many(pairs)
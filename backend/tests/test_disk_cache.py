@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""디스크 임베딩 캐시: 같은 디렉터리를 여러 인스턴스(프로세스)가 함께 쓰는 경우"""
+
+import multiprocessing as mp
+
+import numpy as np
+
+from app.models_emb.disk_cache import DiskEmbeddingCache, content_key
+
+
+def _key(i: int) -> bytes:
+    return content_key("m", "float32", "text", str(i).encode())
+
+
+def _writer(base_dir, start: int, n: int) -> None:
+    cache = DiskEmbeddingCache(base_dir)
+    for i in range(start, start + n):
+        cache.put_many([_key(i)], np.full((1, 4), i, dtype=np.float32))
+    cache.close()
+
+
+def test_sees_entries_written_by_other_instance(tmp_path):
+    a = DiskEmbeddingCache(tmp_path)
+    b = DiskEmbeddingCache(tmp_path)
+    a.put_many([_key(1)], np.ones((1, 4), dtype=np.float32))
+    got = b.get_many([_key(1)])[0]
+    assert got is not None and np.array_equal(got, np.ones(4, dtype=np.float32))
+
+
+def test_concurrent_writers_do_not_overlap(tmp_path):
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_writer, args=(tmp_path, s, 200)) for s in (0, 1000, 2000)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    cache = DiskEmbeddingCache(tmp_path)
+    keys = [s + i for s in (0, 1000, 2000) for i in range(200)]
+    for i, vec in zip(keys, cache.get_many([_key(i) for i in keys])):
+        assert vec is not None and np.all(vec == i)
+
+
+def test_reopens_after_other_instance_compacts(tmp_path):
+    reader = DiskEmbeddingCache(tmp_path)
+    writer = DiskEmbeddingCache(tmp_path, max_bytes=4 * 4 * 10)   # 벡터 10개 넘으면 압축
+    for i in range(20):
+        writer.put_many([_key(i)], np.full((1, 4), i, dtype=np.float32))
+
+    # 압축 후 남은 최근 벡터는 reader 도 새 파일에서 같은 값으로 읽어야 함
+    vec = reader.get_many([_key(19)])[0]
+    assert vec is not None and np.all(vec == 19)
+    assert reader.get_many([_key(0)])[0] is None
+
+    # reader 가 쓴 것도 새 파일에 들어가서 writer 가 봄
+    reader.put_many([_key(100)], np.full((1, 4), 100, dtype=np.float32))
+    vec = writer.get_many([_key(100)])[0]
+    assert vec is not None and np.all(vec == 100)
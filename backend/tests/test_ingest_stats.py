@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""세션 통계: compute_stats_all(전체 한 번에) 가 세션별 compute_stats 와 같은 값을 내는지"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("elasticsearch")
+ingest_stats = pytest.importorskip("app.services.ingester.ingest_stats")
+
+
+def _frame(seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    sizes = {"s_big": 500, "s_small": 7, "s_one": 1, "s_nan": 4}
+    sids = np.concatenate([[sid] * n for sid, n in sizes.items()])
+    rng.shuffle(sids)   # 세션 행이 섞여 있어도 세션 안 순서는 유지돼야 함
+    df = pd.DataFrame({"session_id": sids})
+    for col in ingest_stats.STATS_COLUMNS[1:]:
+        df[col] = rng.normal(loc=rng.uniform(-50, 50), scale=rng.uniform(0.1, 20), size=len(df))
+    df[ingest_stats.COMMAND_COL] = rng.integers(0, 2, size=len(df)).astype(float)
+    # 일부 결측 + 값이 전부 NaN 인 세션
+    value_cols = ingest_stats.STATS_COLUMNS[1:]
+    df.loc[rng.random(len(df)) < 0.1, value_cols[0]] = np.nan
+    df.loc[df["session_id"] == "s_nan", value_cols] = np.nan
+    return df
+
+
+def _flatten(stats, prefix=""):
+    for key, val in stats.items():
+        if isinstance(val, dict):
+            yield from _flatten(val, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", val
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compute_stats_all_matches_per_session(seed):
+    df = _frame(seed)
+    bulk = ingest_stats.compute_stats_all(df)
+    assert set(bulk) == set(df["session_id"])
+
+    # bottleneck 이 깔려 있으면 pd.Series.mean 이 다른 합산을 씀 → 비교 기준은 numpy 경로로 고정
+    with pd.option_context("compute.use_bottleneck", False):
+        per_session = {sid: ingest_stats.compute_stats(group) for sid, group in df.groupby("session_id")}
+
+    for sid, stats in per_session.items():
+        expected = dict(_flatten(stats))
+        got = dict(_flatten(bulk[sid]))
+        assert got.keys() == expected.keys()
+        for key, val in expected.items():
+            if val is None:
+                assert got[key] is None, (sid, key)
+            else:
+                np.testing.assert_allclose(got[key], val, rtol=0, atol=0, err_msg=f"{sid} {key}")
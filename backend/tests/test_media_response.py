@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""미디어 파일 응답: 304 / Range / If-Range / 416"""
+
+import pytest
+
+pytest.importorskip("httpx")
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.services.media_response import file_response  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path):
+    data = tmp_path / "clip.mp4"
+    data.write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "empty.mp4").write_bytes(b"")
+
+    app = fastapi.FastAPI()
+
+    @app.get("/media/{name}")
+    def media(name: str, request: fastapi.Request):
+        return file_response(request, str(tmp_path / name), media_type="video/mp4")
+
+    return TestClient(app)
+
+
+def test_full_and_not_modified(client):
+    r = client.get("/media/clip.mp4")
+    assert r.status_code == 200 and len(r.content) == 1024
+    assert r.headers["accept-ranges"] == "bytes"
+    r2 = client.get("/media/clip.mp4", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 304
+
+
+def test_ranges(client):
+    r = client.get("/media/clip.mp4", headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == "bytes 10-19/1024"
+    assert r.content == bytes(range(10, 20))
+
+    r = client.get("/media/clip.mp4", headers={"Range": "bytes=-4"})
+    assert r.status_code == 206 and r.content == bytes(range(252, 256))
+
+
+def test_if_range_mismatch_sends_full_file(client):
+    r = client.get("/media/clip.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200 and len(r.content) == 1024
+
+
+def test_unsatisfiable_ranges(client):
+    assert client.get("/media/clip.mp4", headers={"Range": "bytes=2000-"}).status_code == 416
+    assert client.get("/media/empty.mp4", headers={"Range": "bytes=-5"}).status_code == 416
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""/api/search 팬아웃: _msearch 응답 한쪽이 실패하면 빈 결과 대신 예외"""
+
+import pytest
+
+pytest.importorskip("elasticsearch")
+multi_search = pytest.importorskip("app.services.multi_search")
+
+
+class _FakeES:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def msearch(self, body):
+        return {"responses": self.responses}
+
+
+def _hit(sid, score):
+    return {"_id": sid, "_score": score, "_source": {"session_id": sid, "camera_id": 1, "text": sid}}
+
+
+@pytest.fixture
+def es_rescore(monkeypatch):
+    monkeypatch.setattr(multi_search, "RERANK_MODE", "es")
+    monkeypatch.setattr(multi_search, "es_rescore_body", lambda *a, **k: {})
+    monkeypatch.setattr(multi_search, "project_query", lambda field, v: v)
+
+
+@pytest.mark.parametrize("failing", [0, 1])
+def test_msearch_error_raises(monkeypatch, es_rescore, failing):
+    responses = [{"hits": {"hits": [_hit("s1", 1.5)]}}, {"hits": {"hits": [_hit("s2", 0.9)]}}]
+    responses[failing] = {"error": {"type": "index_not_found_exception"}, "status": 404}
+    monkeypatch.setattr(multi_search, "get_client", lambda: _FakeES(responses))
+    with pytest.raises(RuntimeError, match="index_not_found_exception"):
+        multi_search._msearch([0.0], [0.0], [0.0], k=5, num_candidates=10, top_n=5)
+
+
+def test_msearch_ok(monkeypatch, es_rescore):
+    responses = [{"hits": {"hits": [_hit("s1", 1.5)]}}, {"hits": {"hits": [_hit("s2", 0.9)]}}]
+    monkeypatch.setattr(multi_search, "get_client", lambda: _FakeES(responses))
+    text_ranked, image_hits = multi_search._msearch([0.0], [0.0], [0.0], k=5, num_candidates=10, top_n=5)
+    assert [(h["_id"], s) for h, s in text_ranked] == [("s1", 0.5)]
+    assert [h["_id"] for h in image_hits] == ["s2"]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""장면 변화 키프레임 (read_scene_raw_frames): 합성 영상으로 budget / 첫 프레임 / 기준 프레임 확인"""
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+frames = pytest.importorskip("app.services.ingester.frames")
+
+
+def _write(path, levels, per_level: int = 5):
+    """밝기 단계(0~1)마다 per_level 장씩 같은 회색 프레임 → 10fps MJPG"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("no MJPG encoder")
+    for level in levels:
+        for _ in range(per_level):
+            writer.write(np.full((48, 64, 3), round(level * 255), dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _levels(picked):
+    return [float(f.mean()) / 255 for f in picked]
+
+
+def _approx(levels):
+    return pytest.approx(levels, abs=0.03)   # MJPG 는 손실 압축 → 밝기가 조금 달라짐
+
+
+def _scene(path, budget):
+    # probe_fps = fps → 모든 프레임을 비교
+    return frames.read_scene_raw_frames(path, budget=budget, probe_fps=10.0, threshold=0.08, thumb_w=16)
+
+
+def test_static_step_static(tmp_path):
+    path = _write(tmp_path / "step.avi", [0.2, 0.8])
+    picked = _scene(path, budget=10)
+    assert _levels(picked) == _approx([0.2, 0.8])   # 첫 프레임 + 바뀐 지점 하나, 정적인 구간은 더 안 뽑음
+
+
+def test_budget_keeps_first_frame(tmp_path):
+    path = _write(tmp_path / "steps.avi", [0.0, 0.3, 0.6, 0.9])
+    assert _levels(_scene(path, budget=1)) == _approx([0.0])
+    picked = _scene(path, budget=2)
+    assert len(picked) == 2 and _levels(picked)[0] == pytest.approx(0.0, abs=0.03)
+
+
+def test_evicted_frame_is_not_the_reference(tmp_path):
+    # budget=2: 0.0(첫 프레임), 0.4(차이 .4) 가 남고 0.5(차이 .1) 는 바로 밀려남
+    # → 0.85 는 남아 있는 0.4 기준 차이 .45 로 0.4 를 밀어내야 함 (밀려난 0.5 기준이면 .35 라 못 들어감)
+    path = _write(tmp_path / "evict.avi", [0.0, 0.4, 0.5, 0.85])
+    assert _levels(_scene(path, budget=2)) == _approx([0.0, 0.85])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""구간 인덱스: 구간 나누기 / 묶음 디코딩 / 로컬 collapse / manifest 채택 규칙"""
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+frames = pytest.importorskip("app.services.ingester.frames")
+manifest = pytest.importorskip("app.services.ingester.manifest")
+search_backend = pytest.importorskip("app.services.search_backend")
+
+IngestManifest = manifest.IngestManifest
+plan_grouped_sessions = manifest.plan_grouped_sessions
+collapse_hits = search_backend.collapse_hits
+
+
+# -----------------------------
+# segment_frame_indices
+# -----------------------------
+def test_segments_cover_video_in_fixed_windows():
+    segs = frames.segment_frame_indices(250, 25.0, 4, 2)
+    assert [s[0] for s in segs] == [0, 1, 2]
+    assert [(s[1], s[2]) for s in segs] == [(0.0, 4.0), (4.0, 8.0), (8.0, 10.0)]
+    for _, start_s, end_s, idxs in segs:
+        assert len(idxs) == 2
+        assert all(start_s * 25 <= i < end_s * 25 for i in idxs)
+
+
+def test_short_window_never_repeats_frames():
+    segs = frames.segment_frame_indices(3, 25.0, 4, 5)
+    assert segs == [(0, 0.0, 0.12, [0, 1, 2])]
+
+
+@pytest.mark.parametrize("total, fps", [(0, 25.0), (100, 0.0)])
+def test_no_segments_without_frames_or_fps(total, fps):
+    assert frames.segment_frame_indices(total, fps, 4, 2) == []
+
+
+# -----------------------------
+# decode_segments 묶음 단위
+# -----------------------------
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("no MJPG encoder")
+    for i in range(95):
+        writer.write(np.full((24, 32, 3), i * 2, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_chunked_decode_matches_whole_video(video):
+    plan = frames.video_segments(video, 1.0, 2)
+    assert len(plan) == 10
+
+    _, whole, whole_meta = frames.decode_segments(("k", video, 1.0, 2, 16, 16))
+    chunked_meta, n_frames = [], 0
+    for start in range(0, len(plan), 3):
+        _, imgs, meta = frames.decode_segments(("k", video, 1.0, 2, 16, 16, start, 3))
+        assert len(imgs) <= 3 * 2
+        chunked_meta += meta
+        n_frames += len(imgs)
+
+    assert chunked_meta == whole_meta
+    assert n_frames == len(whole) == sum(m[3] for m in whole_meta)
+
+
+def test_decode_unreadable_video_returns_none(tmp_path):
+    key, imgs, meta = frames.decode_segments(("k", str(tmp_path / "missing.mp4"), 1.0, 2, 16, 16))
+    assert (key, imgs, meta) == ("k", None, [])
+
+
+# -----------------------------
+# 로컬 collapse
+# -----------------------------
+def _hit(sid, seg, score):
+    return {"_id": f"{sid}:1:{seg}", "_score": score, "_source": {"session_id": sid, "segment_idx": seg}}
+
+
+def test_collapse_keeps_best_hit_per_session():
+    hits = [_hit("a", 3, 0.9), _hit("a", 1, 0.8), _hit("b", 0, 0.7), _hit("c", 2, 0.6), _hit("b", 5, 0.5)]
+    out = collapse_hits(hits, "session_id", 2)
+    assert [(h["_source"]["session_id"], h["_source"]["segment_idx"]) for h in out] == [("a", 3), ("b", 0)]
+    assert len(collapse_hits(hits, "session_id", 10)) == 3
+
+
+# -----------------------------
+# manifest 채택 규칙
+# -----------------------------
+def test_plan_grouped_sessions(tmp_path):
+    manifest = IngestManifest("segments", base_dir=tmp_path)
+    manifest.update("same", "fp")
+    manifest.update("changed", "old")
+    fps = {"same": "fp", "changed": "new", "complete": "fp", "partial": "fp", "new": "fp"}
+    in_es = {"complete": 3, "partial": 1}
+    expected = {"complete": 3, "partial": 3, "new": 2}
+    asked = []
+
+    def counts(ids):
+        asked.extend(ids)
+        return {sid: in_es[sid] for sid in ids if sid in in_es}
+
+    todo, stale, unchanged = plan_grouped_sessions(manifest, fps, counts, expected.__getitem__)
+
+    assert sorted(asked) == ["complete", "new", "partial"]   # manifest 에 있는 세션은 ES 조회 안 함
+    assert sorted(todo) == ["changed", "new", "partial"]
+    assert sorted(stale) == ["changed", "partial"]           # 일부만 들어있던 세션은 지우고 다시
+    assert unchanged == 2
+    assert manifest.is_current("complete", "fp")             # 온전한 세션만 채택
+    assert "partial" not in manifest
+
+
+def test_plan_grouped_sessions_without_skip(tmp_path):
+    manifest = IngestManifest("segments", base_dir=tmp_path)
+    manifest.update("a", "fp")
+    todo, stale, unchanged = plan_grouped_sessions(
+        manifest, {"a": "fp", "b": "fp"}, lambda ids: {}, lambda sid: 1, skip_existing=False,
+    )
+    assert todo == stale == ["a", "b"]
+    assert unchanged == 0
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""센서 시계열 피라미드: 레벨 선택 / resolution 상한 / 원본 대비 min·max·mean"""
+
+import warnings
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+sensor_store = pytest.importorskip("app.services.sensor_store")
+
+N = 10000   # factor 4, min_buckets 32 → 버킷 1, 4, 16, 64, 256
+
+
+@pytest.fixture
+def raw():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(N, 2)).astype(np.float32)
+    data[rng.random(N) < 0.05, 0] = np.nan   # 결측 섞기
+    data[100:400, 1] = np.nan                # 버킷 전체가 NaN 인 구간
+    return data
+
+
+@pytest.fixture
+def store(tmp_path, raw):
+    df = pd.DataFrame({"session_id": "s1", "a": raw[:, 0], "b": raw[:, 1]})
+    sensor_store.build_session_pyramid("s1", df, base_dir=tmp_path, factor=4, min_buckets=32)
+    short = pd.DataFrame({"session_id": "short", "a": raw[:50, 0], "b": raw[:50, 1]})
+    sensor_store.build_session_pyramid("short", short, base_dir=tmp_path, factor=4, min_buckets=32)
+    return tmp_path
+
+
+def _expected(raw: np.ndarray, bucket: int):
+    """원본을 bucket 개씩 잘라 nanmin / nanmax / nanmean"""
+    nb = -(-len(raw) // bucket)
+    padded = np.full((nb * bucket, raw.shape[1]), np.nan, dtype=np.float64)
+    padded[:len(raw)] = raw
+    blocks = padded.reshape(nb, bucket, -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # 전부 NaN 인 버킷
+        return np.nanmin(blocks, axis=1), np.nanmax(blocks, axis=1), np.nanmean(blocks, axis=1)
+
+
+def _arr(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+@pytest.mark.parametrize("resolution, bucket", [(20000, 1), (2500, 4), (700, 16), (200, 64), (40, 256)])
+def test_picks_finest_level_within_resolution(store, resolution, bucket):
+    res = sensor_store.query_series("s1", ["a"], resolution, base_dir=store)
+    assert res["bucket"] == bucket
+    assert len(res["x"]) == len(res["series"]["a"]["mean"]) <= resolution
+
+
+@pytest.mark.parametrize("session, resolution", [("s1", 20000), ("s1", 700), ("s1", 40), ("s1", 10),
+                                                 ("s1", 1), ("short", 7)])
+def test_matches_raw_data(store, raw, session, resolution):
+    data = raw if session == "s1" else raw[:50]
+    res = sensor_store.query_series(session, ["a", "b"], resolution, base_dir=store)
+    n_points = len(res["x"])
+    assert n_points <= resolution
+    assert res["x"] == list(range(0, n_points * res["bucket"], res["bucket"]))
+
+    mins, maxs, means = _expected(data, res["bucket"])
+    assert mins.shape[0] == n_points
+    for j, col in enumerate(["a", "b"]):
+        got = res["series"][col]
+        np.testing.assert_array_equal(_arr(got["min"]), mins[:, j])
+        np.testing.assert_array_equal(_arr(got["max"]), maxs[:, j])
+        np.testing.assert_allclose(_arr(got["mean"]), means[:, j], rtol=1e-5, atol=1e-6)
+
+
+def test_unknown_session_and_column(store):
+    assert sensor_store.query_series("nope", base_dir=store) is None
+    with pytest.raises(KeyError):
+        sensor_store.query_series("s1", ["zzz"], base_dir=store)
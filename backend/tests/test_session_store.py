@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""세션 Parquet 저장소: 최신 사본 / CSV 가 바뀐 뒤(오래된 사본) / 사본 없음"""
+
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pd = pytest.importorskip("pandas")
+session_store = pytest.importorskip("app.services.session_store")
+
+
+def _write_csv(path, rows):
+    pd.DataFrame(rows, columns=["session_id", "lab", "value"]).to_csv(path, index=False)
+
+
+@pytest.fixture
+def data(tmp_path):
+    csv_path = tmp_path / "all.csv"
+    _write_csv(csv_path, [("s1", "a", 1.0), ("s2", "b", 2.0)])
+    return str(csv_path), tmp_path / "parquet"
+
+
+def _load(csv_path, parquet_dir, **kwargs):
+    df = session_store.load_sessions(columns=["session_id", "value"], parquet_dir=parquet_dir,
+                                     csv_path=csv_path, **kwargs)
+    return dict(zip(df["session_id"].astype(str), df["value"]))
+
+
+def test_missing_copy_reads_csv(data):
+    csv_path, parquet_dir = data
+    assert _load(csv_path, parquet_dir) == {"s1": 1.0, "s2": 2.0}
+    assert not parquet_dir.exists()
+
+
+def test_fresh_copy_is_used(data, monkeypatch):
+    csv_path, parquet_dir = data
+    session_store.convert_csv_to_parquet(csv_path, parquet_dir)
+    monkeypatch.setattr(pd, "read_csv", lambda *a, **k: pytest.fail("CSV read despite fresh Parquet"))
+    assert _load(csv_path, parquet_dir) == {"s1": 1.0, "s2": 2.0}
+    assert _load(csv_path, parquet_dir, session_ids=["s2"]) == {"s2": 2.0}
+
+
+@pytest.mark.parametrize("change", ["size", "mtime"])
+def test_stale_copy_is_reconverted(data, change):
+    csv_path, parquet_dir = data
+    session_store.convert_csv_to_parquet(csv_path, parquet_dir)
+    if change == "size":
+        _write_csv(csv_path, [("s1", "a", 1.0), ("s2", "b", 2.0), ("s3", "a", 3.0)])
+        expected = {"s1": 1.0, "s2": 2.0, "s3": 3.0}
+    else:
+        _write_csv(csv_path, [("s1", "a", 5.0), ("s2", "b", 2.0)])   # 같은 크기, 값만 바뀜
+        st = os.stat(csv_path)
+        os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        expected = {"s1": 5.0, "s2": 2.0}
+
+    assert _load(csv_path, parquet_dir) == expected
+    index = session_store.load_session_index(parquet_dir)
+    assert index["source"] == session_store._csv_signature(csv_path)
+
+
+def test_stale_copy_without_autoconvert_reads_csv(data, monkeypatch):
+    csv_path, parquet_dir = data
+    session_store.convert_csv_to_parquet(csv_path, parquet_dir)
+    _write_csv(csv_path, [("s1", "a", 1.0), ("s2", "b", 2.0), ("s3", "a", 3.0)])
+    monkeypatch.setattr(session_store, "AUTOCONVERT", False)
+    assert _load(csv_path, parquet_dir) == {"s1": 1.0, "s2": 2.0, "s3": 3.0}
+    assert "s3" not in session_store.load_session_index(parquet_dir)["sessions"]
+
+
+def test_copy_without_csv_is_used(data):
+    csv_path, parquet_dir = data
+    session_store.convert_csv_to_parquet(csv_path, parquet_dir)
+    os.remove(csv_path)
+    assert _load(csv_path, parquet_dir) == {"s1": 1.0, "s2": 2.0}
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""float16 벡터 저장소: 이어 쓰기 + 죽은 행 압축"""
+
+import numpy as np
+
+from app.services.vector_store import VectorStore, VectorStoreWriter
+
+
+def test_append_overwrites_and_compacts(tmp_path):
+    with VectorStoreWriter("f", 4, tmp_path, append=False) as w:
+        w.add(["a", "b", "c"], np.arange(12).reshape(3, 4))
+    for it in range(5):
+        with VectorStoreWriter("f", 4, tmp_path) as w:
+            w.add(["a"], np.full((1, 4), 100 + it))
+
+    store = VectorStore("f", tmp_path)
+    assert store.count <= 4   # 죽은 행이 계속 쌓이지 않음
+    assert (tmp_path / "f.f16").stat().st_size == store.count * 4 * 2
+    mat, found = store.gather(["a", "b", "c", "z"])
+    assert found == [True, True, True, False]
+    np.testing.assert_array_equal(mat[0], np.full(4, 104))
+    np.testing.assert_array_equal(mat[1], np.arange(4, 8))
+    np.testing.assert_array_equal(mat[2], np.arange(8, 12))
+    np.testing.assert_array_equal(mat[3], np.zeros(4))
+
+
+def test_no_compaction_below_ratio(tmp_path):
+    with VectorStoreWriter("f", 2, tmp_path, append=False) as w:
+        w.add([str(i) for i in range(10)], np.zeros((10, 2)))
+    with VectorStoreWriter("f", 2, tmp_path, compact_ratio=0.5) as w:
+        w.add(["0"], np.ones((1, 2)))
+    assert VectorStore("f", tmp_path).count == 11